@@ -0,0 +1,213 @@
+"""
+Rollups over emissions_data and emissions_forecast, computed in SQLite.
+
+A request names the group-by dimensions, the filters and a list of
+"function:metric" aggregates, e.g.
+
+    group_by=['country_name'], aggregates=['sum:emissions_ktco2'],
+    countries=['Germany', 'France'], start_year=2010, end_year=2020
+
+compile_aggregate() turns it into one parameterized statement. Names are only
+ever taken from the whitelists below, and filter values are bound as
+parameters. The filters go into the WHERE clause of each table, where the
+(country_name, sector_name, year) indexes serve them. The 'combined' source
+is the UNION ALL of both tables, with a 'source' column that can be grouped on.
+
+'share' is a group's sum as a percentage of the sum over all groups, or over
+the groups with the same share_by dimensions (e.g. sector shares within each
+country).
+
+run_aggregate() runs the statement on the analytics backend (SQLite, or
+DuckDB over the Parquet export; see analysis.backends) and caches results per
+data version, so repeated rollups are served without touching the database
+until the next load.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+
+from analysis.backends import data_version, query_rows, resolve_backend
+from config.settings import (
+    AGGREGATE_CACHE_SIZE,
+    AGGREGATE_MAX_AGGREGATES,
+    AGGREGATE_MAX_ROWS,
+    AGGREGATE_MAX_VALUES,
+    DB_PATH,
+)
+
+DIMENSIONS = ('source', 'country_name', 'sector_name', 'year')
+FUNCTIONS = {
+    'sum': 'SUM({})',
+    'avg': 'AVG({})',
+    'min': 'MIN({})',
+    'max': 'MAX({})',
+    'count': 'COUNT({})',
+    'share': 'SUM({0}) * 100.0 / SUM(SUM({0})) OVER ({1})',
+}
+# table and metric -> column per source
+SOURCES = {
+    'historical': ('emissions_data', {
+        'emissions_ktco2': 'emissions_ktco2',
+        'emissions_per_capita': 'emissions_per_capita',
+        'population': 'population',
+    }),
+    'forecast': ('emissions_forecast', {
+        'emissions_ktco2': 'forecast_emissions_ktco2',
+        'emissions_per_capita': 'forecast_emissions_per_capita',
+    }),
+}
+SOURCE_CHOICES = ('historical', 'forecast', 'combined')
+
+
+def _names(values, allowed, what: str) -> list:
+    values = list(dict.fromkeys(values or []))
+    unknown = [v for v in values if v not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown {what} {unknown}; choose from {list(allowed)}")
+    return values
+
+
+def _parse_aggregates(aggregates: list, metrics: set) -> list:
+    """ [(function, metric, output column)] from 'function:metric' strings. """
+    if not aggregates:
+        raise ValueError("At least one aggregate is required, e.g. sum:emissions_ktco2")
+    if len(aggregates) > AGGREGATE_MAX_AGGREGATES:
+        raise ValueError(f"At most {AGGREGATE_MAX_AGGREGATES} aggregates per request")
+    parsed = []
+    for aggregate in dict.fromkeys(aggregates):
+        function, _, metric = aggregate.partition(':')
+        if function not in FUNCTIONS:
+            raise ValueError(f"Unknown aggregate function {function!r}; choose from {list(FUNCTIONS)}")
+        if metric not in metrics:
+            raise ValueError(f"Unknown metric {metric!r} for this source; choose from {sorted(metrics)}")
+        parsed.append((function, metric, f"{function}_{metric}"))
+    return parsed
+
+
+def compile_aggregate(source: str='historical', group_by: list | None=None, aggregates: list | None=None,
+                      countries: list | None=None, sectors: list | None=None, start_year: int | None=None, end_year: int | None=None,
+                      year_step: int=1, share_by: list | None=None, order_by: str | None=None, limit: int | None=None) -> tuple[str, tuple]:
+    """
+    Compile an aggregation request to SQL.
+
+    Parameters:
+        source (str): 'historical', 'forecast' or 'combined' (both tables)
+        group_by (list): Dimensions from DIMENSIONS ('source' only with combined)
+        aggregates (list): 'function:metric' strings, function from FUNCTIONS
+        countries, sectors (list): Keep only these (all if empty)
+        start_year, end_year (int): Inclusive year range
+        year_step (int): Group years into buckets of this many years (aligned to multiples of year_step, labelled by their first year)
+        share_by (list): Group-by dimensions that 'share' aggregates are computed within
+        order_by (str): An output column, prefixed with '-' for descending (default: the dimensions)
+        limit (int): Maximum rows (at most AGGREGATE_MAX_ROWS)
+
+    Returns:
+        tuple: (SQL, parameters). The statement returns at most
+        AGGREGATE_MAX_ROWS + 1 rows, so run_aggregate can tell when the limit was hit.
+    """
+    if source not in SOURCE_CHOICES:
+        raise ValueError(f"Unknown source {source!r}; choose from {list(SOURCE_CHOICES)}")
+    sources = ['historical', 'forecast'] if source == 'combined' else [source]
+    metrics = set.intersection(*(set(SOURCES[s][1]) for s in sources))
+    dimensions = DIMENSIONS if source == 'combined' else DIMENSIONS[1:]
+    group_by = _names(group_by, dimensions, 'group-by dimensions')
+    share_by = _names(share_by, group_by, 'share_by dimensions (must be grouped on)')
+    parsed = _parse_aggregates(aggregates, metrics)
+    countries, sectors = list(dict.fromkeys(countries or [])), list(dict.fromkeys(sectors or []))
+    if len(countries) + len(sectors) > AGGREGATE_MAX_VALUES:
+        raise ValueError(f"At most {AGGREGATE_MAX_VALUES} country and sector filter values per request")
+    if year_step < 1:
+        raise ValueError("year_step must be at least 1")
+    if limit is not None and not 1 <= limit <= AGGREGATE_MAX_ROWS:
+        raise ValueError(f"limit must be between 1 and {AGGREGATE_MAX_ROWS}")
+
+    # one filtered SELECT per table, metrics renamed to the common names
+    conditions, branch_params = [], []
+    if countries:
+        conditions.append(f"country_name IN ({', '.join('?' * len(countries))})")
+        branch_params += countries
+    if sectors:
+        conditions.append(f"sector_name IN ({', '.join('?' * len(sectors))})")
+        branch_params += sectors
+    if start_year is not None:
+        conditions.append("year >= ?")
+        branch_params.append(int(start_year))
+    if end_year is not None:
+        conditions.append("year <= ?")
+        branch_params.append(int(end_year))
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    used = sorted({metric for _, metric, _ in parsed})
+    branches, params = [], []
+    for name in sources:
+        table, columns = SOURCES[name]
+        selected = ''.join(f", {columns[metric]}" + (f" AS {metric}" if columns[metric] != metric else "") for metric in used)
+        branches.append(f"SELECT '{name}' AS source, country_name, sector_name, year{selected} FROM {table}{where}")
+        params += branch_params
+
+    expressions = {dimension: dimension for dimension in group_by}
+    if 'year' in expressions and year_step > 1:
+        expressions['year'] = f"year - year % {int(year_step)}"
+    partition = f"PARTITION BY {', '.join(expressions[d] for d in share_by)}" if share_by else ""
+    select = [expression if expression == dimension else f"{expression} AS {dimension}"
+              for dimension, expression in expressions.items()]
+    select += [f"{FUNCTIONS[function].format(metric, partition)} AS {column}" for function, metric, column in parsed]
+
+    outputs = list(expressions) + [column for _, _, column in parsed]
+    if order_by:
+        descending = order_by.startswith('-')
+        column = order_by.lstrip('-')
+        if column not in outputs:
+            raise ValueError(f"Cannot order by {column!r}; choose from {outputs}")
+        order = f" ORDER BY {column}{' DESC' if descending else ''}"
+    else:
+        order = f" ORDER BY {', '.join(expressions)}" if expressions else ""
+    group = f" GROUP BY {', '.join(expressions.values())}" if expressions else ""
+
+    sql = (f"SELECT {', '.join(select)} FROM ({' UNION ALL '.join(branches)}){group}{order} LIMIT ?")
+    params.append(limit if limit is not None else AGGREGATE_MAX_ROWS + 1)
+    return sql, tuple(params)
+
+
+# (backend, data version, sql, params) -> (columns, rows)
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def run_aggregate(db_path: str | None=None, backend: str | None=None, parquet_dir: str | None=None, **request) -> dict:
+    """
+    Compile and run an aggregation request (see compile_aggregate) on the
+    analytics backend (default ANALYTICS_BACKEND), cached per data version.
+
+    Returns:
+        dict: 'columns', 'rows' (lists), 'data_version', 'cached' and 'db_time_ms'
+
+    Raises:
+        ValueError: for an invalid request, or one with more than AGGREGATE_MAX_ROWS result rows
+    """
+    db_path = str(db_path or DB_PATH)
+    backend = resolve_backend(backend)
+    sql, params = compile_aggregate(**request)
+    version = data_version(backend, db_path, parquet_dir)
+    key = (backend, db_path, str(parquet_dir), version, sql, params)
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is not None:
+            _cache.move_to_end(key)
+    if hit is not None:
+        columns, rows = hit
+        return {'columns': columns, 'rows': rows, 'data_version': version, 'cached': True, 'db_time_ms': 0.0}
+
+    start = time.perf_counter()
+    columns, rows = query_rows(sql, params, backend, db_path, parquet_dir)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if request.get('limit') is None and len(rows) > AGGREGATE_MAX_ROWS:
+        raise ValueError(f"More than {AGGREGATE_MAX_ROWS} result rows; add filters, group by fewer "
+                         "dimensions or set a limit")
+    if version is not None:
+        with _cache_lock:
+            _cache[key] = (columns, rows)
+            while len(_cache) > AGGREGATE_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return {'columns': columns, 'rows': rows, 'data_version': version, 'cached': False, 'db_time_ms': elapsed_ms}
@@ -0,0 +1,114 @@
+"""
+Pluggable analytics backends for the read-only analytical queries
+(analysis.trends, analysis.aggregate and the API trend endpoints).
+
+  - sqlite: the query runs on DB_PATH, on the thread's cached connection
+  - duckdb: the query runs in an embedded DuckDB over the Parquet export in
+            PARQUET_DIR (etl/parquet_export.py). emissions_data and
+            emissions_forecast are views over the year-partitioned files, so
+            the same SQL runs unchanged, column-wise and in parallel, and
+            year filters skip whole partitions.
+
+The backend is chosen with ANALYTICS_BACKEND, or per call. DuckDB is an
+optional dependency imported on first use; the Parquet copy is as current as
+the last export (PARQUET_EXPORT in the pipeline).
+"""
+from __future__ import annotations
+
+import threading
+from typing import TYPE_CHECKING
+
+from analysis.queries import get_connection, get_data_version
+from config.settings import ANALYTICS_BACKEND, DB_PATH, PARQUET_DIR
+from etl.parquet_export import read_manifest
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+BACKENDS = ('sqlite', 'duckdb')
+
+# One DuckDB connection per (thread, Parquet directory, export version)
+_local = threading.local()
+
+
+class BackendUnavailable(RuntimeError):
+    """ The configured backend cannot serve queries yet (duckdb missing, or nothing exported). """
+
+
+def resolve_backend(backend: str | None=None) -> str:
+    backend = (backend or ANALYTICS_BACKEND).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown analytics backend {backend!r}; choose from {BACKENDS}")
+    return backend
+
+
+def _sql_string(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def duckdb_connection(parquet_dir: str | None=None):
+    """
+    DuckDB connection of the current thread with a view per exported table,
+    reopened when a new export replaces the manifest.
+    """
+    try:
+        import duckdb
+    except ImportError as e:
+        raise BackendUnavailable("The duckdb analytics backend needs the duckdb package (pip install duckdb)") from e
+    parquet_dir = str(parquet_dir or PARQUET_DIR)
+    manifest = read_manifest(parquet_dir)
+    if manifest is None:
+        raise BackendUnavailable(f"No Parquet export in {parquet_dir}; run etl.parquet_export first")
+
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    key = (parquet_dir, manifest['version'])
+    conn = connections.get(key)
+    if conn is None:
+        for old_key in [k for k in connections if k[0] == parquet_dir]:
+            connections.pop(old_key).close()
+        conn = duckdb.connect()
+        for table, entry in manifest['tables'].items():
+            if entry['rows']:
+                files = _sql_string(f"{parquet_dir}/{entry['path']}/*/*.parquet")
+                conn.execute(f"CREATE VIEW {table} AS SELECT * FROM read_parquet({files}, hive_partitioning = true)")
+            else:
+                # no partitions to read the schema from
+                columns = ', '.join(f"{name} {kind}" for name, kind in entry['columns'])
+                conn.execute(f"CREATE TABLE {table} ({columns})")
+        connections[key] = conn
+    return conn
+
+
+def data_version(backend: str | None=None, db_path: str | None=None, parquet_dir: str | None=None) -> str | None:
+    """ Cache key for the data a backend serves: the database version, or the Parquet export version. """
+    if resolve_backend(backend) == 'sqlite':
+        return get_data_version(db_path or DB_PATH)
+    manifest = read_manifest(parquet_dir or PARQUET_DIR)
+    return None if manifest is None else f"parquet-{manifest['version']}"
+
+
+def query_rows(query: str, params: tuple=(), backend: str | None=None, db_path: str | None=None,
+               parquet_dir: str | None=None) -> tuple[list, list]:
+    """
+    Run a read-only query with ? placeholders on the analytics backend.
+
+    Returns:
+        tuple: (column names, row tuples)
+    """
+    if resolve_backend(backend) == 'sqlite':
+        cursor = get_connection(db_path or DB_PATH).execute(query, tuple(params))
+    else:
+        cursor = duckdb_connection(parquet_dir).execute(query, list(params))
+    rows = cursor.fetchall()
+    return [c[0] for c in cursor.description], rows
+
+
+def query_frame(query: str, params: tuple=(), backend: str | None=None, db_path: str | None=None,
+                parquet_dir: str | None=None) -> pd.DataFrame:
+    """ query_rows as a DataFrame. """
+    import pandas as pd
+
+    columns, rows = query_rows(query, params, backend, db_path, parquet_dir)
+    return pd.DataFrame.from_records(rows, columns=columns)
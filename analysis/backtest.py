@@ -0,0 +1,260 @@
+"""
+Rolling-origin backtests of the forecasting models.
+
+For every (country, sector) series and every cutoff year from min_train
+observations onwards, each model is fitted on the years up to the cutoff and
+scored against the following `horizon` actual years:
+  - MAPE: mean of |actual - forecast| / |actual|, in percent
+  - MASE: mean |actual - forecast| scaled by the in-sample mean absolute
+          one-step naive error of the training window
+
+Series are spread over a process pool. Within a series the cutoffs are run
+in order on expanding windows, and each ARIMA fit starts from the parameters
+of the previous cutoff's fit, which typically converges in a few iterations.
+
+Results go to the forecast_backtest table (one row per series, model, cutoff
+and horizon step) in BACKTEST_DB_PATH, not in the served database, whose
+ready marker a write would invalidate; summarize_backtest / backtest_report
+aggregate them.
+
+Usage:
+    python -m analysis.backtest --horizon 5 --min-train 12 --workers 4
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from analysis.forecast import _linear_trend_forecast, forecast_series
+from config.settings import BACKTEST_DB_PATH, DB_PATH
+from monitoring.metrics import log_event, logger
+
+DEFAULT_ORDER = (2, 1, 2)
+
+
+# ---------- models ----------
+# Each model takes (years, values, horizon, state) and returns (forecast, state);
+# state is whatever the model wants to carry to the next (longer) window.
+def _arima(years, values, horizon, state, method=None):
+    from statsmodels.tsa.arima.model import ARIMA
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        model = ARIMA(pd.Series(values, index=pd.PeriodIndex(years, freq='Y')), order=DEFAULT_ORDER,
+                      enforce_stationarity=False, enforce_invertibility=False)
+        kwargs = {'method_kwargs': {'method': 'nm', 'maxiter': 500, 'disp': False}} if method == 'nm' else {}
+        fit = model.fit(start_params=state, **kwargs)
+    params = fit.params.to_numpy()
+    return fit.forecast(horizon).to_numpy(), params if np.all(np.isfinite(params)) else None
+
+
+def _arima_lbfgs(years, values, horizon, state):
+    return _arima(years, values, horizon, state)
+
+
+def _arima_nm(years, values, horizon, state):
+    return _arima(years, values, horizon, state, method='nm')
+
+
+def _production(years, values, horizon, state):
+    """ forecast_series as the pipeline runs it (L-BFGS, Nelder-Mead, then linear fallback). """
+    return forecast_series(pd.Series(values, index=years), forecast_years=horizon).to_numpy(), None
+
+
+def _linear(years, values, horizon, state):
+    return _linear_trend_forecast(pd.Series(values, index=years), horizon)['mean'].to_numpy(), None
+
+
+def _naive(years, values, horizon, state):
+    return np.repeat(values[-1], horizon), None
+
+
+MODELS = {
+    'production': _production,
+    'arima_lbfgs': _arima_lbfgs,
+    'arima_nm': _arima_nm,
+    'linear': _linear,
+    'naive': _naive,
+}
+
+
+# ---------- evaluation ----------
+def get_backtest_series(column: str='emissions_ktco2', db_path: str | None=None) -> list:
+    """ [(country_name, sector_name, years, values)] for every series in emissions_data. """
+    conn = sqlite3.connect(str(db_path or DB_PATH))
+    df = pd.read_sql_query(f"""
+        SELECT country_name, sector_name, year, {column} AS value
+        FROM emissions_data
+        WHERE {column} IS NOT NULL
+        ORDER BY country_name, sector_name, year;
+    """, conn)
+    conn.close()
+    return [(country, sector, group['year'].to_numpy(), group['value'].to_numpy(dtype=float))
+            for (country, sector), group in df.groupby(['country_name', 'sector_name'], sort=False)]
+
+
+def backtest_series(country: str, sector: str, years, values, models: list, horizon: int=5,
+                    min_train: int=12, step: int=1, warm_start: bool=True) -> list:
+    """
+    Rolling-origin evaluation of one series. With warm_start, each fit starts
+    from the previous cutoff's parameters (faster, but can settle on a
+    different optimum than a cold fit).
+
+    Returns:
+        list: One dict per model, cutoff and horizon step with the actual,
+        the forecast, the absolute percentage error and the scaled error
+    """
+    years, values = np.asarray(years), np.asarray(values, dtype=float)
+    rows = []
+    for model in models:
+        fit, state = MODELS[model], None
+        for end in range(min_train, len(values), step):
+            train_years, train = years[:end], values[:end]
+            actual = values[end:end + horizon]
+            naive_mae = np.mean(np.abs(np.diff(train))) if len(train) > 1 else np.nan
+            if not warm_start:
+                state = None
+            try:
+                forecast, state = fit(train_years, train, len(actual), state)
+            except Exception as e:  # noqa: BLE001 - a failed fit is scored as missing
+                log_event('backtest_fit_error', logging.WARNING, country=country, sector=sector, model=model,
+                          cutoff=int(train_years[-1]), error=f"{type(e).__name__}: {e}")
+                forecast, state = np.full(len(actual), np.nan), None
+            errors = np.abs(actual - forecast)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ape = np.where(actual != 0, errors / np.abs(actual) * 100, np.nan)
+                scaled = errors / naive_mae if naive_mae > 0 else np.full(len(actual), np.nan)
+            for h in range(len(actual)):
+                rows.append({
+                    'country_name': country, 'sector_name': sector, 'model': model,
+                    'cutoff_year': int(train_years[-1]), 'horizon': h + 1, 'year': int(years[end + h]),
+                    'actual': float(actual[h]), 'forecast': float(forecast[h]),
+                    'abs_pct_error': float(ape[h]), 'scaled_error': float(scaled[h]),
+                })
+    return rows
+
+
+def _quiet_worker():
+    # per-fit forecast_fit events from every worker would swamp the log
+    logger.setLevel(logging.WARNING)
+
+
+def run_backtest(models: list | None=None, horizon: int=5, min_train: int=12, step: int=1,
+                 column: str='emissions_ktco2', workers: int | None=None, db_path: str | None=None,
+                 warm_start: bool=True) -> pd.DataFrame:
+    """
+    Backtest models over every series in emissions_data, one process per series at a time.
+
+    Parameters:
+        models (list): Names from MODELS (default all)
+        horizon (int): Years forecast from each cutoff
+        min_train (int): Observations in the first training window
+        step (int): Years between cutoffs
+        column (str): emissions_data column to forecast
+        workers (int): Processes (default os.cpu_count(); 1 runs in this process)
+        warm_start (bool): Start each ARIMA fit from the previous cutoff's parameters
+
+    Returns:
+        pd.DataFrame: Rows as returned by backtest_series
+    """
+    models = list(MODELS) if models is None else models
+    unknown = set(models) - set(MODELS)
+    if unknown:
+        raise ValueError(f"Unknown models {sorted(unknown)}; choose from {list(MODELS)}")
+    series = [s for s in get_backtest_series(column, db_path) if len(s[3]) > min_train]
+    workers = workers or os.cpu_count() or 1
+    args = {'models': models, 'horizon': horizon, 'min_train': min_train, 'step': step, 'warm_start': warm_start}
+
+    rows = []
+    if workers == 1:
+        for s in series:
+            rows.extend(backtest_series(*s, **args))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_quiet_worker) as pool:
+            futures = [pool.submit(backtest_series, *s, **args) for s in series]
+            for future in futures:
+                rows.extend(future.result())
+    df = pd.DataFrame(rows, columns=['country_name', 'sector_name', 'model', 'cutoff_year', 'horizon', 'year',
+                                     'actual', 'forecast', 'abs_pct_error', 'scaled_error'])
+    df.insert(2, 'series_column', column)
+    return df
+
+
+def load_backtest_to_db(backtest_df: pd.DataFrame, db_path: str | None=None):
+    """ Replace the forecast_backtest table in db_path (default BACKTEST_DB_PATH) with backtest_df. """
+    conn = sqlite3.connect(str(db_path or BACKTEST_DB_PATH))
+    backtest_df.to_sql('forecast_backtest', conn, if_exists='replace', index=False)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_forecast_backtest_model ON forecast_backtest (model, horizon)")
+    conn.commit()
+    conn.close()
+    print(f'Successfully loaded {len(backtest_df)} backtest rows.')
+
+
+def summarize_backtest(backtest_df: pd.DataFrame, by: list | None=None) -> pd.DataFrame:
+    """
+    MAPE and MASE per model (and optionally per `by` columns such as horizon),
+    plus the number of series on which each model has the lowest MASE.
+    """
+    by = ['model'] + (by or [])
+    grouped = backtest_df.groupby(by)
+    summary = grouped.agg(
+        forecasts=('forecast', 'count'),
+        failed=('forecast', lambda f: int(f.isna().sum())),
+        mape=('abs_pct_error', 'mean'),
+        mase=('scaled_error', 'mean'),
+    )
+    summary.insert(0, 'series', grouped[['country_name', 'sector_name']].apply(lambda g: len(g.drop_duplicates())))
+    if by != ['model']:
+        return summary
+    per_series = backtest_df.groupby(['country_name', 'sector_name', 'model'])['scaled_error'].mean().unstack('model')
+    wins = per_series.dropna(how='all').idxmin(axis=1).value_counts()
+    summary['best_on_series'] = wins.reindex(summary.index).fillna(0).astype(int)
+    return summary.sort_values('mase')
+
+
+def backtest_report(backtest_df: pd.DataFrame) -> str:
+    """ Plain-text report: per-model accuracy, accuracy by horizon and the recommended model. """
+    overall = summarize_backtest(backtest_df)
+    by_horizon = summarize_backtest(backtest_df, by=['horizon'])['mase'].unstack('horizon')
+    lines = [
+        (f"Backtest of {backtest_df[['country_name', 'sector_name']].drop_duplicates().shape[0]} series, "
+         f"cutoffs {backtest_df['cutoff_year'].min()}-{backtest_df['cutoff_year'].max()}"),
+        "",
+        overall.round(3).to_string(),
+        "",
+        "MASE by horizon (years ahead):",
+        by_horizon.round(3).to_string(),
+        "",
+        f"Lowest mean MASE: {overall.index[0]}",
+    ]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of the forecasting models.")
+    parser.add_argument('--models', nargs='+', choices=list(MODELS), default=list(MODELS))
+    parser.add_argument('--horizon', type=int, default=5)
+    parser.add_argument('--min-train', type=int, default=12)
+    parser.add_argument('--step', type=int, default=1)
+    parser.add_argument('--column', choices=['emissions_ktco2', 'emissions_per_capita'], default='emissions_ktco2')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cold-start', action='store_true', help='Fit every cutoff from default start parameters')
+    parser.add_argument('--report', default=None, help='Also write the report to this file')
+    args = parser.parse_args()
+
+    logger.setLevel(logging.WARNING)
+    df = run_backtest(args.models, args.horizon, args.min_train, args.step, args.column, args.workers,
+                      warm_start=not args.cold_start)
+    if df.empty:
+        raise SystemExit("No series long enough to backtest")
+    load_backtest_to_db(df)
+    report = backtest_report(df)
+    print(report)
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write(report + "\n")
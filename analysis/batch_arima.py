@@ -0,0 +1,319 @@
+"""
+Batched ARIMA(p, d, q) estimation and forecasting for many series at once.
+
+statsmodels builds a model object, a PeriodIndex and result wrappers for
+every series; on short annual series that overhead dominates the actual
+arithmetic. Here all series are stacked on a leading "series" axis (shorter
+ones padded with NaN at the start) and everything runs as NumPy array
+operations across it:
+
+  - the state space form is the one statsmodels' ARIMA/SARIMAX uses with
+    enforce_stationarity=False and enforce_invertibility=False (no trend for
+    d >= 1): d integration states followed by the ARMA companion form,
+    approximate diffuse initialisation with variance 1e6 and the first
+    k_states observations excluded from the log-likelihood;
+  - the Kalman filter loops over time only, with (series, state, state)
+    covariance arrays;
+  - start parameters come from a batched Hannan-Rissanen regression;
+  - parameters are fitted with a batched L-BFGS (per-series history, step
+    sizes and convergence) on central-difference gradients, which evaluate
+    all 2 * k_params perturbations of all series in a single filter pass.
+
+Series that do not converge (or produce non-finite forecasts) are reported
+back so the caller can fit them with the per-series statsmodels path.
+"""
+from statistics import NormalDist
+
+import numpy as np
+
+INITIAL_VARIANCE = 1e6
+
+
+# ---------- state space ----------
+def _system(params: np.ndarray, order: tuple) -> tuple:
+    """ Transition matrices (B, m, m) and R Q R' (B, m, m) for unconstrained params [ar, ma, log sigma2]. """
+    p, d, q = order
+    r = max(p, q + 1)
+    m = d + r
+    B = len(params)
+    ar, ma, sigma2 = params[:, :p], params[:, p:p + q], np.exp(params[:, p + q])
+
+    T = np.zeros((B, m, m))
+    # integration states: y_{t-1}, (1-L) y_{t-1}, ... each adds the ones below it plus the ARMA output
+    for i in range(d):
+        T[:, i, i:d + 1] = 1.0
+    T[:, d:d + p, d] = ar
+    T[:, np.arange(d, m - 1), np.arange(d + 1, m)] = 1.0
+
+    R = np.zeros((B, m))
+    R[:, d] = 1.0
+    R[:, d + 1:d + 1 + q] = ma
+    RQR = sigma2[:, None, None] * R[:, :, None] * R[:, None, :]
+    return T, RQR
+
+
+def _filter(y: np.ndarray, params: np.ndarray, order: tuple) -> tuple:
+    """
+    Kalman filter over a (B, n) panel. Shorter series are padded with NaN at
+    the start; each series is filtered from its own first observation.
+
+    Returns:
+        tuple: (loglike (B,), predicted state (B, m) and covariance (B, m, m) for time n)
+    """
+    p, d, q = order
+    B, n = y.shape
+    m = d + max(p, q + 1)
+    T, RQR = _system(params, order)
+    obs = np.arange(d + 1)  # design picks the integration states and the first ARMA state
+
+    a = np.zeros((B, m))
+    P = np.broadcast_to(np.eye(m) * INITIAL_VARIANCE, (B, m, m)).copy()
+    loglike = np.zeros(B)
+    first = np.argmax(np.isfinite(y), axis=1)
+    padded = bool(first.any())
+    for t in range(n):
+        live = t >= first
+        ZP = P[:, obs, :].sum(axis=1)
+        F = ZP[:, obs].sum(axis=1)
+        v = np.where(live, y[:, t], 0.0) - a[:, obs].sum(axis=1)
+        # the first k_states observations of each series are burned, as in statsmodels
+        counted = t - first >= m
+        if counted.any():
+            loglike -= np.where(counted, 0.5 * (np.log(2 * np.pi) + np.log(F) + v ** 2 / F), 0.0)
+        a_f = a + ZP * (v / F)[:, None]
+        P_f = P - ZP[:, :, None] * ZP[:, None, :] / F[:, None, None]
+        a_next = np.einsum('bij,bj->bi', T, a_f)
+        P_next = T @ P_f @ T.transpose(0, 2, 1) + RQR
+        # keep P exactly symmetric; without it rounding errors grow without bound
+        # for non-invertible MA parameters
+        P_next = 0.5 * (P_next + P_next.transpose(0, 2, 1))
+        if padded:
+            a_next = np.where(live[:, None], a_next, a)
+            P_next = np.where(live[:, None, None], P_next, P)
+        a, P = a_next, P_next
+    return loglike, a, P
+
+
+def loglike(y: np.ndarray, params: np.ndarray, order: tuple=(2, 1, 2)) -> np.ndarray:
+    """
+    Log-likelihood of each series at statsmodels-style parameters
+    [ar..., ma..., sigma2] (one row per series), as ARIMA(...).loglike(params).
+    """
+    params = np.array(params, dtype=float, ndmin=2)
+    params[:, -1] = np.log(params[:, -1])
+    with np.errstate(all='ignore'):
+        return _filter(np.asarray(y, dtype=float), params, order)[0]
+
+
+def _objective(y: np.ndarray, x: np.ndarray, order: tuple) -> np.ndarray:
+    """ Mean negative log-likelihood per observation (what statsmodels minimises). """
+    with np.errstate(all='ignore'):
+        value = -_filter(y, x, order)[0] / np.isfinite(y).sum(axis=1)
+    return np.where(np.isfinite(value), value, np.inf)
+
+
+def _gradient(y: np.ndarray, x: np.ndarray, order: tuple, step: float=1e-6) -> np.ndarray:
+    """ Central differences for every parameter of every series in one filter call. """
+    B, k = x.shape
+    h = step * np.maximum(np.abs(x), 1.0)
+    shifts = np.zeros((2 * k, B, k))
+    for j in range(k):
+        shifts[2 * j, :, j] = h[:, j]
+        shifts[2 * j + 1, :, j] = -h[:, j]
+    trial = (x[None] + shifts).reshape(2 * k * B, k)
+    values = _objective(np.tile(y, (2 * k, 1)), trial, order).reshape(k, 2, B)
+    with np.errstate(invalid='ignore'):
+        return ((values[:, 0] - values[:, 1]) / (2 * h.T)).T
+
+
+# ---------- estimation ----------
+def _lstsq(X: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """ Batched least squares (B, n, k) x (B, n) -> (B, k) with a tiny ridge; rows with NaN are ignored. """
+    valid = np.isfinite(X).all(axis=2) & np.isfinite(y)
+    X, y = np.where(valid[:, :, None], X, 0.0), np.where(valid, y, 0.0)
+    XtX = X.transpose(0, 2, 1) @ X + 1e-8 * np.eye(X.shape[2])
+    return np.linalg.solve(XtX, (X.transpose(0, 2, 1) @ y[:, :, None]))[:, :, 0]
+
+
+def _lags(x: np.ndarray, lags: int, start: int) -> np.ndarray:
+    """ (B, n - start, lags) matrix of x lagged 1..lags, for rows start..n-1. """
+    return np.stack([x[:, start - i:x.shape[1] - i] for i in range(1, lags + 1)], axis=2)
+
+
+def start_params(y: np.ndarray, order: tuple) -> np.ndarray:
+    """ Hannan-Rissanen estimates [ar, ma, log sigma2] for every series of the panel. """
+    p, d, q = order
+    dy = np.diff(y, n=d, axis=1) if d else y.copy()
+    B, n = dy.shape
+    x0 = np.zeros((B, p + q + 1))
+    resid = dy
+    with np.errstate(all='ignore'):
+        if q:
+            # long autoregression for the innovations
+            long = min(max(p + q, 3), max(1, (n - 1) // 3))
+            coef = _lstsq(_lags(dy, long, long), dy[:, long:])
+            innovations = np.full_like(dy, np.nan)
+            innovations[:, long:] = dy[:, long:] - np.einsum('bnk,bk->bn', _lags(dy, long, long), coef)
+            start = long + q
+            X = np.concatenate([_lags(dy, p, start) if p else np.empty((B, n - start, 0)),
+                                _lags(innovations, q, start)], axis=2)
+            if n - start > p + q:
+                x0[:, :p + q] = _lstsq(X, dy[:, start:])
+                resid = dy[:, start:] - np.einsum('bnk,bk->bn', X, x0[:, :p + q])
+        elif p and n - p > p:
+            x0[:, :p] = _lstsq(_lags(dy, p, p), dy[:, p:])
+            resid = dy[:, p:] - np.einsum('bnk,bk->bn', _lags(dy, p, p), x0[:, :p])
+        x0[:, :p + q] = np.where(np.isfinite(x0[:, :p + q]), x0[:, :p + q], 0.0)
+        variance = np.nanvar(resid, axis=1)
+        x0[:, -1] = np.log(np.where(np.isfinite(variance) & (variance > 0), variance, np.nanvar(dy, axis=1) + 1e-12))
+    return x0
+
+
+def fit(y: np.ndarray, order: tuple=(2, 1, 2), maxiter: int=100, history: int=10,
+        gtol: float=1e-5, ftol: float=1e-10, halvings: int=6, max_line_search_rounds: int=5) -> tuple:
+    """
+    Maximum likelihood fit of ARIMA(order) to every row of y with batched L-BFGS.
+    Series still moving after maxiter iterations are not flagged as converged.
+
+    The line search tries the full step, then up to max_line_search_rounds
+    rounds of `halvings` successively halved steps (one filter pass per
+    round), so a step can shrink by at most 2 ** -(halvings * rounds). A
+    series with no acceptable step stops there.
+
+    Returns:
+        tuple: (params (B, k) as [ar, ma, log sigma2], converged (B,) bool)
+    """
+    y = np.asarray(y, dtype=float)
+    B = len(y)
+    x = start_params(y, order)
+    k = x.shape[1]
+    f = _objective(y, x, order)
+    g = _gradient(y, x, order)
+    S = np.zeros((B, history, k))
+    Yh = np.zeros((B, history, k))
+    stored = np.zeros(B, dtype=int)
+    active = np.isfinite(f) & np.all(np.isfinite(g), axis=1)
+    converged = np.zeros(B, dtype=bool)
+
+    for iteration in range(maxiter):
+        idx = np.flatnonzero(active)
+        if not len(idx):
+            break
+        # two-loop recursion over each series' own history (newest first)
+        direction = -g[idx]
+        alphas = np.zeros((len(idx), history))
+        n_hist = stored[idx]
+        for j in range(history):
+            slot = (n_hist - 1 - j) % history
+            valid = j < np.minimum(n_hist, history)
+            s, yv = S[idx, slot], Yh[idx, slot]
+            rho = 1.0 / np.where(valid, np.einsum('bk,bk->b', yv, s), 1.0)
+            alphas[:, j] = np.where(valid, rho * np.einsum('bk,bk->b', s, -direction), 0.0)
+            direction = direction + alphas[:, j, None] * yv * valid[:, None]
+        newest = (n_hist - 1) % history
+        s, yv = S[idx, newest], Yh[idx, newest]
+        gamma = np.where(n_hist > 0, np.einsum('bk,bk->b', s, yv) / np.maximum(np.einsum('bk,bk->b', yv, yv), 1e-300), 1.0)
+        direction = direction * gamma[:, None]
+        for j in reversed(range(history)):
+            slot = (n_hist - 1 - j) % history
+            valid = j < np.minimum(n_hist, history)
+            s, yv = S[idx, slot], Yh[idx, slot]
+            rho = 1.0 / np.where(valid, np.einsum('bk,bk->b', yv, s), 1.0)
+            beta = rho * np.einsum('bk,bk->b', yv, direction)
+            direction = direction - (alphas[:, j] + beta)[:, None] * s * valid[:, None]
+
+        slope = np.einsum('bk,bk->b', g[idx], direction)
+        uphill = ~(slope < 0)
+        direction[uphill] = -g[idx][uphill]
+        slope[uphill] = -np.einsum('bk,bk->b', g[idx][uphill], g[idx][uphill])
+        first = n_hist == 0
+        step = np.where(first, np.minimum(1.0, 1.0 / np.maximum(np.linalg.norm(g[idx], axis=1), 1e-12)), 1.0)
+
+        # Armijo line search, all series at once: the full step first (usually
+        # accepted), then the remaining series try `halvings` shorter steps per filter pass
+        accepted = np.zeros(len(idx), dtype=bool)
+        f_new = f[idx].copy()
+        x_new = x[idx].copy()
+        for attempt in range(1 + max_line_search_rounds):
+            trying = np.flatnonzero(~accepted)
+            if not len(trying):
+                break
+            scales = np.array([1.0]) if attempt == 0 else 0.5 ** np.arange(1, halvings + 1)
+            trial_step = (step[trying, None] * scales[None, :]).T.ravel()
+            series = np.tile(trying, len(scales))
+            candidate = x[idx][series] + trial_step[:, None] * direction[series]
+            value = _objective(y[idx][series], candidate, order)
+            ok = (value <= f[idx][series] + 1e-4 * trial_step * slope[series]).reshape(len(scales), len(trying))
+            # largest acceptable step per series
+            best = np.argmax(ok, axis=0)
+            found = ok.any(axis=0)
+            pick = best * len(trying) + np.arange(len(trying))
+            hit = trying[found]
+            accepted[hit] = True
+            f_new[hit] = value[pick[found]]
+            x_new[hit] = candidate[pick[found]]
+            step[trying[~found]] *= scales[-1]
+
+        failed = idx[~accepted]
+        active[failed] = False
+        idx, x_new, f_new = idx[accepted], x_new[accepted], f_new[accepted]
+        if not len(idx):
+            continue
+        g_new = _gradient(y[idx], x_new, order)
+        s_new, y_new = x_new - x[idx], g_new - g[idx]
+        curvature = np.einsum('bk,bk->b', s_new, y_new) > 1e-12
+        slot = stored[idx] % history
+        S[idx[curvature], slot[curvature]] = s_new[curvature]
+        Yh[idx[curvature], slot[curvature]] = y_new[curvature]
+        stored[idx[curvature]] += 1
+
+        change = np.abs(f[idx] - f_new) / np.maximum(np.maximum(np.abs(f[idx]), np.abs(f_new)), 1.0)
+        x[idx], f[idx], g[idx] = x_new, f_new, g_new
+        done = (np.max(np.abs(g_new), axis=1) < gtol) | (change < ftol)
+        bad = ~np.isfinite(f_new) | ~np.all(np.isfinite(g_new), axis=1)
+        converged[idx[done & ~bad]] = True
+        active[idx[done | bad]] = False
+
+    # a line search that cannot improve further at a near-zero gradient is converged too
+    stalled = ~converged & np.isfinite(f) & (np.max(np.abs(g), axis=1) < 1e-3)
+    converged |= stalled
+    return x, converged
+
+
+def forecast(y: np.ndarray, params: np.ndarray, steps: int, order: tuple=(2, 1, 2), levels: list=()) -> tuple:
+    """
+    Mean forecasts (B, steps) and {level: (lower, upper)} bounds for fitted params.
+    """
+    with np.errstate(all='ignore'):
+        _, a, P = _filter(np.asarray(y, dtype=float), params, order)
+        T, RQR = _system(params, order)
+        obs = np.arange(order[1] + 1)
+        means, variances = [], []
+        for _ in range(steps):
+            means.append(a[:, obs].sum(axis=1))
+            variances.append(P[:, obs][:, :, obs].sum(axis=(1, 2)))
+            a = np.einsum('bij,bj->bi', T, a)
+            P = T @ P @ T.transpose(0, 2, 1) + RQR
+    mean = np.stack(means, axis=1)
+    sd = np.sqrt(np.maximum(np.stack(variances, axis=1), 0.0))
+    bounds = {}
+    for level in levels:
+        z = NormalDist().inv_cdf(0.5 + level / 200)
+        bounds[level] = (mean - z * sd, mean + z * sd)
+    return mean, bounds
+
+
+def fit_forecast(y: np.ndarray, steps: int, order: tuple=(2, 1, 2), levels: list=()) -> tuple:
+    """
+    Fit and forecast a (B, n) panel of series (left-padded with NaN).
+
+    Returns:
+        tuple: (mean (B, steps), bounds {level: (lower, upper)}, ok (B,) bool);
+        rows with ok False did not converge or gave non-finite forecasts
+    """
+    params, converged = fit(y, order)
+    mean, bounds = forecast(y, params, steps, order, levels)
+    ok = converged & np.all(np.isfinite(mean), axis=1)
+    for lower, upper in bounds.values():
+        ok &= np.all(np.isfinite(lower) & np.isfinite(upper), axis=1)
+    return mean, bounds, ok
@@ -2,16 +2,36 @@ from typing import List
 import numpy as np
 import pandas as pd
 import sqlite3
-from config.settings import DB_PATH
-from statsmodels.tsa.arima.model import ARIMA
+from config.settings import (
+    DB_PATH, FORECAST_ENGINE, FORECAST_INTERVAL_LEVELS, FORECAST_PER_CAPITA, FORECAST_RECONCILE,
+    FORECAST_SKIP_AGGREGATES, POPULATION_TREND_YEARS
+)
+import logging
+import time
 import warnings
+from statistics import NormalDist
 from numpy.linalg import LinAlgError
-from statsmodels.tools.sm_exceptions import ConvergenceWarning, ValueWarning
-import traceback
+from monitoring.metrics import counter, histogram, log_event
+from analysis import batch_arima
+from analysis.forecast_writer import ForecastWriter
+from analysis.reconcile import aggregate_keys, reconcile_forecasts
 
-warnings.filterwarnings("ignore", category=UserWarning, module="statsmodels.tsa")
-warnings.filterwarnings("ignore", category=ConvergenceWarning)
-warnings.filterwarnings("ignore", category=FutureWarning, module="statsmodels")
+FORECAST_ENGINES = ('statsmodels', 'batched')
+
+
+def _quiet_statsmodels():
+    """
+    Warning filters for ARIMA fits. statsmodels is imported here, on the first
+    fit, rather than at module load, and the filters are meant to be applied
+    inside warnings.catch_warnings() so they do not leak into the importer.
+    """
+    from statsmodels.tools.sm_exceptions import ConvergenceWarning, ValueWarning
+    warnings.filterwarnings("ignore", category=UserWarning, module="statsmodels.tsa")
+    warnings.filterwarnings("ignore", category=FutureWarning, module="statsmodels")
+    # numpy division warnings from the score/Hessian of degenerate fits (e.g. four-year series)
+    warnings.filterwarnings("ignore", category=RuntimeWarning, module="statsmodels")
+    warnings.simplefilter("ignore", category=ConvergenceWarning)
+    warnings.simplefilter("ignore", category=ValueWarning)
 
 
 def get_all_country_sector_combos() -> List[tuple[str, str]]:
@@ -28,6 +48,35 @@ def get_all_country_sector_combos() -> List[tuple[str, str]]:
     return combos
 
 
+def get_latest_population() -> dict:
+    """ Latest known population per country_name in emissions_data. """
+    conn = sqlite3.connect(DB_PATH)
+    query = """
+        SELECT country_name, population
+        FROM emissions_data e
+        WHERE population IS NOT NULL
+          AND year = (SELECT MAX(year) FROM emissions_data
+                      WHERE country_name = e.country_name AND population IS NOT NULL)
+        GROUP BY country_name;
+    """
+    rows = conn.execute(query).fetchall()
+    conn.close()
+    return dict(rows)
+
+
+def get_emissions_history() -> pd.DataFrame:
+    """ emissions_ktco2 of every series and year in emissions_data (for the reconciliation checks). """
+    conn = sqlite3.connect(DB_PATH)
+    query = """
+        SELECT country_name, sector_name, year, emissions_ktco2
+        FROM emissions_data;
+    """
+
+    df = pd.read_sql_query(query, conn)
+    conn.close()
+    return df
+
+
 def get_emissions_data(country_name: str, sector_name: str) -> pd.DataFrame:
     """ Retrieve emissions data from emissions_data table. """
     conn = sqlite3.connect(DB_PATH)
@@ -43,32 +92,142 @@ def get_emissions_data(country_name: str, sector_name: str) -> pd.DataFrame:
     return df
 
 
+def get_population_data() -> pd.DataFrame:
+    """ Population per country_name and year from emissions_data (identical across sectors). """
+    conn = sqlite3.connect(DB_PATH)
+    query = """
+        SELECT country_name, year, MAX(population) AS population
+        FROM emissions_data
+        WHERE population IS NOT NULL
+        GROUP BY country_name, year
+        ORDER BY country_name, year;
+    """
+    df = pd.read_sql_query(query, conn)
+    conn.close()
+    return df
+
+
+def forecast_population(population_df: pd.DataFrame, forecast_years: int=10, window: int | None=None) -> pd.DataFrame:
+    """
+    Population for every country over its observed years plus forecast_years.
+
+    One least-squares linear trend per country over its last `window` observed
+    years, fitted for all countries at once on a (country x year) matrix.
+    Population moves slowly and smoothly, so this replaces an ARIMA fit per country.
+
+    Returns:
+        pd.DataFrame: Indexed by country_name, one column per year (NaN before a country's first year)
+    """
+    window = POPULATION_TREND_YEARS if window is None else window
+    if population_df.empty:
+        return pd.DataFrame(dtype=float)
+    wide = population_df.pivot(index='country_name', columns='year', values='population').astype(float)
+    years = wide.columns.to_numpy(dtype=float)
+    values = wide.to_numpy()
+    observed = np.isfinite(values)
+
+    # last observed year per country and the window ending there
+    last_idx = values.shape[1] - 1 - np.argmax(observed[:, ::-1], axis=1)
+    last_year = years[last_idx]
+    weights = (observed & (years[None, :] > (last_year - window)[:, None])).astype(float)
+    n = weights.sum(axis=1)
+    y = np.where(observed, values, 0.0)
+    t_mean = (weights * years).sum(axis=1) / n
+    y_mean = (weights * y).sum(axis=1) / n
+    dt = years[None, :] - t_mean[:, None]
+    sxx = (weights * dt ** 2).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = np.where(sxx > 0, (weights * dt * (y - y_mean[:, None])).sum(axis=1) / sxx, 0.0)
+    # anchor the trend on the last observation so the series stays continuous
+    last_value = values[np.arange(len(values)), last_idx]
+
+    all_years = np.arange(int(years.min()), int(years.max()) + forecast_years + 1)
+    trend = last_value[:, None] + slope[:, None] * (all_years[None, :] - last_year[:, None])
+    out = pd.DataFrame(np.where(all_years[None, :] > last_year[:, None], trend, np.nan),
+                       index=wide.index, columns=all_years)
+    out.update(wide)
+    # population is never forecast below 1 person
+    return out.clip(lower=1)
+
+
+def _derived_per_capita(emissions_frame: pd.DataFrame, population: pd.Series) -> pd.DataFrame:
+    """ Per-capita forecast (and bounds) from an emissions forecast frame and population by year. """
+    pop = population.reindex(emissions_frame.index).to_numpy(dtype=float)
+    return emissions_frame * 1_000_000 / pop[:, None]
+
+
+# ---------- prediction intervals ----------
+def interval_columns(column: str, levels: list | None=None) -> list:
+    """ Names of the lower/upper bound columns stored next to `column`, e.g. forecast_emissions_ktco2_lower_80. """
+    levels = FORECAST_INTERVAL_LEVELS if levels is None else levels
+    return [f"{column}_{side}_{level}" for level in levels for side in ('lower', 'upper')]
+
+
+def output_columns(levels: list | None=None) -> list:
+    """ Forecast and bound columns of emissions_forecast (besides year, country_name and sector_name). """
+    metrics = ['forecast_emissions_ktco2', 'forecast_emissions_per_capita']
+    return metrics + [column for metric in metrics for column in interval_columns(metric, levels)]
+
+
+def _forecast_frame(years, mean, bounds: dict | None=None) -> pd.DataFrame:
+    """ Point forecast plus {level: (lower, upper)} as a frame indexed by year. """
+    columns = {'mean': np.asarray(mean, dtype=float)}
+    for level, (lower, upper) in (bounds or {}).items():
+        columns[f'lower_{level}'] = np.asarray(lower, dtype=float)
+        columns[f'upper_{level}'] = np.asarray(upper, dtype=float)
+    return pd.DataFrame(columns, index=years)
+
+
+def _fit_result_frame(pred, levels: list) -> pd.DataFrame:
+    """ Mean and intervals from one get_forecast result; conf_int reuses its forecast variance. """
+    # predicted_mean has PeriodIndex; convert to integer years
+    years_idx = [p.year for p in pred.predicted_mean.index]
+    bounds = {}
+    for level in levels:
+        ci = np.asarray(pred.conf_int(alpha=1 - level / 100))
+        bounds[level] = (ci[:, 0], ci[:, 1])
+    return _forecast_frame(years_idx, pred.predicted_mean.values, bounds)
+
+
 # ---------- helper fallback ----------
-def _linear_trend_forecast(series: pd.Series, steps: int) -> pd.Series:
-    """Fit linear trend (year->value) and extrapolate. series.index should be numeric year or PeriodIndex."""
+def _linear_trend_forecast(series: pd.Series, steps: int, levels: list=()) -> pd.DataFrame:
+    """
+    Fit linear trend (year->value) and extrapolate. series.index should be numeric year or PeriodIndex.
+    Prediction intervals use the residual standard deviation of the fit (NaN with fewer than 3 points).
+    """
     # get numeric years
     try:
         years = np.array(series.index.year if isinstance(series.index, pd.PeriodIndex) else series.index.astype(int), dtype=float)
     except Exception:
         years = np.arange(len(series), dtype=float)
     values = np.array(series.values, dtype=float)
+    no_bounds = {level: ([np.nan] * steps, [np.nan] * steps) for level in levels}
 
     if len(values) == 0:
-        return pd.Series([np.nan] * steps, index=[None]*steps)
+        return _forecast_frame([None] * steps, [np.nan] * steps, no_bounds)
+    last = int(years[-1])
+    future_years = np.arange(last + 1, last + 1 + steps)
     if len(values) == 1:
-        last = int(years[-1]) if len(years) else 0
-        return pd.Series([float(values[-1])] * steps, index=[last + i for i in range(1, steps+1)])
+        return _forecast_frame(future_years, [float(values[-1])] * steps, no_bounds)
 
     try:
         coeffs = np.polyfit(years, values, deg=1)
-        poly = np.poly1d(coeffs)
-        last_year = int(years[-1])
-        future_years = np.arange(last_year + 1, last_year + 1 + steps)
-        preds = poly(future_years)
-        return pd.Series(preds, index=future_years.astype(int))
+        preds = np.poly1d(coeffs)(future_years)
     except Exception:
-        last = int(years[-1])
-        return pd.Series([float(values[-1])] * steps, index=[last + i for i in range(1, steps+1)])
+        return _forecast_frame(future_years, [float(values[-1])] * steps, no_bounds)
+
+    n = len(values)
+    if n < 3:
+        return _forecast_frame(future_years, preds, no_bounds)
+    # standard error of a new observation at each future year
+    residual_sd = np.sqrt(np.sum((values - np.poly1d(coeffs)(years)) ** 2) / (n - 2))
+    sxx = np.sum((years - years.mean()) ** 2)
+    se = residual_sd * np.sqrt(1 + 1 / n + (future_years - years.mean()) ** 2 / sxx)
+    bounds = {}
+    for level in levels:
+        z = NormalDist().inv_cdf(0.5 + level / 200)
+        bounds[level] = (preds - z * se, preds + z * se)
+    return _forecast_frame(future_years, preds, bounds)
 
 # ---------- ensure index ----------
 def _ensure_year_period_index(s: pd.Series) -> pd.Series:
@@ -90,16 +249,48 @@ def _ensure_year_period_index(s: pd.Series) -> pd.Series:
         return s
 
 # ---------- core forecasting function ----------
+def _record_fit(series_name, path: str, started: float):
+    """ Count the optimizer path a series ended up on and how long it took. """
+    seconds = time.perf_counter() - started
+    counter('forecast_fits_total', 'Forecast fits by optimizer path').inc(path=path)
+    histogram('forecast_fit_seconds', 'Forecast fit time by optimizer path').observe(seconds, path=path)
+    log_event('forecast_fit', series=series_name, path=path, seconds=round(seconds, 4))
+
+
 def forecast_series(series: pd.Series, forecast_years=10, order=(2, 1, 2)):
     """
     Forecast a numeric time series with ARIMA but robust to numerical failures.
     Returns pandas.Series indexed by integer years (future years).
     """
+    return forecast_series_intervals(series, forecast_years, order, levels=[])['mean'].rename(None)
+
+
+def forecast_series_intervals(series: pd.Series, forecast_years=10, order=(2, 1, 2), levels: list | None=None) -> pd.DataFrame:
+    """
+    Point forecast and prediction intervals for a numeric time series from a single fit.
+
+    Tries ARIMA with the default L-BFGS optimizer, then Nelder-Mead, then a
+    linear trend; the path taken is recorded in the forecast_fits_total metric.
+
+    Parameters:
+        series (pd.Series): Values indexed by year
+        forecast_years (int): Number of years to forecast
+        order (tuple): ARIMA (p, d, q)
+        levels (list): Interval coverages in percent (default FORECAST_INTERVAL_LEVELS)
+
+    Returns:
+        pd.DataFrame: Indexed by future year, with 'mean' and 'lower_<level>' /
+        'upper_<level>' columns (NaN where no interval is available)
+    """
+    levels = FORECAST_INTERVAL_LEVELS if levels is None else levels
+    started = time.perf_counter()
+    series_name = series.name
     # copy & drop na
     s = series.dropna().copy()
     if s.empty:
         # fallback: return NaNs (or you can choose repeated-last-value)
-        return pd.Series([np.nan] * forecast_years, index=[None]*forecast_years)
+        _record_fit(series_name, 'empty', started)
+        return _linear_trend_forecast(s, forecast_years, levels)
 
     # Ensure PeriodIndex
     s = _ensure_year_period_index(s)
@@ -107,138 +298,360 @@ def forecast_series(series: pd.Series, forecast_years=10, order=(2, 1, 2)):
     # convert to numeric values and integer year index for final output
     last_year = int(s.index[-1].year)
 
+    from statsmodels.tsa.arima.model import ARIMA
+
     # try ARIMA (relaxed)
     try:
         with warnings.catch_warnings():
-            warnings.simplefilter("ignore", category=ConvergenceWarning)
-            warnings.simplefilter("ignore", category=ValueWarning)
+            _quiet_statsmodels()
             warnings.simplefilter("ignore", category=UserWarning)
             model = ARIMA(s, order=order, enforce_stationarity=False, enforce_invertibility=False)
             model_fit = model.fit()
-            pred = model_fit.get_forecast(steps=forecast_years)
-            # predicted_mean has PeriodIndex; convert to integer years
-            years_idx = [p.year for p in pred.predicted_mean.index]
-            return pd.Series(pred.predicted_mean.values, index=years_idx)
+            result = _fit_result_frame(model_fit.get_forecast(steps=forecast_years), levels)
+            _record_fit(series_name, 'lbfgs', started)
+            return result
     except (LinAlgError, np.linalg.LinAlgError) as lae:
-        print(f"[forecast_series] LinAlgError during ARIMA fit: {lae}")
+        log_event('forecast_fit_error', logging.WARNING, series=series_name, path='lbfgs',
+                  error=f"LinAlgError: {lae}")
     except Exception as e:
-        print(f"[forecast_series] ARIMA fit exception: {type(e).__name__}: {e}")
-        # print stack for container logs
-        traceback.print_exc()
+        log_event('forecast_fit_error', logging.WARNING, exc_info=True, series=series_name, path='lbfgs',
+                  error=f"{type(e).__name__}: {e}")
 
     # try alternative optimizer (Nelder-Mead)
     try:
         with warnings.catch_warnings():
-            warnings.simplefilter("ignore", category=ConvergenceWarning)
+            _quiet_statsmodels()
             model = ARIMA(s, order=order, enforce_stationarity=False, enforce_invertibility=False)
-            model_fit = model.fit(method='nm', disp=False, maxiter=500)
-            pred = model_fit.get_forecast(steps=forecast_years)
-            years_idx = [p.year for p in pred.predicted_mean.index]
-            return pd.Series(pred.predicted_mean.values, index=years_idx)
+            model_fit = model.fit(method_kwargs={'method': 'nm', 'maxiter': 500, 'disp': False})
+            result = _fit_result_frame(model_fit.get_forecast(steps=forecast_years), levels)
+            _record_fit(series_name, 'nm', started)
+            return result
     except Exception as e_nm:
-        print(f"[forecast_series] ARIMA (nm) fit failed: {type(e_nm).__name__}: {e_nm}")
-        traceback.print_exc()
+        log_event('forecast_fit_error', logging.WARNING, exc_info=True, series=series_name, path='nm',
+                  error=f"{type(e_nm).__name__}: {e_nm}")
 
     # fallback: linear trend
     try:
-        fallback = _linear_trend_forecast(pd.Series(s.values, index=[p.year for p in s.index]), forecast_years)
-        print("[forecast_series] Falling back to linear trend forecast.")
+        fallback = _linear_trend_forecast(pd.Series(s.values, index=[p.year for p in s.index]), forecast_years, levels)
+        _record_fit(series_name, 'linear', started)
         return fallback
     except Exception as e_f:
-        print(f"[forecast_series] Linear fallback failed: {type(e_f).__name__}: {e_f}")
-        traceback.print_exc()
+        log_event('forecast_fit_error', logging.WARNING, exc_info=True, series=series_name, path='linear',
+                  error=f"{type(e_f).__name__}: {e_f}")
         # last-resort: repeat last value
-        return pd.Series([float(s.values[-1])] * forecast_years, index=[last_year + i for i in range(1, forecast_years+1)])
+        _record_fit(series_name, 'last_value', started)
+        nan_bounds = {level: ([np.nan] * forecast_years, [np.nan] * forecast_years) for level in levels}
+        return _forecast_frame([last_year + i for i in range(1, forecast_years+1)], [float(s.values[-1])] * forecast_years, nan_bounds)
 
-# ---------- forecast_all with failure logging ----------
-def forecast_all(forecast_years=10):
+
+def forecast_batch_intervals(series_list: list, forecast_years=10, order=(2, 1, 2), levels: list | None=None) -> list:
     """
-    Forecast emissions and emissions_per_capita for all country/sector combinations.
-    If a series fails, we log the failure to a DB table and continue.
+    forecast_series_intervals for many series at once.
+
+    Series are fitted together by analysis.batch_arima (same model and
+    likelihood as statsmodels' ARIMA, vectorized across series; shorter series
+    are padded). Series that are too short, that do not converge, or any
+    series when d is 0 (statsmodels then adds a constant) go through
+    forecast_series_intervals.
+
+    Returns:
+        list: One frame per series, as returned by forecast_series_intervals
     """
-    combos = get_all_country_sector_combos()
-    results = []
-    failures = []
+    levels = FORECAST_INTERVAL_LEVELS if levels is None else levels
+    p, d, q = order
+    min_length = d + max(p, q + 1) + p + q + 2
+    cleaned = [series.dropna() for series in series_list]
+    frames = [None] * len(series_list)
+    members = [i for i, s in enumerate(cleaned) if len(s) >= min_length] if d >= 1 else []
+
+    if members:
+        started = time.perf_counter()
+        n = max(len(cleaned[i]) for i in members)
+        y = np.full((len(members), n), np.nan)
+        for row, i in enumerate(members):
+            y[row, n - len(cleaned[i]):] = cleaned[i].to_numpy(dtype=float)
+        mean, bounds, ok = batch_arima.fit_forecast(y, forecast_years, order, levels)
+        seconds = time.perf_counter() - started
+        for row, i in enumerate(members):
+            if not ok[row]:
+                continue
+            last = cleaned[i].index[-1]
+            last_year = int(last.year if isinstance(last, pd.Period) else last)
+            frames[i] = _forecast_frame(list(range(last_year + 1, last_year + 1 + forecast_years)), mean[row],
+                                        {level: (lower[row], upper[row]) for level, (lower, upper) in bounds.items()})
+            histogram('forecast_fit_seconds', 'Forecast fit time by optimizer path').observe(seconds / len(members), path='batched')
+        counter('forecast_fits_total', 'Forecast fits by optimizer path').inc(int(ok.sum()), path='batched')
+        log_event('forecast_batch', series=len(members), converged=int(ok.sum()), seconds=round(seconds, 4))
+
+    for i, frame in enumerate(frames):
+        if frame is None:
+            frames[i] = forecast_series_intervals(series_list[i], forecast_years, order, levels)
+    return frames
+
+
+# ---------- forecast_all with failure logging ----------
+def resolve_options(reconcile: str | None=None, skip_aggregates: bool | None=None, per_capita: str | None=None, engine: str | None=None) -> dict:
+    """ forecast_all options with the settings filled in for None, validated. """
+    reconcile = FORECAST_RECONCILE if reconcile is None else reconcile
+    skip_aggregates = FORECAST_SKIP_AGGREGATES if skip_aggregates is None else skip_aggregates
+    if skip_aggregates and reconcile != 'bottom_up':
+        raise ValueError("skip_aggregates requires bottom_up reconciliation")
+
+    per_capita = FORECAST_PER_CAPITA if per_capita is None else per_capita
+    if per_capita not in ('arima', 'derived'):
+        raise ValueError(f"Unknown per-capita mode {per_capita!r}; choose 'arima' or 'derived'")
+    engine = FORECAST_ENGINE if engine is None else engine
+    if engine not in FORECAST_ENGINES:
+        raise ValueError(f"Unknown forecast engine {engine!r}; choose from {FORECAST_ENGINES}")
+    return {'reconcile': reconcile, 'skip_aggregates': skip_aggregates, 'per_capita': per_capita, 'engine': engine}
+
 
+def forecast_columns(per_capita: str) -> tuple:
+    """ (emissions_data column, failure reason) of every series fitted per country/sector. """
+    columns = (('emissions_ktco2', 'emissions_error'), ('emissions_per_capita', 'percapita_error'))
+    return columns[:1] if per_capita == 'derived' else columns
+
+
+def get_histories(combos: list, skipped: set=()) -> tuple[list, list]:
+    """
+    History of every country/sector pair that can be fitted.
+
+    Returns:
+        tuple: ([(country, sector, DataFrame indexed by year)], [failure dicts]
+        for pairs with fewer than three years)
+    """
+    histories, failures = [], []
     for country, sector in combos:
+        if (country, sector) in skipped:
+            continue
         df = get_emissions_data(country, sector)
         if df.empty or len(df) < 3:
             # insufficient history; skip but record as failure with reason
             failures.append({'country_name': country, 'sector_name': sector, 'reason': 'insufficient_history'})
             continue
+        histories.append((country, sector, df.set_index('year')))
+    return histories, failures
 
-        df = df.set_index('year')
 
-        # Forecast emissions_ktco2
-        try:
-            emissions_forecast = forecast_series(df['emissions_ktco2'], forecast_years)
-        except Exception as e:
-            failures.append({'country_name': country, 'sector_name': sector, 'reason': f'emissions_error: {e}'})
-            emissions_forecast = pd.Series([np.nan]*forecast_years, index=list(range(df.index[-1]+1, df.index[-1]+1+forecast_years)))
+def _nan_forecast(last_year: int, forecast_years: int) -> pd.DataFrame:
+    nan_bounds = {level: ([np.nan] * forecast_years, [np.nan] * forecast_years) for level in FORECAST_INTERVAL_LEVELS}
+    return _forecast_frame(list(range(last_year + 1, last_year + 1 + forecast_years)), [np.nan] * forecast_years, nan_bounds)
 
-        # Forecast emissions_per_capita
-        try:
-            per_capita_forecast = forecast_series(df['emissions_per_capita'], forecast_years)
-        except Exception as e:
-            failures.append({'country_name': country, 'sector_name': sector, 'reason': f'percapita_error: {e}'})
-            per_capita_forecast = pd.Series([np.nan]*forecast_years, index=list(range(df.index[-1]+1, df.index[-1]+1+forecast_years)))
-
-        # Align indices and append results
-        forecast_years_idx = list(emissions_forecast.index)
-        for year, e_val, p_val in zip(forecast_years_idx,
-                                      emissions_forecast.values,
-                                      per_capita_forecast.values):
-            results.append({
-                'year': int(year),
-                'country_name': country,
-                'sector_name': sector,
-                'forecast_emissions_ktco2': float(e_val) if not np.isnan(e_val) else None,
-                'forecast_emissions_per_capita': float(p_val) if not np.isnan(p_val) else None
-            })
+
+def series_frame(country: str, frames: dict, population: pd.DataFrame=None) -> pd.DataFrame:
+    """
+    Forecast of one country/sector with the output column names, indexed by
+    year, from its per-column forecast frames ({'emissions_ktco2': frame, ...}
+    as returned by forecast_series_intervals). With population
+    (forecast_population output), per-capita values are derived from the
+    emissions forecast.
+    """
+    # mean -> forecast_<column>, lower_80 -> forecast_<column>_lower_80, ...
+    forecasts = {
+        column: frame.rename(columns=lambda c, column=column: f"forecast_{column}" if c == 'mean' else f"forecast_{column}_{c}")
+        for column, frame in frames.items()
+    }
+    if population is not None:
+        emissions_frame = forecasts['emissions_ktco2']
+        if country in population.index:
+            derived = _derived_per_capita(emissions_frame, population.loc[country])
+        else:
+            derived = emissions_frame * np.nan
+        forecasts['emissions_per_capita'] = derived.rename(
+            columns=lambda c: c.replace('emissions_ktco2', 'emissions_per_capita'))
+
+    return pd.concat([forecasts['emissions_ktco2'], forecasts['emissions_per_capita']], axis=1)
+
+
+def series_records(country: str, sector: str, frames: dict, population: pd.DataFrame=None) -> list:
+    """ Output rows (dicts, NaN as None) of one country/sector; see series_frame. """
+    records = []
+    frame = series_frame(country, frames, population)
+    for year, row in zip(frame.index, frame.to_dict(orient='records')):
+        record = {'year': int(year), 'country_name': country, 'sector_name': sector}
+        for key, value in row.items():
+            record[key] = float(value) if not np.isnan(value) else None
+        records.append(record)
+    return records
+
+
+def record_failures(failures: list, db_path: str | None=None):
+    """ Append failed series to the forecast_failures table. """
+    if not failures:
+        return
+    conn = sqlite3.connect(str(db_path or DB_PATH))
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS forecast_failures (
+                country_name TEXT,
+                sector_name TEXT,
+                reason TEXT
+            );
+        """)
+        cur.executemany("INSERT INTO forecast_failures (country_name, sector_name, reason) VALUES (?,?,?)",
+                        [(f['country_name'], f['sector_name'], f['reason']) for f in failures])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def finish_forecasts(results: list, reconcile: str, combos: list, skipped: set) -> pd.DataFrame:
+    """
+    Forecast rows to a frame, reconciled across the hierarchy of all combos if
+    requested. Skipped aggregates that cannot be built because a part has no
+    forecast are recorded in forecast_failures.
+    """
+    forecast_df = pd.DataFrame(results)
+    if reconcile:
+        started = time.perf_counter()
+        forecast_df = reconcile_forecasts(forecast_df, reconcile, keys=combos, population=get_latest_population(),
+                                          history=get_emissions_history())
+        built = set(zip(forecast_df['country_name'], forecast_df['sector_name'])) if not forecast_df.empty else set()
+        record_failures([{'country_name': country, 'sector_name': sector, 'reason': 'missing_parts'}
+                         for country, sector in sorted(skipped - built)])
+        log_event('forecast_reconciled', method=reconcile, series=len(combos), skipped=len(skipped),
+                  seconds=round(time.perf_counter() - started, 4))
+    return forecast_df
+
+
+def forecast_all(forecast_years=10, reconcile: str | None=None, skip_aggregates: bool | None=None, per_capita: str | None=None,
+                 engine: str | None=None):
+    """
+    Forecast emissions and emissions_per_capita for all country/sector combinations.
+    Each forecast carries prediction intervals at FORECAST_INTERVAL_LEVELS from the same fit.
+    If a series fails, we log the failure to a DB table and continue.
+
+    reconcile ('bottom_up', 'ols' or 'wls'; default FORECAST_RECONCILE) makes
+    the forecasts add up across countries and sectors (see analysis.reconcile).
+    With bottom_up and skip_aggregates, aggregate series are not fitted at all
+    but built from their parts.
+
+    per_capita ('arima' or 'derived'; default FORECAST_PER_CAPITA): with
+    'derived', per-capita forecasts and bounds are emissions * 1e6 / population
+    from forecast_population instead of a second ARIMA fit per series
+    (population uncertainty is ignored in the bounds).
+
+    engine ('statsmodels' or 'batched'; default FORECAST_ENGINE): 'batched'
+    fits all series together with forecast_batch_intervals.
+
+    analysis.worker runs the same fits through a task queue instead, spread
+    over any number of worker processes, and stream_forecasts writes them to
+    emissions_forecast as they finish instead of returning them.
+    """
+    options = resolve_options(reconcile, skip_aggregates, per_capita, engine)
+    combos = get_all_country_sector_combos()
+    population = forecast_population(get_population_data(), forecast_years) if options['per_capita'] == 'derived' else None
+    skipped = set(aggregate_keys(combos, get_emissions_history())) if options['skip_aggregates'] else set()
+    histories, failures = get_histories(combos, skipped)
+
+    results = []
+    for country, sector, frames in fit_histories(histories, forecast_years, options, failures):
+        results.extend(series_records(country, sector, frames, population))
 
     # write failures to DB
-    if failures:
-        conn = sqlite3.connect(DB_PATH)
+    record_failures(failures)
+    return finish_forecasts(results, options['reconcile'], combos, skipped)
+
+
+def fit_histories(histories: list, forecast_years: int, options: dict, failures: list):
+    """
+    Fit every column of every history (get_histories output), yielding
+    (country, sector, {column: forecast frame}) as each series finishes.
+    A column that fails is forecast as NaN and appended to failures.
+    """
+    columns = forecast_columns(options['per_capita'])
+    batched = {}
+    if options['engine'] == 'batched':
+        keys = [(country, sector, column) for country, sector, _ in histories for column, _ in columns]
+        series = [df[column].rename(f"{country}|{sector}|{column}") for country, sector, df in histories for column, _ in columns]
         try:
-            cur = conn.cursor()
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS forecast_failures (
-                    country_name TEXT,
-                    sector_name TEXT,
-                    reason TEXT
-                );
-            """)
-            cur.executemany("INSERT INTO forecast_failures (country_name, sector_name, reason) VALUES (?,?,?)",
-                            [(f['country_name'], f['sector_name'], f['reason']) for f in failures])
-            conn.commit()
-        finally:
-            conn.close()
-
-    return pd.DataFrame(results)
-
-
-def load_forecasts_to_db(forecast_df: pd.DataFrame):
-    """ Load forecast results into emissions_forecast table in SQLite. """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS emissions_forecast (
-            year INTEGER,
-            country_name TEXT,
-            sector_name TEXT,
-            forecast_emissions_ktco2 REAL,
-            forecast_emissions_per_capita REAL,
-            PRIMARY KEY (year, country_name, sector_name)
-        );
-    """)
-
-    forecast_df.to_sql('emissions_forecast', conn, if_exists='replace', index=False)
-    conn.close()
+            batched = dict(zip(keys, forecast_batch_intervals(series, forecast_years)))
+        except Exception as e:  # noqa: BLE001
+            # every series then goes through the per-series path below
+            log_event('forecast_batch_error', logging.WARNING, exc_info=True, error=f"{type(e).__name__}: {e}")
+
+    for country, sector, df in histories:
+        frames = {}
+        for column, reason in columns:
+            try:
+                frame = batched.pop((country, sector, column), None)
+                if frame is None:
+                    frame = forecast_series_intervals(df[column].rename(f"{country}|{sector}|{column}"), forecast_years)
+            except Exception as e:  # noqa: BLE001 - recorded as a failed series
+                failures.append({'country_name': country, 'sector_name': sector, 'reason': f'{reason}: {e}'})
+                frame = _nan_forecast(df.index[-1], forecast_years)
+            frames[column] = frame
+        yield country, sector, frames
+
+
+def stream_forecasts(forecast_years=10, reconcile: str | None=None, skip_aggregates: bool | None=None, per_capita: str | None=None,
+                     engine: str | None=None, batch_rows: int | None=None) -> int:
+    """
+    forecast_all, writing each series to emissions_forecast as soon as it is
+    fitted (see analysis.forecast_writer) instead of collecting every row first.
+
+    Reconciliation needs all base forecasts at once, so with reconcile the
+    forecasts are collected, reconciled and then written through the same
+    writer.
+
+    Returns:
+        int: Number of forecast rows written
+    """
+    options = resolve_options(reconcile, skip_aggregates, per_capita, engine)
+    if options['reconcile']:
+        forecast_df = forecast_all(forecast_years, **options)
+        return load_forecasts_to_db(forecast_df, batch_rows=batch_rows)
+
+    combos = get_all_country_sector_combos()
+    population = forecast_population(get_population_data(), forecast_years) if options['per_capita'] == 'derived' else None
+    histories, failures = get_histories(combos)
+    with ForecastWriter(output_columns(), db_path=DB_PATH, batch_rows=batch_rows) as writer:
+        for country, sector, frames in fit_histories(histories, forecast_years, options, failures):
+            writer.add(country, sector, series_frame(country, frames, population))
+    record_failures(failures)
+    print(f'Successfully streamed {writer.rows_written} forecast rows.')
+    return writer.rows_written
+
+
+def load_forecasts_to_db(forecast_df: pd.DataFrame, db_path: str | None=None, batch_rows: int | None=None) -> int:
+    """
+    Load forecast results (point forecasts and interval bounds) into the keyed
+    emissions_forecast table in SQLite, in batches (see analysis.forecast_writer).
+    """
+    with ForecastWriter(output_columns(), db_path=db_path or DB_PATH, batch_rows=batch_rows) as writer:
+        writer.add_frame(forecast_df)
     print(f'Successfully loaded forecasts for {len(forecast_df)} rows.')
+    return writer.rows_written
 
 
 if __name__ == "__main__":
+    import argparse
+
+    from analysis.reconcile import RECONCILE_METHODS
+    from config.settings import PROFILE_MODE
+    from monitoring.profiling import PROFILE_MODES, profile, resolve_mode, run_directory
+
+    parser = argparse.ArgumentParser(description="Forecast all country/sector series and load them into SQLite.")
+    parser.add_argument('--forecast-years', type=int, default=10)
+    parser.add_argument('--profile', nargs='?', const='cprofile', choices=PROFILE_MODES,
+                        help='Profile the run (cprofile, or sample for flame graphs)')
+    parser.add_argument('--reconcile', choices=RECONCILE_METHODS, default=FORECAST_RECONCILE or None,
+                        help='Make forecasts add up across countries and sectors')
+    parser.add_argument('--skip-aggregates', action='store_true', default=FORECAST_SKIP_AGGREGATES,
+                        help='With --reconcile bottom_up, build aggregates instead of fitting them')
+    parser.add_argument('--engine', choices=FORECAST_ENGINES, default=FORECAST_ENGINE,
+                        help='Fit series one by one with statsmodels, or all together (batched)')
+    parser.add_argument('--per-capita', choices=('arima', 'derived'), default=FORECAST_PER_CAPITA,
+                        help='Fit per-capita series, or derive them from emissions and a population trend')
+    args = parser.parse_args()
+    profile_mode = resolve_mode(args.profile or PROFILE_MODE)
+    profile_dir = run_directory() if profile_mode else None
+
     print("Generating ARIMA forecasts for all countries and sectors...")
-    forecasts_df = forecast_all(forecast_years=10)
-    load_forecasts_to_db(forecasts_df)
+    with profile('stream_forecasts', profile_mode, profile_dir):
+        stream_forecasts(forecast_years=args.forecast_years, reconcile=args.reconcile or '',
+                         skip_aggregates=args.skip_aggregates, per_capita=args.per_capita, engine=args.engine)
+    if profile_dir:
+        print(f"Profiles written to {profile_dir}")
     print("Forecasting completed.")
@@ -0,0 +1,150 @@
+"""
+Streaming writer for the emissions_forecast table.
+
+Forecast rows are copied into preallocated NumPy buffers (one year column,
+one float matrix for the forecast and bound columns, and the country/sector
+names) and flushed every `batch_rows` rows with one executemany
+INSERT OR REPLACE into the keyed table, committed per batch. Memory stays at
+one batch however many series are forecast, and every flushed batch survives
+a crash of the run.
+
+Rows from earlier runs are only replaced key by key while the run is going,
+so readers keep seeing a complete table. Once the writer closes without an
+error, rows this run did not write (series or years that no longer exist)
+are deleted.
+"""
+import sqlite3
+import time
+
+import numpy as np
+
+from config.settings import DB_PATH, FORECAST_WRITE_BATCH
+from monitoring.metrics import counter, log_event
+
+KEY_COLUMNS = ['year', 'country_name', 'sector_name']
+
+
+def create_forecast_table(conn: sqlite3.Connection, columns: list):
+    """
+    Create emissions_forecast keyed on (year, country_name, sector_name) with
+    the given REAL columns. A table with other columns or without the key (an
+    older interval configuration, or one written by to_sql) is recreated.
+    """
+    info = conn.execute("PRAGMA table_info(emissions_forecast)").fetchall()
+    if info:
+        existing = [row[1] for row in info]
+        key = [row[1] for row in sorted(info, key=lambda row: row[5]) if row[5]]
+        if existing != KEY_COLUMNS + list(columns) or key != KEY_COLUMNS:
+            conn.execute("DROP TABLE emissions_forecast")
+    value_columns = ''.join(f"            {column} REAL,\n" for column in columns)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS emissions_forecast (
+            year INTEGER,
+            country_name TEXT,
+            sector_name TEXT,
+{value_columns}            PRIMARY KEY (year, country_name, sector_name)
+        );
+    """)
+    # the lookup index of etl.load.create_indexes
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_forecast_series ON emissions_forecast(country_name, sector_name, year);")
+    conn.commit()
+
+
+class ForecastWriter:
+    """
+    Write forecasts to emissions_forecast as they are produced:
+
+        with ForecastWriter(columns) as writer:
+            for country, sector, frame in ...:
+                writer.add(country, sector, frame)
+    """
+
+    def __init__(self, columns: list, db_path: str | None=None, batch_rows: int | None=None):
+        self.columns = list(columns)
+        self.db_path = str(db_path or DB_PATH)
+        self.batch_rows = batch_rows or FORECAST_WRITE_BATCH
+        self.rows_written = 0
+        self._years = np.empty(self.batch_rows, dtype=np.int64)
+        self._countries = np.empty(self.batch_rows, dtype=object)
+        self._sectors = np.empty(self.batch_rows, dtype=object)
+        self._values = np.empty((self.batch_rows, len(self.columns)), dtype=float)
+        self._size = 0
+        self._conn = None
+        self._insert = (
+            f"INSERT OR REPLACE INTO emissions_forecast ({', '.join(KEY_COLUMNS + self.columns)}) "
+            f"VALUES ({', '.join('?' * (len(KEY_COLUMNS) + len(self.columns)))})"
+        )
+
+    def __enter__(self):
+        self._conn = sqlite3.connect(self.db_path)
+        create_forecast_table(self._conn, self.columns)
+        # keys written by this run, to drop the rest on close
+        self._conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS forecast_written
+            (year INTEGER, country_name TEXT, sector_name TEXT, PRIMARY KEY (year, country_name, sector_name))
+            WITHOUT ROWID
+        """)
+        self._conn.execute("DELETE FROM temp.forecast_written")
+        self._started = time.perf_counter()
+        return self
+
+    def add(self, country: str, sector: str, frame):
+        """ Buffer one series: a frame indexed by year with (a subset of) the writer's columns. """
+        years = np.asarray(frame.index, dtype=np.int64)
+        values = frame.reindex(columns=self.columns).to_numpy(dtype=float)
+        self._append(years, country, sector, values)
+
+    def add_frame(self, df):
+        """ Buffer a long frame with the key columns and (a subset of) the writer's columns. """
+        years = df['year'].to_numpy(dtype=np.int64)
+        countries = df['country_name'].to_numpy(dtype=object)
+        sectors = df['sector_name'].to_numpy(dtype=object)
+        values = df.reindex(columns=self.columns).to_numpy(dtype=float)
+        self._append(years, countries, sectors, values)
+
+    def _append(self, years, countries, sectors, values):
+        start = 0
+        while start < len(years):
+            n = min(len(years) - start, self.batch_rows - self._size)
+            rows = slice(self._size, self._size + n)
+            self._years[rows] = years[start:start + n]
+            self._countries[rows] = countries if isinstance(countries, str) else countries[start:start + n]
+            self._sectors[rows] = sectors if isinstance(sectors, str) else sectors[start:start + n]
+            self._values[rows] = values[start:start + n]
+            self._size += n
+            start += n
+            if self._size == self.batch_rows:
+                self.flush()
+
+    def flush(self):
+        """ Write and commit the buffered rows. """
+        if self._size == 0:
+            return
+        n = self._size
+        values = self._values[:n].astype(object)
+        values[np.isnan(self._values[:n])] = None
+        keys = list(zip(self._years[:n].tolist(), self._countries[:n], self._sectors[:n]))
+        with self._conn:
+            self._conn.executemany(self._insert, [key + tuple(row) for key, row in zip(keys, values.tolist())])
+            self._conn.executemany("INSERT OR IGNORE INTO temp.forecast_written VALUES (?, ?, ?)", keys)
+        self.rows_written += n
+        self._size = 0
+        counter('forecast_rows_written_total', 'Forecast rows written to emissions_forecast').inc(n)
+
+    def __exit__(self, exc_type, *exc):
+        try:
+            # whatever was forecast before a failure is kept
+            self.flush()
+            if exc_type is None:
+                with self._conn:
+                    stale = self._conn.execute("""
+                        DELETE FROM emissions_forecast
+                        WHERE (year, country_name, sector_name) NOT IN
+                              (SELECT year, country_name, sector_name FROM temp.forecast_written)
+                    """).rowcount
+                log_event('forecast_written', rows=self.rows_written, stale=stale,
+                          seconds=round(time.perf_counter() - self._started, 4))
+        finally:
+            self._conn.close()
+            self._conn = None
+        return False
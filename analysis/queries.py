@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from config.settings import DB_PATH
+from etl.readiness import db_fingerprint
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# pandas/NumPy are imported inside the functions that build DataFrames, so the
+# API (which only needs plain rows) starts without them.
+
+# One reusable read connection per (thread, database file)
+_local = threading.local()
+
+
+def get_connection(db_path: str | None=None) -> sqlite3.Connection:
+    """
+    Return a cached SQLite connection for the current thread.
+
+    Connections are keyed by path and inode, so a database file that has been
+    swapped out underneath us gets a fresh connection instead of a stale handle.
+    """
+    path = str(db_path or DB_PATH)
+    try:
+        inode = os.stat(path).st_ino
+    except FileNotFoundError:
+        inode = None
+
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    key = (path, inode)
+    conn = connections.get(key)
+    if conn is None:
+        # drop handles to previous versions of the same file
+        for old_key in [k for k in connections if k[0] == path]:
+            connections.pop(old_key).close()
+        conn = sqlite3.connect(path)
+        connections[key] = conn
+    return conn
+
+
+def close_connections():
+    """ Close all cached connections held by the current thread. """
+    connections = getattr(_local, 'connections', {})
+    for conn in connections.values():
+        conn.close()
+    connections.clear()
+
+
+def get_data_version(db_path: str | None=None) -> str | None:
+    """
+    Return a cheap fingerprint of the database contents, or None if it does not exist.
+
+    Changes whenever the file is rewritten, so it can be used as a cache key.
+    """
+    return db_fingerprint(db_path)
+
+
+# Prediction interval columns written by analysis.forecast, e.g. forecast_emissions_ktco2_lower_80
+_BOUND_COLUMN = re.compile(r'^forecast_(emissions_ktco2|emissions_per_capita)_(lower|upper)_(\d+)$')
+
+
+def _has_table(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+
+@lru_cache(maxsize=8)
+def _forecast_layout(path: str, version: str | None) -> tuple | None:
+    """ Bound columns of emissions_forecast in one version of a database, None before the first forecast. """
+    conn = get_connection(path)
+    if not _has_table(conn, 'emissions_forecast'):
+        return None
+    return tuple(row[1] for row in conn.execute("PRAGMA table_info(emissions_forecast)") if _BOUND_COLUMN.match(row[1]))
+
+
+def has_forecasts(db_path: str | None=None) -> bool:
+    """ Whether emissions_forecast exists yet (a loaded database is only forecast later). """
+    path = str(db_path or DB_PATH)
+    return _forecast_layout(path, get_data_version(path)) is not None
+
+
+def forecast_bound_columns(db_path: str | None=None) -> list:
+    """ Interval bound columns present in emissions_forecast (none for older databases). """
+    path = str(db_path or DB_PATH)
+    return list(_forecast_layout(path, get_data_version(path)) or ())
+
+
+def query_series_rows(country: str, sector: str, db_path: str | None=None) -> tuple[list, list, float]:
+    """
+    Plain-row version of query_series.
+
+    Returns:
+        tuple: (column names, row tuples, DB time in ms)
+    """
+    bounds = forecast_bound_columns(db_path)
+    hist_bounds = ''.join(f", NULL AS {column[len('forecast_'):]}" for column in bounds)
+    forecast_bounds = ''.join(f", {column}" for column in bounds)
+    query = f"""
+        SELECT 'historical' AS source, year, emissions_ktco2, emissions_per_capita{hist_bounds}
+        FROM emissions_data
+        WHERE country_name = ? AND sector_name = ?
+    """
+    params = (country, sector)
+    if has_forecasts(db_path):
+        query += f"""
+        UNION ALL
+        SELECT 'forecast' AS source, year, forecast_emissions_ktco2, forecast_emissions_per_capita{forecast_bounds}
+        FROM emissions_forecast
+        WHERE country_name = ? AND sector_name = ?
+        """
+        params *= 2
+    query += " ORDER BY source DESC, year"
+    conn = get_connection(db_path)
+    start = time.perf_counter()
+    cursor = conn.execute(query, params)
+    rows = cursor.fetchall()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return [c[0] for c in cursor.description], rows, elapsed_ms
+
+
+def query_series(country: str, sector: str, db_path: str | None=None) -> pd.DataFrame:
+    """
+    Return historical and forecast values for one country/sector in a single query.
+
+    Parameters:
+        country (str): Country name, e.g. 'Germany'
+        sector (str): Sector name, e.g. 'Energy'
+        db_path (str): Database to query (defaults to config DB_PATH)
+
+    Returns:
+        pd.DataFrame: [source, year, emissions_ktco2, emissions_per_capita] where
+        source is 'historical' or 'forecast', followed by the forecast interval
+        bounds (emissions_ktco2_lower_80, ...; NULL on historical rows). The time
+        spent in the database is stored in df.attrs['db_time_ms'].
+    """
+    import pandas as pd
+
+    columns, rows, elapsed_ms = query_series_rows(country, sector, db_path)
+    df = pd.DataFrame(rows, columns=columns)
+    df.attrs['db_time_ms'] = elapsed_ms
+    return df
+
+
+# Historical column -> matching forecast column
+SERIES_METRICS = {
+    'emissions_ktco2': 'forecast_emissions_ktco2',
+    'emissions_per_capita': 'forecast_emissions_per_capita',
+}
+
+
+def query_series_batch(countries: list, sectors: list | None=None, metric: str='emissions_ktco2',
+                       db_path: str | None=None) -> pd.DataFrame:
+    """
+    Return historical and forecast values of one metric for many series in a single query.
+
+    Parameters:
+        countries (list): Country names to include
+        sectors (list): Sector names to include (None for all sectors)
+        metric (str): 'emissions_ktco2' or 'emissions_per_capita'
+        db_path (str): Database to query (defaults to config DB_PATH)
+
+    Returns:
+        pd.DataFrame: [source, country_name, sector_name, year, value], with the
+        DB time in df.attrs['db_time_ms'].
+    """
+    if metric not in SERIES_METRICS:
+        raise ValueError(f"Unknown metric: {metric}")
+    import pandas as pd
+
+    if not countries:
+        return pd.DataFrame(columns=['source', 'country_name', 'sector_name', 'year', 'value'])
+
+    where = f"country_name IN ({','.join('?' * len(countries))})"
+    params = list(countries)
+    if sectors:
+        where += f" AND sector_name IN ({','.join('?' * len(sectors))})"
+        params += list(sectors)
+
+    query = f"""
+        SELECT 'historical' AS source, country_name, sector_name, year, {metric} AS value
+        FROM emissions_data
+        WHERE {where}
+    """
+    if has_forecasts(db_path):
+        query += f"""
+        UNION ALL
+        SELECT 'forecast' AS source, country_name, sector_name, year, {SERIES_METRICS[metric]} AS value
+        FROM emissions_forecast
+        WHERE {where}
+        """
+        params *= 2
+    query += " ORDER BY country_name, sector_name, source DESC, year"
+    conn = get_connection(db_path)
+    start = time.perf_counter()
+    cursor = conn.execute(query, params)
+    rows = cursor.fetchall()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    df = pd.DataFrame(rows, columns=[c[0] for c in cursor.description])
+    df.attrs['db_time_ms'] = elapsed_ms
+    return df
+
+
+def split_series(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """ Split a query_series result into (historical, forecast) frames. """
+    hist_df = df[df['source'] == 'historical'].reset_index(drop=True)
+    forecast_df = df[df['source'] == 'forecast'].reset_index(drop=True)
+    return hist_df, forecast_df
+
+
+def _records(cursor: sqlite3.Cursor) -> list:
+    columns = [c[0] for c in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def query_as_of(country: str, sector: str, release_date: str, start_year: int | None=None, end_year: int | None=None,
+                db_path: str | None=None) -> list:
+    """
+    Historical values of one series as published in the release current on release_date.
+
+    Reconstructed from emissions_revisions (see etl.vintages): for every year,
+    the latest revision at or before release_date, unless that revision
+    removed the year.
+
+    Returns:
+        list: emissions_data-shaped dicts ordered by year (empty if no vintage
+        covers the date or the database has no revision history)
+    """
+    conn = get_connection(db_path)
+    if not _has_table(conn, 'emissions_revisions'):
+        return []
+    query = """
+        SELECT r.year, r.sector_name, r.country_name, r.emissions_ktco2, r.emissions_per_capita
+        FROM emissions_revisions r
+        WHERE r.country_name = ? AND r.sector_name = ?
+          AND r.release_date = (
+              SELECT MAX(release_date) FROM emissions_revisions
+              WHERE country_name = r.country_name AND sector_name = r.sector_name
+                AND year = r.year AND release_date <= ?)
+          AND r.change != 'removed'
+    """
+    params = [country, sector, release_date]
+    if start_year is not None:
+        query += " AND r.year >= ?"
+        params.append(start_year)
+    if end_year is not None:
+        query += " AND r.year <= ?"
+        params.append(end_year)
+    return _records(conn.execute(query + " ORDER BY r.year", params))
+
+
+def query_revisions(country: str, sector: str, year: int | None=None, db_path: str | None=None) -> list:
+    """ Every recorded vintage of one series' values (optionally one year), oldest release first. """
+    conn = get_connection(db_path)
+    if not _has_table(conn, 'emissions_revisions'):
+        return []
+    query = """
+        SELECT release_date, year, emissions_ktco2, emissions_per_capita, population, change
+        FROM emissions_revisions
+        WHERE country_name = ? AND sector_name = ?
+    """
+    params = [country, sector]
+    if year is not None:
+        query += " AND year = ?"
+        params.append(year)
+    return _records(conn.execute(query + " ORDER BY year, release_date", params))
+
+
+def list_vintages(db_path: str | None=None) -> list:
+    """ Recorded releases with their change counts, oldest first. """
+    conn = get_connection(db_path)
+    if not _has_table(conn, 'emissions_vintages'):
+        return []
+    return _records(conn.execute(
+        "SELECT release_date, loaded_at, rows, new, revised, removed FROM emissions_vintages ORDER BY release_date"
+    ))
+
+
+def _rounded(values: pd.Series, decimals: int) -> list:
+    """ Round a float column and turn NaN into None for JSON. """
+    import numpy as np
+
+    arr = np.round(values.to_numpy(dtype=float), decimals)
+    return [None if np.isnan(v) else v for v in arr.tolist()]
+
+
+def build_series_bundle(db_path: str | None=None) -> dict:
+    """
+    Export every historical and forecast series as compact columnar arrays.
+
+    Series are identified by their position in `keys` ('country|||sector',
+    matching the dashboard dropdown values). For each source, the rows of
+    series i are the slice offsets[i]:offsets[i + 1] of the value arrays.
+
+    The forecast part also carries any interval bound arrays
+    (emissions_ktco2_lower_80, ...).
+
+    Returns:
+        dict: {'keys': [...], 'historical': {...}, 'forecast': {...}}
+    """
+    import numpy as np
+    import pandas as pd
+
+    conn = get_connection(db_path)
+    hist_df = pd.read_sql_query("""
+        SELECT country_name, sector_name, year, emissions_ktco2, emissions_per_capita
+        FROM emissions_data
+    """, conn)
+    bounds = forecast_bound_columns(db_path)
+    try:
+        forecast_df = pd.read_sql_query(f"""
+            SELECT country_name, sector_name, year,
+                   forecast_emissions_ktco2 AS emissions_ktco2,
+                   forecast_emissions_per_capita AS emissions_per_capita
+                   {''.join(f", {column} AS {column[len('forecast_'):]}" for column in bounds)}
+            FROM emissions_forecast
+        """, conn)
+    except (pd.errors.DatabaseError, sqlite3.OperationalError):
+        # forecasts not generated yet
+        forecast_df = hist_df.iloc[0:0]
+
+    hist_keys = hist_df['country_name'] + '|||' + hist_df['sector_name']
+    forecast_keys = forecast_df['country_name'] + '|||' + forecast_df['sector_name']
+    keys = sorted(set(hist_keys) | set(forecast_keys))
+
+    bundle = {'keys': keys}
+    for source, df, df_keys in (('historical', hist_df, hist_keys), ('forecast', forecast_df, forecast_keys)):
+        codes = pd.Categorical(df_keys, categories=keys).codes
+        order = np.lexsort((df['year'].to_numpy(), codes))
+        df = df.iloc[order]
+        counts = np.bincount(codes, minlength=len(keys))
+        bundle[source] = {
+            'offsets': np.concatenate([[0], np.cumsum(counts)]).tolist(),
+            'year': df['year'].astype(int).tolist(),
+            'emissions_ktco2': _rounded(df['emissions_ktco2'], 3),
+            'emissions_per_capita': _rounded(df['emissions_per_capita'], 2),
+        }
+        # forecast interval bounds, e.g. emissions_ktco2_lower_80
+        for column in df.columns[5:]:
+            bundle[source][column] = _rounded(df[column], 2 if column.startswith('emissions_per_capita') else 3)
+    return bundle
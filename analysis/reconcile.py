@@ -0,0 +1,302 @@
+"""
+Hierarchical forecast reconciliation.
+
+Country/sector series form a grouped hierarchy:
+  - each country's total sector is the sum of its other sectors
+  - each sector of the aggregate geo (EU27_2020) is the sum of that sector
+    over the member states, and the aggregate total the sum of everything
+An aggregate whose history does not add up (see incoherent_aggregates) is
+treated as a bottom-level series instead.
+
+Base forecasts fitted independently do not add up. Reconciliation maps all
+base forecasts y (one row per series) to coherent ones S G y, where S is the
+summing matrix from the bottom-level series to every series:
+  - bottom_up: G picks the bottom-level forecasts
+  - ols:       G = (S'S)^-1 S'
+  - wls:       G = (S'W^-1 S)^-1 S'W^-1, W the diagonal of forecast variances
+               (from the stored prediction intervals), or of the number of
+               bottom series below each node when intervals are missing
+Every forecast year and both metrics are reconciled in one matrix product.
+"""
+import logging
+import warnings
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from config.settings import (
+    AGGREGATE_GEO,
+    AGGREGATE_GEO_EXCLUDES,
+    COUNTRY_MAP,
+    FORECAST_INTERVAL_LEVELS,
+    FORECAST_RECONCILE_TOLERANCE,
+    SECTOR_MAP,
+    TOTAL_SECTOR,
+)
+from monitoring.metrics import log_event
+
+RECONCILE_METHODS = ('bottom_up', 'ols', 'wls')
+
+AGGREGATE_NAME = COUNTRY_MAP[AGGREGATE_GEO]
+TOTAL_NAME = SECTOR_MAP[TOTAL_SECTOR]
+MEMBER_NAMES = sorted(
+    name for code, name in COUNTRY_MAP.items()
+    if code != AGGREGATE_GEO and code not in AGGREGATE_GEO_EXCLUDES
+)
+
+
+def build_hierarchy(keys: list, standalone: list=()) -> tuple[list, list, np.ndarray]:
+    """
+    Summing matrix for the (country_name, sector_name) series in keys.
+
+    A series with no parts among keys (e.g. a country that only reports its
+    total), or listed in standalone, is treated as a bottom-level series itself.
+
+    Returns:
+        tuple: (nodes, bottom, S) with nodes in input order, bottom the
+        bottom-level series and S of shape (len(nodes), len(bottom))
+    """
+    nodes = list(dict.fromkeys(tuple(k) for k in keys))
+    present = set(nodes)
+    standalone = {tuple(k) for k in standalone}
+    sectors_of = {}
+    for country, sector in nodes:
+        sectors_of.setdefault(country, []).append(sector)
+
+    def country_parts(country: str, sector: str) -> set:
+        if sector != TOTAL_NAME:
+            return {(country, sector)} if (country, sector) in present else set()
+        parts = {(country, s) for s in sectors_of.get(country, []) if s != TOTAL_NAME}
+        if parts:
+            return parts
+        return {(country, sector)} if (country, sector) in present else set()
+
+    def parts(node: tuple) -> set:
+        country, sector = node
+        if node in standalone:
+            return {node}
+        if country == AGGREGATE_NAME:
+            from_members = set().union(*(country_parts(m, sector) for m in MEMBER_NAMES))
+            if from_members:
+                return from_members
+        return country_parts(country, sector) or {node}
+
+    leaves_of = {node: parts(node) for node in nodes}
+    bottom = sorted(set().union(*leaves_of.values())) if nodes else []
+    column = {leaf: j for j, leaf in enumerate(bottom)}
+    S = np.zeros((len(nodes), len(bottom)))
+    for i, node in enumerate(nodes):
+        for leaf in leaves_of[node]:
+            S[i, column[leaf]] = 1.0
+    return nodes, bottom, S
+
+
+def incoherent_aggregates(keys: list, history: pd.DataFrame, rtol: float | None=None) -> list:
+    """
+    The aggregates in keys whose history is not the sum of their parts.
+
+    A part without a value in a year counts as zero there: etl.transform drops
+    non-positive values, so a total that includes a net sink (e.g. LULUCF) is
+    larger than what is left of its parts in those years. Each aggregate is
+    compared over the years it and at least one of its parts have a value,
+    and is incoherent if any year is off by more than rtol (default
+    FORECAST_RECONCILE_TOLERANCE) of its own value.
+
+    Parameters:
+        keys (list): (country_name, sector_name) series
+        history (pd.DataFrame): country_name, sector_name, year and emissions_ktco2 rows
+    """
+    rtol = FORECAST_RECONCILE_TOLERANCE if rtol is None else rtol
+    nodes, bottom, S = build_hierarchy(keys)
+    if history.empty or not nodes:
+        return []
+    values = _wide(history, 'emissions_ktco2', nodes, sorted(history['year'].unique()))
+    row = {node: i for i, node in enumerate(nodes)}
+    leaves = values[[row[leaf] for leaf in bottom]]
+    sums = S @ np.nan_to_num(leaves)
+    overlap = np.isfinite(values) & ((S @ np.isfinite(leaves)) > 0)
+    with np.errstate(invalid='ignore'):
+        off = overlap & (np.abs(values - sums) > rtol * np.abs(values))
+    bottom = set(bottom)
+    return [node for node, bad in zip(nodes, off.any(axis=1)) if bad and node not in bottom]
+
+
+def aggregate_keys(keys: list, history: pd.DataFrame | None=None) -> list:
+    """ The series in keys that are sums of other series in keys (and, given their history, add up). """
+    standalone = incoherent_aggregates(keys, history) if history is not None else ()
+    nodes, bottom, _ = build_hierarchy(keys, standalone)
+    bottom = set(bottom)
+    return [node for node in nodes if node not in bottom]
+
+
+def reconciliation_matrix(S: np.ndarray, method: str, variances: np.ndarray=None) -> np.ndarray:
+    """ G of shape (n_bottom, n_nodes) such that S @ G @ base is coherent. """
+    n_nodes, n_bottom = S.shape
+    if method == 'bottom_up':
+        G = np.zeros((n_bottom, n_nodes))
+        # each bottom series is its own row of S with a single 1
+        for j in range(n_bottom):
+            rows = np.flatnonzero((S[:, j] == 1) & (S.sum(axis=1) == 1))
+            G[j, rows[0]] = 1.0
+        return G
+    if method == 'ols':
+        return np.linalg.solve(S.T @ S, S.T)
+    if method == 'wls':
+        if variances is None or not np.all(np.isfinite(variances)) or np.any(variances <= 0):
+            # structural scaling: variance proportional to the number of parts
+            variances = S.sum(axis=1)
+        StW = S.T / variances
+        return np.linalg.solve(StW @ S, StW)
+    raise ValueError(f"Unknown reconciliation method {method!r}; choose from {RECONCILE_METHODS}")
+
+
+def reconcile(base: np.ndarray, S: np.ndarray, method: str, variances: np.ndarray=None) -> np.ndarray:
+    """
+    Reconcile base forecasts of shape (n_nodes, n_columns) in one pass.
+
+    Bottom series without a base forecast in a column are missing parts:
+    aggregates over them keep their base forecast, unreconciled (NaN if they
+    have none), rather than being forced to the sum of the parts that are
+    left. The rest of the hierarchy is reconciled without them, and
+    aggregates without a base forecast whose parts are all available are
+    built from the reconciled parts.
+    """
+    out = np.full(base.shape, np.nan)
+    finite = np.isfinite(base)
+    picks = reconciliation_matrix(S, 'bottom_up')
+    # columns with the same missing series share one reconciliation matrix
+    patterns = {}
+    for j in range(base.shape[1]):
+        patterns.setdefault(finite[:, j].tobytes(), []).append(j)
+    for columns in patterns.values():
+        have = finite[:, columns[0]]
+        parts = (picks @ have) > 0
+        complete = (S @ ~parts) == 0
+        rows = complete & have
+        if rows.any():
+            G = reconciliation_matrix(S[np.ix_(rows, parts)], method, None if variances is None else variances[rows])
+            out[np.ix_(complete, columns)] = S[np.ix_(complete, parts)] @ (G @ base[np.ix_(rows, columns)])
+        partial = have & ~complete
+        out[np.ix_(partial, columns)] = base[np.ix_(partial, columns)]
+    return out
+
+
+def incomplete_nodes(base: np.ndarray, S: np.ndarray, nodes: list) -> list:
+    """ The aggregates in nodes with a part that has no base forecast in some column. """
+    missing = (reconciliation_matrix(S, 'bottom_up') @ np.isfinite(base)) == 0
+    affected = ((S @ missing) > 0).any(axis=1) & (S.sum(axis=1) > 1)
+    return [node for node, hit in zip(nodes, affected) if hit]
+
+
+def _wide(df: pd.DataFrame, column: str, nodes: list, years: list) -> np.ndarray:
+    wide = df.pivot_table(index=['country_name', 'sector_name'], columns='year', values=column, aggfunc='first', dropna=False)
+    wide = wide.reindex(index=pd.MultiIndex.from_tuples(nodes), columns=years)
+    return wide.to_numpy(dtype=float)
+
+
+def reconcile_forecasts(forecast_df: pd.DataFrame, method: str, keys: list | None=None,
+                        population: dict | None=None, levels: list | None=None,
+                        history: pd.DataFrame | None=None) -> pd.DataFrame:
+    """
+    Reconcile the emissions forecasts of forecast_all output.
+
+    Parameters:
+        forecast_df (pd.DataFrame): forecast_all output (one row per series and year)
+        method (str): 'bottom_up', 'ols' or 'wls'
+        keys (list): All (country_name, sector_name) series, including ones
+            that were not fitted; defaults to the series in forecast_df
+        population (dict): Latest population per country_name, used for the
+            per-capita values of series that were not fitted
+        levels (list): Interval levels stored in forecast_df
+        history (pd.DataFrame): Historical emissions_ktco2 per series and
+            year; aggregates that do not add up in it are reconciled as
+            bottom-level series (see incoherent_aggregates) and logged
+
+    Per-capita forecasts are scaled by the same factor as the emissions of
+    their series. Interval bounds are shifted with the point forecast; bounds
+    of unfitted aggregates built from their parts combine the parts'
+    half-widths assuming independent errors. Aggregates with a part that has
+    no forecast are left as forecast (see reconcile) and logged, or dropped if
+    they were not fitted either.
+
+    Returns:
+        pd.DataFrame: Same columns, one row per series in keys and year
+    """
+    if method not in RECONCILE_METHODS:
+        raise ValueError(f"Unknown reconciliation method {method!r}; choose from {RECONCILE_METHODS}")
+    if forecast_df.empty:
+        return forecast_df
+    levels = FORECAST_INTERVAL_LEVELS if levels is None else levels
+    fitted = list(dict.fromkeys(zip(forecast_df['country_name'], forecast_df['sector_name'])))
+    keys = keys if keys is not None else fitted
+    incoherent = incoherent_aggregates(keys, history) if history is not None else []
+    if incoherent:
+        log_event('forecast_reconcile_incoherent', logging.WARNING, method=method, series=len(incoherent),
+                  examples=[list(n) for n in incoherent[:5]])
+    nodes, bottom, S = build_hierarchy(keys, incoherent)
+    unfitted = set(nodes) - set(fitted)
+
+    years = sorted(forecast_df['year'].unique())
+    ktco2 = 'forecast_emissions_ktco2'
+    per_capita = 'forecast_emissions_per_capita'
+    base = _wide(forecast_df, ktco2, nodes, years)
+
+    variances = None
+    bound_level = next((lv for lv in levels if f"{ktco2}_lower_{lv}" in forecast_df.columns), None)
+    if method == 'wls' and bound_level is not None:
+        z = NormalDist().inv_cdf(0.5 + bound_level / 200)
+        half = (_wide(forecast_df, f"{ktco2}_upper_{bound_level}", nodes, years)
+                - _wide(forecast_df, f"{ktco2}_lower_{bound_level}", nodes, years)) / 2
+        if np.isfinite(half).all(axis=1).any():
+            # average variance over the horizon; nodes without bounds fall back to structural weights
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                variances = np.nanmean((half / z) ** 2, axis=1)
+
+    reconciled = reconcile(base, S, method, variances)
+    incomplete = incomplete_nodes(base, S, nodes)
+    if incomplete:
+        log_event('forecast_reconcile_incomplete', logging.WARNING, method=method, series=len(incomplete),
+                  missing_parts=sum(1 for node in bottom if node in unfitted), examples=[list(n) for n in incomplete[:5]])
+    adjustment = reconciled - base
+
+    out = {
+        'country_name': np.repeat([n[0] for n in nodes], len(years)),
+        'sector_name': np.repeat([n[1] for n in nodes], len(years)),
+        'year': np.tile(np.asarray(years, dtype=int), len(nodes)),
+        ktco2: reconciled.ravel(),
+    }
+
+    # per capita follows the emissions of the same series
+    base_pc = _wide(forecast_df, per_capita, nodes, years)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pc = np.where(np.isfinite(base) & (base != 0), base_pc * reconciled / base, np.nan)
+    if unfitted and population:
+        pop = np.array([population.get(n[0], np.nan) for n in nodes], dtype=float)[:, None]
+        missing = ~np.isfinite(base)
+        pc = np.where(missing, reconciled * 1_000_000 / pop, pc)
+    out[per_capita] = pc.ravel()
+
+    for level in levels:
+        for metric, values, base_values in ((ktco2, reconciled, base), (per_capita, pc, base_pc)):
+            lower_col, upper_col = f"{metric}_lower_{level}", f"{metric}_upper_{level}"
+            if lower_col not in forecast_df.columns:
+                continue
+            lower = _wide(forecast_df, lower_col, nodes, years)
+            upper = _wide(forecast_df, upper_col, nodes, years)
+            shift = adjustment if metric == ktco2 else values - base_values
+            lower, upper = lower + shift, upper + shift
+            if unfitted:
+                # unfitted aggregates: parts' half-widths combined as independent errors
+                G = reconciliation_matrix(S, 'bottom_up')
+                half = np.sqrt(S @ (G @ np.nan_to_num(((upper - lower) / 2) ** 2)))
+                missing = ~np.isfinite(base)
+                lower = np.where(missing, values - half, lower)
+                upper = np.where(missing, values + half, upper)
+            out[lower_col], out[upper_col] = lower.ravel(), upper.ravel()
+
+    result = pd.DataFrame(out)
+    result = result[np.isfinite(result[ktco2])].reset_index(drop=True)
+    columns = [c for c in forecast_df.columns if c in result.columns]
+    return result[columns]
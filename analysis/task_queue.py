@@ -0,0 +1,280 @@
+"""
+Durable task queue in a SQLite file.
+
+Any number of processes, in any container that mounts the same (local) data
+volume, can share one queue file:
+  - create_run() adds a run: its parameters plus one task per unit of work
+  - claim() hands up to `limit` tasks to a worker under a lease that expires
+    after QUEUE_LEASE_SECONDS unless the worker renews it (heartbeat, or
+    LeaseKeeper in a background thread)
+  - complete() / fail() end a claim; failed tasks are retried with
+    exponential backoff until QUEUE_MAX_ATTEMPTS, then stay 'failed'
+  - a task whose lease expired (the worker died or hung) is claimed again by
+    the next worker, and counts as an attempt
+
+Claims run in BEGIN IMMEDIATE transactions, so two workers never get the same
+task, and complete() / fail() only apply while the caller still holds the
+lease. The file uses WAL mode, which needs a local filesystem (not NFS).
+
+Task states: pending -> running -> done | failed (running -> pending on retry).
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+from config.settings import (
+    QUEUE_LEASE_SECONDS,
+    QUEUE_MAX_ATTEMPTS,
+    QUEUE_PATH,
+    QUEUE_RETRY_SECONDS,
+)
+
+
+def connect(queue_path: str | None=None) -> sqlite3.Connection:
+    """ Open the queue file (creating its tables). Transactions are explicit. """
+    conn = sqlite3.connect(str(queue_path or QUEUE_PATH), timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS queue_runs
+    (
+        run_id       TEXT PRIMARY KEY,
+        created_at   REAL,
+        params       TEXT,
+        finalized_at REAL
+    );
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS queue_tasks
+    (
+        task_id       INTEGER PRIMARY KEY,
+        run_id        TEXT NOT NULL,
+        key           TEXT NOT NULL,
+        payload       TEXT NOT NULL,
+        status        TEXT NOT NULL DEFAULT 'pending',
+        attempts      INTEGER NOT NULL DEFAULT 0,
+        available_at  REAL NOT NULL DEFAULT 0,
+        worker_id     TEXT,
+        lease_expires REAL,
+        result        TEXT,
+        error         TEXT,
+        UNIQUE (run_id, key)
+    );
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_queue_tasks_status ON queue_tasks(status, available_at);")
+    return conn
+
+
+def create_run(params: dict, tasks: list, run_id: str | None=None, queue_path: str | None=None) -> str:
+    """
+    Add a run and its tasks.
+
+    Parameters:
+        params (dict): Run parameters (JSON-serializable), returned by get_run
+        tasks (list): (key, payload dict) per task; keys are unique within a run
+
+    Returns:
+        str: The run id
+    """
+    run_id = run_id or f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    conn = connect(queue_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("INSERT INTO queue_runs (run_id, created_at, params) VALUES (?, ?, ?)",
+                     (run_id, time.time(), json.dumps(params)))
+        conn.executemany("INSERT INTO queue_tasks (run_id, key, payload) VALUES (?, ?, ?)",
+                         [(run_id, key, json.dumps(payload)) for key, payload in tasks])
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    return run_id
+
+
+def get_run(run_id: str, queue_path: str | None=None) -> dict | None:
+    """ {'run_id', 'created_at', 'params', 'finalized_at'} or None. """
+    conn = connect(queue_path)
+    try:
+        row = conn.execute("SELECT run_id, created_at, params, finalized_at FROM queue_runs WHERE run_id = ?",
+                           (run_id,)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    return {'run_id': row[0], 'created_at': row[1], 'params': json.loads(row[2]), 'finalized_at': row[3]}
+
+
+def claim(worker_id: str, limit: int=1, lease_seconds: float | None=None, max_attempts: int | None=None,
+          run_id: str | None=None, conn: sqlite3.Connection | None=None, queue_path: str | None=None) -> list:
+    """
+    Lease up to `limit` tasks that are pending (and past their backoff) or whose lease expired.
+
+    Returns:
+        list: {'task_id', 'run_id', 'key', 'payload', 'attempts'} per claimed task
+    """
+    lease_seconds = QUEUE_LEASE_SECONDS if lease_seconds is None else lease_seconds
+    max_attempts = max_attempts or QUEUE_MAX_ATTEMPTS
+    own = conn is None
+    conn = conn or connect(queue_path)
+    run_filter, run_params = (" AND run_id = ?", (run_id,)) if run_id else ("", ())
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        now = time.time()
+        # workers that died holding a task on its last attempt
+        conn.execute(f"""
+            UPDATE queue_tasks SET status = 'failed', worker_id = NULL, error = 'lease expired'
+            WHERE status = 'running' AND lease_expires < ? AND attempts >= ?{run_filter}
+        """, (now, max_attempts, *run_params))
+        ids = [row[0] for row in conn.execute(f"""
+            SELECT task_id FROM queue_tasks
+            WHERE ((status = 'pending' AND available_at <= ?) OR (status = 'running' AND lease_expires < ?)){run_filter}
+            ORDER BY task_id LIMIT ?
+        """, (now, now, *run_params, limit))]
+        rows = []
+        if ids:
+            rows = conn.execute(f"""
+                UPDATE queue_tasks SET status = 'running', worker_id = ?, lease_expires = ?, attempts = attempts + 1
+                WHERE task_id IN ({','.join('?' * len(ids))})
+                RETURNING task_id, run_id, key, payload, attempts
+            """, (worker_id, now + lease_seconds, *ids)).fetchall()
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        if own:
+            conn.close()
+    return [{'task_id': task_id, 'run_id': run, 'key': key, 'payload': json.loads(payload), 'attempts': attempts}
+            for task_id, run, key, payload, attempts in sorted(rows)]
+
+
+def heartbeat(worker_id: str, task_ids: list, lease_seconds: float | None=None, conn: sqlite3.Connection | None=None,
+              queue_path: str | None=None) -> int:
+    """ Extend the worker's leases on task_ids; returns how many it still holds. """
+    if not task_ids:
+        return 0
+    lease_seconds = QUEUE_LEASE_SECONDS if lease_seconds is None else lease_seconds
+    own = conn is None
+    conn = conn or connect(queue_path)
+    try:
+        cursor = conn.execute(f"""
+            UPDATE queue_tasks SET lease_expires = ?
+            WHERE task_id IN ({','.join('?' * len(task_ids))}) AND worker_id = ? AND status = 'running'
+        """, (time.time() + lease_seconds, *task_ids, worker_id))
+        return cursor.rowcount
+    finally:
+        if own:
+            conn.close()
+
+
+def complete(worker_id: str, task_id: int, result, conn: sqlite3.Connection | None=None, queue_path: str | None=None) -> bool:
+    """ Store a task's result. False if the worker had lost the lease (the result is dropped). """
+    own = conn is None
+    conn = conn or connect(queue_path)
+    try:
+        cursor = conn.execute("""
+            UPDATE queue_tasks SET status = 'done', result = ?, error = NULL, lease_expires = NULL
+            WHERE task_id = ? AND worker_id = ? AND status = 'running'
+        """, (json.dumps(result), task_id, worker_id))
+        return cursor.rowcount == 1
+    finally:
+        if own:
+            conn.close()
+
+
+def fail(worker_id: str, task_id: int, error: str, retry: bool=True, max_attempts: int | None=None,
+         retry_seconds: float | None=None, conn: sqlite3.Connection | None=None, queue_path: str | None=None) -> str | None:
+    """
+    Record a failed attempt. The task goes back to 'pending' after a backoff of
+    retry_seconds * 2 ** (attempts - 1), or to 'failed' when retry is False or
+    it has had max_attempts attempts.
+
+    Returns:
+        str: The task's new status, or None if the worker had lost the lease
+    """
+    max_attempts = max_attempts or QUEUE_MAX_ATTEMPTS
+    retry_seconds = QUEUE_RETRY_SECONDS if retry_seconds is None else retry_seconds
+    own = conn is None
+    conn = conn or connect(queue_path)
+    try:
+        row = conn.execute("SELECT attempts FROM queue_tasks WHERE task_id = ? AND worker_id = ? AND status = 'running'",
+                           (task_id, worker_id)).fetchone()
+        if row is None:
+            return None
+        status = 'pending' if retry and row[0] < max_attempts else 'failed'
+        cursor = conn.execute("""
+            UPDATE queue_tasks SET status = ?, error = ?, available_at = ?, lease_expires = NULL,
+                                   worker_id = CASE WHEN ? = 'pending' THEN NULL ELSE worker_id END
+            WHERE task_id = ? AND worker_id = ? AND status = 'running'
+        """, (status, error, time.time() + retry_seconds * 2 ** (row[0] - 1), status, task_id, worker_id))
+        return status if cursor.rowcount == 1 else None
+    finally:
+        if own:
+            conn.close()
+
+
+def run_status(run_id: str, queue_path: str | None=None) -> dict:
+    """ Number of tasks of a run per status (pending, running, done, failed). """
+    conn = connect(queue_path)
+    try:
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM queue_tasks WHERE run_id = ? GROUP BY status",
+                                   (run_id,)).fetchall())
+    finally:
+        conn.close()
+    return {status: counts.get(status, 0) for status in ('pending', 'running', 'done', 'failed')}
+
+
+def run_tasks(run_id: str, queue_path: str | None=None) -> list:
+    """ Every task of a run: {'key', 'payload', 'status', 'attempts', 'result', 'error'}. """
+    conn = connect(queue_path)
+    try:
+        rows = conn.execute("""
+            SELECT key, payload, status, attempts, result, error FROM queue_tasks WHERE run_id = ? ORDER BY task_id
+        """, (run_id,)).fetchall()
+    finally:
+        conn.close()
+    return [{'key': key, 'payload': json.loads(payload), 'status': status, 'attempts': attempts,
+             'result': json.loads(result) if result is not None else None, 'error': error}
+            for key, payload, status, attempts, result, error in rows]
+
+
+def mark_finalized(run_id: str, queue_path: str | None=None):
+    conn = connect(queue_path)
+    try:
+        conn.execute("UPDATE queue_runs SET finalized_at = ? WHERE run_id = ?", (time.time(), run_id))
+    finally:
+        conn.close()
+
+
+class LeaseKeeper:
+    """
+    Renew a worker's leases from a background thread while it works:
+
+        with LeaseKeeper(worker_id, [task['task_id'] for task in tasks]):
+            ...
+    """
+
+    def __init__(self, worker_id: str, task_ids: list, lease_seconds: float | None=None, queue_path: str | None=None):
+        self.worker_id = worker_id
+        self.task_ids = list(task_ids)
+        self.lease_seconds = QUEUE_LEASE_SECONDS if lease_seconds is None else lease_seconds
+        self.queue_path = queue_path
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='lease-keeper', daemon=True)
+
+    def _run(self):
+        conn = connect(self.queue_path)
+        try:
+            while not self._stop.wait(self.lease_seconds / 3):
+                heartbeat(self.worker_id, self.task_ids, self.lease_seconds, conn=conn)
+        finally:
+            conn.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
@@ -0,0 +1,295 @@
+"""
+Forecasting spread over worker processes through analysis.task_queue.
+
+A run has one task per (country, sector, metric). Workers claim tasks in
+batches, fit them exactly as forecast_all does (forecast_series_intervals,
+or forecast_batch_intervals for the batched engine) and store each forecast
+frame in the queue. When every task is done or has failed for good, the
+coordinator assembles the frames like forecast_all (per-capita derivation,
+reconciliation), records failures in forecast_failures and loads
+emissions_forecast.
+
+Workers only read emissions.db and write the queue file, so they can run in
+as many containers as share the ./data volume:
+
+    python -m analysis.worker work                 # start N times
+    python -m analysis.worker coordinate --work    # enqueue, help out, wait, finalize
+    python -m analysis.worker status RUN_ID
+    python -m analysis.worker finalize RUN_ID      # after a coordinator was lost
+
+The coordinate and finalize commands load emissions_forecast and mark the
+database ready again (etl.readiness.mark_ready), like the pipeline does.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+
+import pandas as pd
+
+from analysis import task_queue
+from analysis.forecast import (
+    _nan_forecast,
+    finish_forecasts,
+    forecast_batch_intervals,
+    forecast_columns,
+    forecast_population,
+    forecast_series_intervals,
+    get_all_country_sector_combos,
+    get_emissions_data,
+    get_emissions_history,
+    get_population_data,
+    load_forecasts_to_db,
+    record_failures,
+    resolve_options,
+    series_records,
+)
+from analysis.reconcile import aggregate_keys
+from config.settings import QUEUE_POLL_SECONDS, WORKER_BATCH_SIZE
+from etl.readiness import mark_ready
+from monitoring.metrics import counter, log_event
+
+INSUFFICIENT_HISTORY = 'insufficient_history'
+
+
+def worker_name() -> str:
+    """ host-pid; the host name is the container id under docker compose. """
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def enqueue_forecasts(forecast_years: int=10, reconcile: str | None=None, skip_aggregates: bool | None=None,
+                      per_capita: str | None=None, engine: str | None=None, queue_path: str | None=None) -> str:
+    """ Create a run with one task per country, sector and fitted column; returns its id. """
+    options = resolve_options(reconcile, skip_aggregates, per_capita, engine)
+    combos = get_all_country_sector_combos()
+    skipped = set(aggregate_keys(combos, get_emissions_history())) if options['skip_aggregates'] else set()
+    tasks = [
+        (f"{country}|{sector}|{column}",
+         {'country_name': country, 'sector_name': sector, 'column': column,
+          'forecast_years': forecast_years, 'engine': options['engine']})
+        for country, sector in combos if (country, sector) not in skipped
+        for column, _ in forecast_columns(options['per_capita'])
+    ]
+    run_id = task_queue.create_run({'forecast_years': forecast_years, **options}, tasks, queue_path=queue_path)
+    log_event('forecast_run_enqueued', run_id=run_id, tasks=len(tasks))
+    return run_id
+
+
+def _frame_to_json(frame: pd.DataFrame) -> dict:
+    return {'index': [int(year) for year in frame.index], 'columns': list(frame.columns), 'data': frame.to_numpy().tolist()}
+
+
+def _frame_from_json(result: dict) -> pd.DataFrame:
+    return pd.DataFrame(result['data'], index=result['index'], columns=result['columns'], dtype=float)
+
+
+def fit_tasks(tasks: list) -> list:
+    """
+    Forecast frames for claimed tasks: a frame per task, or the exception that
+    task failed with (ValueError(INSUFFICIENT_HISTORY) for short series).
+    """
+    out, series = [None] * len(tasks), []
+    for i, task in enumerate(tasks):
+        payload = task['payload']
+        try:
+            df = get_emissions_data(payload['country_name'], payload['sector_name'])
+        except Exception as e:  # noqa: BLE001 - recorded as the task's failure
+            out[i] = e
+            continue
+        if df.empty or len(df) < 3:
+            out[i] = ValueError(INSUFFICIENT_HISTORY)
+            continue
+        name = f"{payload['country_name']}|{payload['sector_name']}|{payload['column']}"
+        series.append((i, df.set_index('year')[payload['column']].rename(name)))
+
+    # batched-engine tasks are fitted together, per horizon (a batch can span runs)
+    groups = {}
+    for i, s in series:
+        if tasks[i]['payload']['engine'] == 'batched':
+            groups.setdefault(tasks[i]['payload']['forecast_years'], []).append((i, s))
+    for forecast_years, members in groups.items():
+        try:
+            frames = forecast_batch_intervals([s for _, s in members], forecast_years)
+            for (i, _), frame in zip(members, frames):
+                out[i] = frame
+        except Exception as e:  # noqa: BLE001
+            # fitted one by one below
+            log_event('forecast_batch_error', logging.WARNING, exc_info=True, error=f"{type(e).__name__}: {e}")
+    for i, s in series:
+        if out[i] is None:
+            try:
+                out[i] = forecast_series_intervals(s, tasks[i]['payload']['forecast_years'])
+            except Exception as e:  # noqa: BLE001
+                out[i] = e
+    return out
+
+
+def work(worker_id: str | None=None, run_id: str | None=None, batch_size: int | None=None, exit_when_idle: bool=False,
+         poll_seconds: float | None=None, stop: threading.Event | None=None, queue_path: str | None=None) -> int:
+    """
+    Claim and fit tasks until stopped (or, with exit_when_idle, until nothing is left to claim).
+
+    Parameters:
+        worker_id (str): Name recorded on claimed tasks (default host-pid)
+        run_id (str): Only work on this run
+        batch_size (int): Tasks claimed at a time (default WORKER_BATCH_SIZE)
+        exit_when_idle (bool): Return when no task can be claimed
+        stop (threading.Event): Return after the current batch once set
+
+    Returns:
+        int: Number of tasks this worker completed
+    """
+    worker_id = worker_id or worker_name()
+    batch_size = batch_size or WORKER_BATCH_SIZE
+    poll_seconds = QUEUE_POLL_SECONDS if poll_seconds is None else poll_seconds
+    stop = stop or threading.Event()
+    completed = 0
+    conn = task_queue.connect(queue_path)
+    try:
+        while not stop.is_set():
+            tasks = task_queue.claim(worker_id, batch_size, run_id=run_id, conn=conn)
+            if not tasks:
+                if exit_when_idle:
+                    break
+                stop.wait(poll_seconds)
+                continue
+
+            with task_queue.LeaseKeeper(worker_id, [task['task_id'] for task in tasks], queue_path=queue_path):
+                outcomes = fit_tasks(tasks)
+            for task, outcome in zip(tasks, outcomes):
+                if isinstance(outcome, Exception):
+                    # a short series stays short; anything else may be transient
+                    retry = str(outcome) != INSUFFICIENT_HISTORY
+                    error = f"{type(outcome).__name__}: {outcome}" if retry else INSUFFICIENT_HISTORY
+                    status = task_queue.fail(worker_id, task['task_id'], error, retry=retry, conn=conn)
+                    log_event('queue_task_failed', logging.WARNING, task=task['key'], attempt=task['attempts'],
+                              status=status, error=error)
+                else:
+                    status = 'done' if task_queue.complete(worker_id, task['task_id'], _frame_to_json(outcome), conn=conn) else None
+                    completed += status == 'done'
+                # None: the lease ran out and the task went to another worker
+                counter('queue_tasks_total', 'Forecast queue tasks by outcome').inc(status=status or 'lease_lost')
+    finally:
+        conn.close()
+    log_event('worker_stopped', worker=worker_id, completed=completed)
+    return completed
+
+
+def wait_for_run(run_id: str, poll_seconds: float | None=None, timeout: float | None=None, queue_path: str | None=None) -> dict:
+    """ Block until no task of the run is pending or running; returns the final status counts. """
+    poll_seconds = QUEUE_POLL_SECONDS if poll_seconds is None else poll_seconds
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        status = task_queue.run_status(run_id, queue_path)
+        if status['pending'] == 0 and status['running'] == 0:
+            return status
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError(f"Run {run_id} still has unfinished tasks: {status}")
+        time.sleep(poll_seconds)
+
+
+def finalize(run_id: str, queue_path: str | None=None) -> pd.DataFrame:
+    """
+    Assemble a finished run into the frame forecast_all would have returned and
+    record its failed series in forecast_failures.
+    """
+    run = task_queue.get_run(run_id, queue_path)
+    if run is None:
+        raise ValueError(f"Unknown run {run_id}")
+    tasks = task_queue.run_tasks(run_id, queue_path)
+    unfinished = [task['key'] for task in tasks if task['status'] in ('pending', 'running')]
+    if unfinished:
+        raise RuntimeError(f"Run {run_id} has {len(unfinished)} unfinished tasks, e.g. {unfinished[0]}")
+
+    params = run['params']
+    forecast_years = params['forecast_years']
+    combos = get_all_country_sector_combos()
+    skipped = set(aggregate_keys(combos, get_emissions_history())) if params['skip_aggregates'] else set()
+    population = forecast_population(get_population_data(), forecast_years) if params['per_capita'] == 'derived' else None
+    by_series = {}
+    for task in tasks:
+        payload = task['payload']
+        by_series.setdefault((payload['country_name'], payload['sector_name']), {})[payload['column']] = task
+
+    results, failures = [], []
+    for (country, sector), series_tasks in by_series.items():
+        if any(task['error'] == INSUFFICIENT_HISTORY for task in series_tasks.values()):
+            failures.append({'country_name': country, 'sector_name': sector, 'reason': INSUFFICIENT_HISTORY})
+            continue
+        frames = {}
+        for column, reason in forecast_columns(params['per_capita']):
+            task = series_tasks[column]
+            if task['status'] == 'done':
+                frames[column] = _frame_from_json(task['result'])
+            else:
+                failures.append({'country_name': country, 'sector_name': sector,
+                                 'reason': f"{reason}: {task['error']} (after {task['attempts']} attempts)"})
+                last_year = int(get_emissions_data(country, sector)['year'].iloc[-1])
+                frames[column] = _nan_forecast(last_year, forecast_years)
+        results.extend(series_records(country, sector, frames, population))
+
+    record_failures(failures)
+    forecast_df = finish_forecasts(results, params['reconcile'], combos, skipped)
+    task_queue.mark_finalized(run_id, queue_path)
+    log_event('forecast_run_finalized', run_id=run_id, series=len(by_series), failures=len(failures))
+    return forecast_df
+
+
+def coordinate(forecast_years: int=10, reconcile: str | None=None, skip_aggregates: bool | None=None, per_capita: str | None=None,
+               engine: str | None=None, work_locally: bool=True, timeout: float | None=None, queue_path: str | None=None) -> pd.DataFrame:
+    """
+    Enqueue a run, optionally work on it in this process too, wait for the
+    workers and return the assembled forecasts (see finalize).
+    """
+    run_id = enqueue_forecasts(forecast_years, reconcile, skip_aggregates, per_capita, engine, queue_path)
+    if work_locally:
+        work(run_id=run_id, exit_when_idle=True, queue_path=queue_path)
+    status = wait_for_run(run_id, timeout=timeout, queue_path=queue_path)
+    print(f"Run {run_id}: {status['done']} tasks done, {status['failed']} failed")
+    return finalize(run_id, queue_path)
+
+
+def publish(forecast_df: pd.DataFrame):
+    """
+    Load assembled forecasts into emissions_forecast and mark the database
+    ready again, as the pipeline's materialize stage would.
+    """
+    load_forecasts_to_db(forecast_df)
+    marker = mark_ready()
+    print(f"Data version {marker['data_version']} marked ready.")
+
+
+def main(argv: list | None=None):
+    parser = argparse.ArgumentParser(description="Distributed forecasting workers and coordinator.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    worker = commands.add_parser('work', help='Claim and fit forecast tasks')
+    worker.add_argument('--run', default=None, help='Only work on this run')
+    worker.add_argument('--batch-size', type=int, default=WORKER_BATCH_SIZE)
+    worker.add_argument('--exit-when-idle', action='store_true')
+    coordinator = commands.add_parser('coordinate', help='Enqueue a run, wait for it and load emissions_forecast')
+    coordinator.add_argument('--forecast-years', type=int, default=10)
+    coordinator.add_argument('--work', action='store_true', help='Also work on the run in this process')
+    coordinator.add_argument('--timeout', type=float, default=None)
+    commands.add_parser('status', help='Task counts of a run').add_argument('run_id')
+    commands.add_parser('finalize', help='Load a finished run into emissions_forecast').add_argument('run_id')
+    args = parser.parse_args(argv)
+
+    if args.command == 'work':
+        stop = threading.Event()
+        # finish the current batch on docker stop
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        completed = work(run_id=args.run, batch_size=args.batch_size, exit_when_idle=args.exit_when_idle, stop=stop)
+        print(f"Worker {worker_name()} completed {completed} tasks.")
+    elif args.command == 'coordinate':
+        publish(coordinate(args.forecast_years, work_locally=args.work, timeout=args.timeout))
+    elif args.command == 'status':
+        print(task_queue.run_status(args.run_id))
+    else:
+        publish(finalize(args.run_id))
+
+
+if __name__ == "__main__":
+    main()
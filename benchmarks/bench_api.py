@@ -0,0 +1,80 @@
+"""
+FastAPI endpoint benchmarks, one per GET route, through the in-process test client.
+
+Run with: python -m benchmarks.run --suite api
+"""
+from benchmarks.synthetic import build_database
+
+# One representative request per route; setup fails if a route is missing here.
+# build_database records releases in February and September of {release_year}, the year after end_year.
+REQUESTS = {
+    '/metrics': {},
+    '/ready': {},
+    '/historical': {'country': 'Germany', 'sector': 'Energy', 'as_of': '{release_year}-06-30'},
+    '/revisions': {'country': 'Germany', 'sector': 'Energy'},
+    '/vintages': {},
+    '/forecast': {'country': 'Germany', 'sector': 'Energy'},
+    '/series': {'country': 'Germany', 'sector': 'Energy'},
+    '/trends/top_emitters': {'year': '{end_year}', 'top_n': 10},
+    '/trends/decreases': {'start_year': '{start_year}', 'end_year': '{end_year}', 'top_n': 10},
+    '/trends/forecast_increases': {'top_n': 10},
+    '/aggregate': {'source': 'combined', 'group_by': ['source', 'country_name'], 'start_year': '{start_year}',
+                   'agg': ['sum:emissions_ktco2', 'avg:emissions_per_capita']},
+}
+
+
+def missing_routes() -> list:
+    """ GET routes of the API that have no benchmark request. """
+    from fastapi_app.main import app
+    paths = {route.path for route in app.routes if 'GET' in getattr(route, 'methods', ())}
+    paths -= {'/openapi.json', '/docs', '/docs/oauth2-redirect', '/redoc'}
+    return sorted(paths - set(REQUESTS))
+
+
+def setup(scale: dict, workdir) -> dict:
+    from fastapi.testclient import TestClient
+
+    import fastapi_app.main as api
+    from etl.readiness import write_ready_marker
+
+    missing = missing_routes()
+    if missing:
+        raise RuntimeError(f"No benchmark request for routes {missing}; add them to REQUESTS")
+
+    db_path = build_database(workdir / 'api.db', scale['n_geos'], scale['n_sectors'],
+                             scale['start_year'], scale['end_year'])
+    marker_path = workdir / 'api.ready'
+    write_ready_marker(db_path, marker_path)
+    api.DB_PATH = db_path
+    api.READY_MARKER_PATH = marker_path
+
+    client = TestClient(api.app)
+    def fill(value):
+        return str(value).format(**scale, release_year=scale['end_year'] + 1)
+
+    requests = {}
+    for path, params in REQUESTS.items():
+        params = {k: [fill(x) for x in v] if isinstance(v, list) else fill(v) for k, v in params.items()}
+        response = client.get(path, params=params)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {path} returned {response.status_code} on the synthetic database")
+        requests[path] = params
+    return {'client': client, 'requests': requests}
+
+
+def time_endpoint(ctx, path):
+    ctx['client'].get(path, params=ctx['requests'][path])
+
+
+time_endpoint.params = list(REQUESTS)
+time_endpoint.repeat = 50
+
+
+def time_aggregate_uncached(ctx):
+    """ /aggregate with its result cache cleared: compiling and running the rollup. """
+    from analysis import aggregate
+    aggregate._cache.clear()
+    ctx['client'].get('/aggregate', params=ctx['requests']['/aggregate'])
+
+
+time_aggregate_uncached.repeat = 20
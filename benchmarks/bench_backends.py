@@ -0,0 +1,49 @@
+"""
+The analytics queries on each backend: SQLite, and DuckDB over the Parquet
+export (skipped when duckdb is not installed). Compare them at growing sizes:
+
+Run with: python -m benchmarks.run --suite backends --scale x10   (or x100)
+"""
+import importlib.util
+
+from analysis import aggregate, trends
+from benchmarks.synthetic import build_database
+from etl.parquet_export import export_parquet
+
+BACKENDS = ['sqlite'] + (['duckdb'] if importlib.util.find_spec('duckdb') else [])
+AGGREGATE = {'source': 'combined', 'group_by': ['source', 'sector_name', 'year'], 'year_step': 5,
+             'aggregates': ['sum:emissions_ktco2', 'avg:emissions_per_capita', 'share:emissions_ktco2'],
+             'share_by': ['source', 'year']}
+
+
+def setup(scale: dict, workdir) -> dict:
+    from analysis import backends
+
+    db_path = build_database(workdir / 'backends.db', scale['n_geos'], scale['n_sectors'],
+                             scale['start_year'], scale['end_year'])
+    export_parquet(db_path, workdir / 'parquet')
+    trends.DB_PATH = db_path
+    backends.PARQUET_DIR = workdir / 'parquet'
+    return {'db_path': db_path, 'start_year': scale['start_year'], 'end_year': scale['end_year']}
+
+
+def time_top_emitters(ctx, backend):
+    trends.get_top_emitters(ctx['end_year'], top_n=10, backend=backend)
+
+
+def time_biggest_decreases(ctx, backend):
+    trends.get_biggest_decreases(ctx['start_year'], ctx['end_year'], top_n=10, backend=backend)
+
+
+def time_worst_forecast_increases(ctx, backend):
+    trends.get_worst_forecast_increases(top_n=10, backend=backend)
+
+
+def time_aggregate_uncached(ctx, backend):
+    """ A combined rollup over every row, with the result cache cleared. """
+    aggregate._cache.clear()
+    aggregate.run_aggregate(ctx['db_path'], backend=backend, **AGGREGATE)
+
+
+for _func in (time_top_emitters, time_biggest_decreases, time_worst_forecast_increases, time_aggregate_uncached):
+    _func.params = BACKENDS
@@ -0,0 +1,90 @@
+"""
+Extract (against the stub client), transform and load benchmarks.
+
+Run with: python -m benchmarks.run --suite etl
+"""
+import shutil
+import sqlite3
+
+from benchmarks.synthetic import (
+    install_maps,
+    install_stub_client,
+    make_forecast_table,
+    make_jsonstat,
+    make_raw_emissions,
+    revise_emissions,
+)
+from etl.jsonstat import decode
+from etl.vintages import record_vintage
+
+EMISSIONS_DIMS = ['unit', 'airpol', 'geo', 'src_crf', 'time']
+
+
+def setup(scale: dict, workdir) -> dict:
+    install_stub_client(scale['n_geos'], scale['n_sectors'], scale['start_year'], scale['end_year'])
+    install_maps(scale['n_geos'], scale['n_sectors'])
+    from etl.extract import fetch_emissions_data, fetch_population_data
+    from etl.transform import transform_emissions_data
+
+    years = (scale['start_year'], scale['end_year'])
+    emissions = fetch_emissions_data(*years)
+    population = fetch_population_data(*years, geo_filter=emissions['geo'].unique().tolist())
+    transformed = transform_emissions_data(emissions, *years, population_df=population)
+    base_vintage_path = workdir / 'vintage_base.db'
+    conn = sqlite3.connect(base_vintage_path)
+    try:
+        record_vintage(transformed, conn, '2024-02-15')
+    finally:
+        conn.close()
+    return {
+        'years': years,
+        'emissions': emissions,
+        'population': population,
+        'transformed': transformed,
+        'revised': revise_emissions(transformed),
+        'forecasts': make_forecast_table(transformed),
+        'db_path': workdir / 'load.db',
+        'base_vintage_path': base_vintage_path,
+        'vintage_db_path': workdir / 'vintage.db',
+        'payload': make_jsonstat(make_raw_emissions(scale['n_geos'], scale['n_sectors'], *years), EMISSIONS_DIMS),
+    }
+
+
+def time_fetch_emissions_data(ctx):
+    from etl.extract import fetch_emissions_data
+    fetch_emissions_data(*ctx['years'])
+
+
+def time_transform_emissions_data(ctx):
+    from etl.transform import transform_emissions_data
+    transform_emissions_data(ctx['emissions'], *ctx['years'], population_df=ctx['population'])
+
+
+def time_load_transformed_data(ctx):
+    from etl.load import create_table, load_transformed_data
+    conn = sqlite3.connect(ctx['db_path'])
+    try:
+        create_table(conn)
+        load_transformed_data(ctx['transformed'], conn)
+    finally:
+        conn.close()
+
+
+def time_record_vintage(ctx):
+    """ Diff a revised release against the first vintage and write the delta. """
+    shutil.copyfile(ctx['base_vintage_path'], ctx['vintage_db_path'])
+    conn = sqlite3.connect(ctx['vintage_db_path'])
+    try:
+        record_vintage(ctx['revised'], conn, '2024-09-15')
+    finally:
+        conn.close()
+
+
+def time_load_forecasts(ctx):
+    """ Write a forecast frame to emissions_forecast in batches, as the forecast stage does. """
+    from analysis.forecast import load_forecasts_to_db
+    load_forecasts_to_db(ctx['forecasts'], db_path=ctx['db_path'])
+
+
+def time_jsonstat_decode(ctx):
+    decode(ctx['payload'], dense=False)
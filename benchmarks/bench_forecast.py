@@ -0,0 +1,29 @@
+"""
+ARIMA forecasting benchmarks (per-series statsmodels and batched engines) on a
+database with scale['forecast_geos'] geos.
+
+Run with: python -m benchmarks.run --suite forecast
+"""
+from analysis import forecast
+from benchmarks.synthetic import build_database
+
+
+def setup(scale: dict, workdir) -> dict:
+    db_path = build_database(workdir / 'forecast.db', scale['forecast_geos'], scale['n_sectors'],
+                             scale['start_year'], scale['end_year'])
+    forecast.DB_PATH = db_path
+    return {'db_path': db_path}
+
+
+def time_forecast_all(ctx):
+    forecast.forecast_all(forecast_years=10)
+
+
+time_forecast_all.repeat = 3
+
+
+def time_forecast_all_batched(ctx):
+    forecast.forecast_all(forecast_years=10, engine='batched')
+
+
+time_forecast_all_batched.repeat = 3
@@ -0,0 +1,130 @@
+"""
+Cold-start benchmarks for the dashboard, the API and the CLI entry points.
+
+Besides wall-clock start-up, entry points are profiled with `python -X importtime`:
+IMPORT_BUDGETS lists, per module, the cumulative import time it may take and
+the heavy modules (pandas, statsmodels, ...) it must not pull in at import.
+tests/test_startup.py checks the heavy modules on every run; the times only
+with CHECK_IMPORT_BUDGETS=1, as they depend on how busy the machine is.
+
+Run with: python -m benchmarks.bench_startup
+"""
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+
+# module -> (cumulative import budget in ms, modules it must not import)
+# Budgets leave 2-3x headroom over the times measured when they were set.
+IMPORT_BUDGETS = {
+    'fastapi_app.main': (1200, ('pandas', 'numpy', 'statsmodels')),
+    'dashboard.app': (2000, ('pandas', 'numpy', 'statsmodels')),
+    'analysis.queries': (150, ('pandas', 'numpy')),
+    'analysis.forecast': (1200, ('statsmodels',)),
+    'analysis.backtest': (1200, ('statsmodels',)),
+    'etl.pipeline': (1200, ('statsmodels',)),
+}
+
+# eurostatapiclient is only needed to fetch; stand in for it where it is not installed
+_CLIENT_STUB = (
+    "import importlib.util, sys, types\n"
+    "if importlib.util.find_spec('eurostatapiclient') is None:\n"
+    "    sys.modules['eurostatapiclient'] = types.SimpleNamespace(EurostatAPIClient=None)\n"
+)
+
+
+def _run_python(code: str, env: dict | None=None) -> float:
+    """ Run code in a fresh interpreter and return the wall time in seconds. """
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=PROJECT_ROOT,
+                   env={**os.environ, 'PYTHONPATH': str(PROJECT_ROOT), **(env or {})})
+    return time.perf_counter() - start
+
+
+def import_profile(module: str) -> tuple[dict, set]:
+    """
+    Import module in a fresh interpreter under -X importtime.
+
+    Returns:
+        tuple: ({imported module: cumulative import time in ms}, set of every
+        module in sys.modules afterwards)
+    """
+    code = _CLIENT_STUB + f"import {module}, sys\nprint('\\n'.join(sys.modules))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], check=True, cwd=PROJECT_ROOT,
+                            capture_output=True, text=True, env={**os.environ, 'PYTHONPATH': str(PROJECT_ROOT)})
+    times = {}
+    for line in result.stderr.splitlines():
+        # "import time: <self us> | <cumulative us> | <indented module name>"
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative) / 1000
+    return times, set(result.stdout.split())
+
+
+def forbidden_imports(module: str) -> list:
+    """ The heavy modules IMPORT_BUDGETS rules out for module that importing it pulls in. """
+    _, forbidden = IMPORT_BUDGETS[module]
+    _, loaded = import_profile(module)
+    return [f"{module} imports {name}" for name in forbidden if name in loaded]
+
+
+def check_import_budget(module: str, repeat: int=3) -> list:
+    """
+    Problems with module's import against IMPORT_BUDGETS (empty when within budget).
+    The time is the best of up to `repeat` runs, since a loaded machine only ever makes it slower.
+    """
+    budget_ms, forbidden = IMPORT_BUDGETS[module]
+    best = float('inf')
+    for _ in range(repeat):
+        times, loaded = import_profile(module)
+        best = min(best, times[module])
+        if best <= budget_ms:
+            break
+    problems = [f"{module} imports {name}" for name in forbidden if name in loaded]
+    if best > budget_ms:
+        problems.append(f"{module} takes {best:.0f} ms to import (budget {budget_ms} ms)")
+    return problems
+
+
+def time_interpreter_baseline():
+    """ Bare interpreter start-up, to subtract from the numbers below. """
+    return _run_python("pass")
+
+
+def time_import_dashboard():
+    """ Importing dashboard.app must not block on the database. """
+    return _run_python("import dashboard.app")
+
+
+def time_serve_layout():
+    """ Building the layout for one page load. """
+    return _run_python("import dashboard.app as d; d.serve_layout()")
+
+
+def time_import_api():
+    """ API worker start-up, before the first request. """
+    return _run_python("import fastapi_app.main")
+
+
+def time_import_forecast():
+    """ Importing the forecasting module (statsmodels waits for the first fit). """
+    return _run_python("import analysis.forecast")
+
+
+if __name__ == "__main__":
+    repeat = 5
+    for name, func in list(globals().items()):
+        if name.startswith("time_"):
+            timings = sorted(func() for _ in range(repeat))
+            print(f"{name:<28} min {timings[0] * 1000:8.1f} ms   median {timings[repeat // 2] * 1000:8.1f} ms")
+
+    print("\nImport time (-X importtime, cumulative):")
+    for module, (budget_ms, forbidden) in IMPORT_BUDGETS.items():
+        times, loaded = import_profile(module)
+        heavy = ", ".join(name for name in forbidden if name in loaded) or "-"
+        print(f"{module:<28} {times[module]:8.1f} ms   budget {budget_ms:6d} ms   heavy imports: {heavy}")
@@ -0,0 +1,26 @@
+"""
+analysis.trends benchmarks.
+
+Run with: python -m benchmarks.run --suite trends
+"""
+from analysis import trends
+from benchmarks.synthetic import build_database
+
+
+def setup(scale: dict, workdir) -> dict:
+    db_path = build_database(workdir / 'trends.db', scale['n_geos'], scale['n_sectors'],
+                             scale['start_year'], scale['end_year'])
+    trends.DB_PATH = db_path
+    return {'start_year': scale['start_year'], 'end_year': scale['end_year']}
+
+
+def time_get_top_emitters(ctx):
+    trends.get_top_emitters(ctx['end_year'], top_n=10)
+
+
+def time_get_biggest_decreases(ctx):
+    trends.get_biggest_decreases(ctx['start_year'], ctx['end_year'], top_n=10)
+
+
+def time_get_worst_forecast_increases(ctx):
+    trends.get_worst_forecast_increases(top_n=10)
@@ -0,0 +1,139 @@
+"""
+HTTP load test for the production gunicorn setup.
+
+Starts gunicorn (gunicorn.conf.py) once per worker count, hammers a few
+endpoints from concurrent client threads for a fixed duration, and reports
+requests/sec and latency percentiles per worker count.
+
+Usage:
+    python -m benchmarks.load_test --app api --workers 1 2 4 --duration 10
+    python -m benchmarks.load_test --app dashboard --workers 1 4 --concurrency 32
+"""
+import argparse
+import http.client
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+
+DEFAULT_PATHS = {
+    'api': [
+        '/series?country=Germany&sector=Energy',
+        '/historical?country=France&sector=Energy',
+        '/trends/top_emitters?year=2020&top_n=10',
+    ],
+    'dashboard': ['/', '/_dash-layout'],
+}
+WORKER_ENV = {'api': 'API_WORKERS', 'dashboard': 'DASHBOARD_WORKERS'}
+
+
+def wait_for_port(host: str, port: int, timeout: float=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Server did not start listening on {host}:{port}")
+
+
+def start_server(app: str, workers: int, port: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        'PYTHONPATH': str(PROJECT_ROOT),
+        'SERVE_APP': app,
+        WORKER_ENV[app]: str(workers),
+        'API_PORT' if app == 'api' else 'DASHBOARD_PORT': str(port),
+        'BIND_HOST': '127.0.0.1',
+    }
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--access-logfile', '/dev/null'],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    wait_for_port('127.0.0.1', port)
+    return proc
+
+
+def run_load(port: int, paths: list, concurrency: int, duration: float) -> dict:
+    """ Issue requests from `concurrency` keep-alive clients for `duration` seconds. """
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    stop_at = time.perf_counter() + duration
+
+    def client(slot: int):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        i = slot
+        while time.perf_counter() < stop_at:
+            path = paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 500:
+                    errors[slot] += 1
+            except (OSError, http.client.HTTPException):
+                errors[slot] += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                continue
+            latencies[slot].append(time.perf_counter() - start)
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(slot,)) for slot in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    all_latencies = np.concatenate([np.array(lat) for lat in latencies]) if any(latencies) else np.array([np.nan])
+    p50, p95, p99 = np.nanpercentile(all_latencies, [50, 95, 99]) * 1000
+    return {
+        'requests': int(np.isfinite(all_latencies).sum()),
+        'errors': sum(errors),
+        'rps': np.isfinite(all_latencies).sum() / elapsed,
+        'p50_ms': p50,
+        'p95_ms': p95,
+        'p99_ms': p99,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--app', choices=['api', 'dashboard'], default='api')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--port', type=int, default=18000)
+    parser.add_argument('--path', action='append', help='Request path (repeatable); defaults per app')
+    args = parser.parse_args()
+
+    paths = args.path or DEFAULT_PATHS[args.app]
+    print(f"{'workers':>8} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for workers in args.workers:
+        proc = start_server(args.app, workers, args.port)
+        try:
+            # warm up caches and connections before measuring
+            run_load(args.port, paths, args.concurrency, min(1.0, args.duration))
+            result = run_load(args.port, paths, args.concurrency, args.duration)
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            proc.wait(timeout=30)
+        print(f"{workers:>8} {result['requests']:>9} {result['errors']:>7} {result['rps']:>9.1f} "
+              f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
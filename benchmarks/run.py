@@ -0,0 +1,157 @@
+"""
+Benchmark runner with stored baselines.
+
+Each suite module (benchmarks/bench_<suite>.py) defines setup(scale, workdir)
+returning a context, and time_* functions taking that context (asv style).
+A time_* function may set .params to run once per parameter and .repeat to
+override the number of timed calls. Setup is never timed.
+
+The fastest of the timed calls is compared with benchmarks/baselines.json
+for the same scale (the minimum is far less noisy than the mean or median on
+a shared machine); a benchmark slower than baseline * (1 + threshold) is a
+regression and makes the run exit with status 1. Baselines are machine-specific: record them with
+--save on the machine that runs the comparison.
+
+Usage:
+    python -m benchmarks.run                       # small scale, all suites, compare
+    python -m benchmarks.run --scale medium --suite etl trends
+    python -m benchmarks.run --scale x100 --suite backends  # sqlite vs duckdb
+    python -m benchmarks.run --save                # record new baselines
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import SCALES
+from monitoring.metrics import logger
+
+SUITES = ['etl', 'forecast', 'trends', 'api', 'backends']
+BASELINE_PATH = Path(__file__).parent / 'baselines.json'
+DEFAULT_THRESHOLD = 0.25
+
+
+def _benchmarks(module) -> list:
+    """ (name, callable taking ctx, repeat) for every time_* function in module. """
+    out = []
+    for name, func in vars(module).items():
+        if not name.startswith('time_') or not callable(func):
+            continue
+        repeat = getattr(func, 'repeat', None)
+        for param in getattr(func, 'params', [None]):
+            if param is None:
+                out.append((name, func, repeat))
+            else:
+                out.append((f"{name}[{param}]", lambda ctx, f=func, p=param: f(ctx, p), repeat))
+    return out
+
+
+def run_suite(suite: str, scale_name: str, repeat: int=5, name_filter: str | None=None) -> dict:
+    """ Run one suite and return {benchmark name: {'min': s, 'median': s, 'runs': n}}. """
+    module = importlib.import_module(f'benchmarks.bench_{suite}')
+    benchmarks = [b for b in _benchmarks(module) if not name_filter or name_filter in b[0]]
+    if not benchmarks:
+        return {}
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix=f'bench-{suite}-') as workdir:
+        ctx = module.setup(SCALES[scale_name], Path(workdir))
+        for name, func, func_repeat in benchmarks:
+            func(ctx)  # warm up caches and lazy imports
+            timings = []
+            for _ in range(func_repeat or repeat):
+                start = time.perf_counter()
+                func(ctx)
+                timings.append(time.perf_counter() - start)
+            results[f"{suite}.{name}"] = {
+                'min': min(timings),
+                'median': statistics.median(timings),
+                'runs': len(timings),
+            }
+    return results
+
+
+def load_baselines(path: Path=BASELINE_PATH) -> dict:
+    try:
+        return json.loads(Path(path).read_text())
+    except FileNotFoundError:
+        return {}
+
+
+def save_baselines(results: dict, scale_name: str, path: Path=BASELINE_PATH):
+    """ Merge results into the baseline file for scale_name. """
+    baselines = load_baselines(path)
+    entry = baselines.setdefault(scale_name, {'machine': {}, 'benchmarks': {}})
+    entry['machine'] = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+    entry['benchmarks'].update({name: round(r['min'], 6) for name, r in results.items()})
+    Path(path).write_text(json.dumps(baselines, indent=2, sort_keys=True) + '\n')
+
+
+def compare(results: dict, baseline: dict, threshold: float=DEFAULT_THRESHOLD) -> list:
+    """
+    Rows of (name, best time, baseline or None, ratio or None, regressed)
+    for every result; regressed is True when best > baseline * (1 + threshold).
+    """
+    rows = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        ratio = r['min'] / base if base else None
+        rows.append((name, r['min'], base, ratio, ratio is not None and ratio > 1 + threshold))
+    return rows
+
+
+def main(argv: list | None=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=list(SCALES), default='small')
+    parser.add_argument('--suite', nargs='+', choices=SUITES, default=SUITES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--filter', default=None, help='Only run benchmarks whose name contains this')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Allowed slowdown before failing (default {DEFAULT_THRESHOLD})')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    parser.add_argument('--save', action='store_true', help='Store these results as the new baselines')
+    args = parser.parse_args(argv)
+
+    # per-series forecast_fit events would be part of the measured time
+    logger.setLevel(logging.WARNING)
+    scale = SCALES[args.scale]
+    print(f"scale {args.scale}: {scale['n_geos']} geos x {scale['n_sectors']} sectors x "
+          f"{scale['end_year'] - scale['start_year'] + 1} years")
+
+    results = {}
+    for suite in args.suite:
+        results.update(run_suite(suite, args.scale, args.repeat, args.filter))
+
+    baseline = load_baselines(args.baseline).get(args.scale, {}).get('benchmarks', {})
+    rows = compare(results, baseline, args.threshold)
+    print(f"{'benchmark':<48} {'best ms':>10} {'baseline ms':>12} {'ratio':>7}")
+    for name, best, base, ratio, regressed in rows:
+        base_text = f"{base * 1000:>12.2f}" if base else f"{'-':>12}"
+        ratio_text = f"{ratio:>7.2f}" if ratio else f"{'-':>7}"
+        print(f"{name:<48} {best * 1000:>10.2f} {base_text} {ratio_text}{'  REGRESSION' if regressed else ''}")
+
+    if args.save:
+        save_baselines(results, args.scale, args.baseline)
+        print(f"Baselines for scale {args.scale} written to {args.baseline}")
+        return 0
+
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) slower than baseline by more than {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""
+Synthetic Eurostat-shaped data for offline benchmarks.
+
+Generates raw extracts in the shape of Dataset.to_dataframe(), a stub
+EurostatAPIClient that serves them, and ready-made SQLite databases with
+emissions_data and emissions_forecast at any size. The first geos and sectors
+are the real ones from config.settings; beyond that, synthetic codes are
+added to the lookup maps.
+"""
+import sqlite3
+import sys
+import types
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config.settings import COUNTRY_MAP, FORECAST_INTERVAL_LEVELS, SECTOR_MAP
+
+# geos x sectors x years per named scale; forecast_geos bounds the ARIMA
+# benchmark, which fits two models per series
+SCALES = {
+    'small': {'n_geos': 30, 'n_sectors': 7, 'start_year': 1990, 'end_year': 2023, 'forecast_geos': 3},
+    'medium': {'n_geos': 300, 'n_sectors': 10, 'start_year': 1970, 'end_year': 2023, 'forecast_geos': 10},
+    'large': {'n_geos': 3000, 'n_sectors': 10, 'start_year': 1960, 'end_year': 2023, 'forecast_geos': 30},
+    # small (about the real extract) with 10x and 100x the series, for the analytics backends
+    'x10': {'n_geos': 300, 'n_sectors': 7, 'start_year': 1990, 'end_year': 2023, 'forecast_geos': 3},
+    'x100': {'n_geos': 3000, 'n_sectors': 7, 'start_year': 1990, 'end_year': 2023, 'forecast_geos': 3},
+}
+
+
+def synthetic_maps(n_geos: int, n_sectors: int) -> tuple[dict, dict]:
+    """ Country and sector maps with at least n_geos / n_sectors entries. """
+    country_map = dict(list(COUNTRY_MAP.items())[:n_geos])
+    for i in range(len(country_map), n_geos):
+        country_map[f"Z{i:04d}"] = f"Synthetic country {i:04d}"
+    sector_map = dict(list(SECTOR_MAP.items())[:n_sectors])
+    for i in range(len(sector_map), n_sectors):
+        sector_map[f"CRFX{i:02d}"] = f"Synthetic sector {i:02d}"
+    return country_map, sector_map
+
+
+def make_raw_emissions(n_geos: int, n_sectors: int, start_year: int, end_year: int,
+                       seed: int=0, missing: float=0.01) -> pd.DataFrame:
+    """ env_air_gge extract as returned by Dataset.to_dataframe(), with a few missing values. """
+    country_map, sector_map = synthetic_maps(n_geos, n_sectors)
+    rng = np.random.default_rng(seed)
+    years = np.arange(start_year, end_year + 1)
+    geos = np.array(list(country_map))
+    sectors = np.array(list(sector_map))
+
+    # one level and drift per series, small noise per year
+    n_series = len(geos) * len(sectors)
+    level = rng.lognormal(mean=8, sigma=1.5, size=(n_series, 1))
+    drift = rng.normal(-0.01, 0.02, size=(n_series, 1))
+    steps = np.arange(len(years))
+    values = level * np.exp(drift * steps) * rng.normal(1, 0.02, size=(n_series, len(years)))
+    values[rng.random(values.shape) < missing] = np.nan
+
+    return pd.DataFrame({
+        'values': values.ravel(),
+        'unit': 'THS_T',
+        'airpol': 'GHG',
+        'src_crf': np.tile(np.repeat(sectors, len(years)), len(geos)),
+        'geo': np.repeat(geos, len(sectors) * len(years)),
+        'time': np.tile(years.astype(str), n_series),
+    })
+
+
+def make_raw_population(geos: list, start_year: int, end_year: int, seed: int=0) -> pd.DataFrame:
+    """ demo_pjan extract as returned by Dataset.to_dataframe(). """
+    rng = np.random.default_rng(seed)
+    years = np.arange(start_year, end_year + 1)
+    base = rng.integers(300_000, 80_000_000, size=(len(geos), 1))
+    growth = rng.normal(0.002, 0.004, size=(len(geos), 1))
+    population = (base * np.exp(growth * np.arange(len(years)))).astype(np.int64)
+    return pd.DataFrame({
+        'values': population.ravel().astype(float),
+        'age': 'TOTAL',
+        'sex': 'T',
+        'unit': 'NR',
+        'geo': np.repeat(np.asarray(geos), len(years)),
+        'time': np.tile(years.astype(str), len(geos)),
+    })
+
+
+def make_jsonstat(df: pd.DataFrame, dims: list, value_column: str='values') -> dict:
+    """
+    JSON-stat 2.0 payload (as served by the Eurostat API) for a raw extract,
+    with the dims in row-major order and only the observed values.
+    """
+    categories = [pd.unique(df[dim]) for dim in dims]
+    positions = [pd.Index(labels).get_indexer(df[dim]) for dim, labels in zip(dims, categories)]
+    flat = np.ravel_multi_index(positions, [len(c) for c in categories])
+    values = df[value_column].to_numpy(dtype=float)
+    observed = ~np.isnan(values)
+    return {
+        'version': '2.0',
+        'class': 'dataset',
+        'id': list(dims),
+        'size': [len(c) for c in categories],
+        'dimension': {dim: {'category': {'index': {str(code): i for i, code in enumerate(labels)}}}
+                      for dim, labels in zip(dims, categories)},
+        'value': dict(zip(map(str, flat[observed].tolist()), values[observed].tolist())),
+    }
+
+
+class _StubDataset:
+    def __init__(self, df: pd.DataFrame):
+        self._df = df
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return self._df.copy()
+
+
+def stub_client(n_geos: int, n_sectors: int, start_year: int, end_year: int, seed: int=0) -> type:
+    """
+    An EurostatAPIClient replacement serving synthetic env_air_gge and demo_pjan
+    data, honouring the geo filter like the real API.
+    """
+    country_map, _ = synthetic_maps(n_geos, n_sectors)
+
+    class StubEurostatAPIClient:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def get_dataset(self, dataset_code: str, params: dict | None=None):
+            geo = (params or {}).get('geo')
+            if dataset_code == 'env_air_gge':
+                df = make_raw_emissions(n_geos, n_sectors, start_year, end_year, seed)
+            elif dataset_code == 'demo_pjan':
+                df = make_raw_population(list(country_map), start_year, end_year, seed)
+            else:
+                raise ValueError(f"No synthetic data for dataset {dataset_code}")
+            if geo:
+                df = df[df['geo'].isin(geo)].reset_index(drop=True)
+            return _StubDataset(df)
+
+    return StubEurostatAPIClient
+
+
+def install_stub_client(n_geos: int, n_sectors: int, start_year: int, end_year: int, seed: int=0):
+    """ Make etl.extract use the stub client, so nothing touches the network. """
+    client = stub_client(n_geos, n_sectors, start_year, end_year, seed)
+    if 'eurostatapiclient' not in sys.modules:
+        try:
+            import eurostatapiclient  # noqa: F401
+        except ImportError:
+            sys.modules['eurostatapiclient'] = types.SimpleNamespace(EurostatAPIClient=client)
+    import etl.extract
+    etl.extract.EurostatAPIClient = client
+    return client
+
+
+def install_maps(n_geos: int, n_sectors: int):
+    """ Extend the lookup maps used by transform to the synthetic codes. """
+    import etl.transform
+    etl.transform.COUNTRY_MAP, etl.transform.SECTOR_MAP = synthetic_maps(n_geos, n_sectors)
+
+
+def make_emissions_table(n_geos: int, n_sectors: int, start_year: int, end_year: int, seed: int=0) -> pd.DataFrame:
+    """ emissions_data rows (the output of transform) without going through transform. """
+    country_map, sector_map = synthetic_maps(n_geos, n_sectors)
+    raw = make_raw_emissions(n_geos, n_sectors, start_year, end_year, seed).dropna(subset=['values'])
+    population = make_raw_population(list(country_map), start_year, end_year, seed)
+    df = raw.merge(population[['geo', 'time', 'values']].rename(columns={'values': 'population'}), on=['geo', 'time'])
+    df = pd.DataFrame({
+        'year': df['time'].astype(int),
+        'sector_name': df['src_crf'].map(sector_map),
+        'country_name': df['geo'].map(country_map),
+        'population': df['population'].astype(np.int64),
+        'emissions_ktco2': df['values'],
+    })
+    df['emissions_per_capita'] = (df['emissions_ktco2'] * 1_000_000 / df['population']).round(2)
+    return df
+
+
+def make_forecast_table(emissions: pd.DataFrame, forecast_years: int=10) -> pd.DataFrame:
+    """ Plausible emissions_forecast rows: each series' last value with a small drift, plus interval bounds. """
+    last = emissions.sort_values('year').groupby(['country_name', 'sector_name'], as_index=False).last()
+    steps = np.arange(1, forecast_years + 1)
+    out = last.loc[last.index.repeat(forecast_years)].reset_index(drop=True)
+    step = np.tile(steps, len(last))
+    out['year'] = out['year'] + step
+    out['forecast_emissions_ktco2'] = out['emissions_ktco2'] * (1 + 0.01 * step)
+    out['forecast_emissions_per_capita'] = out['emissions_per_capita'] * (1 + 0.01 * step)
+    columns = ['year', 'country_name', 'sector_name', 'forecast_emissions_ktco2', 'forecast_emissions_per_capita']
+    # intervals widening with the horizon, like the ARIMA ones
+    for level in FORECAST_INTERVAL_LEVELS:
+        for metric in ('forecast_emissions_ktco2', 'forecast_emissions_per_capita'):
+            half_width = out[metric] * 0.02 * np.sqrt(step) * level / 80
+            out[f"{metric}_lower_{level}"] = out[metric] - half_width
+            out[f"{metric}_upper_{level}"] = out[metric] + half_width
+            columns += [f"{metric}_lower_{level}", f"{metric}_upper_{level}"]
+    return out[columns]
+
+
+def revise_emissions(emissions: pd.DataFrame, years: int=3, share: float=0.2, seed: int=0) -> pd.DataFrame:
+    """ A later release: a share of the values in the last `years` years revised by up to +-2%. """
+    rng = np.random.default_rng(seed + 1)
+    revised = emissions.copy()
+    mask = (revised['year'] > revised['year'].max() - years).to_numpy() & (rng.random(len(revised)) < share)
+    revised.loc[mask, 'emissions_ktco2'] *= 1 + rng.uniform(-0.02, 0.02, mask.sum())
+    revised['emissions_per_capita'] = (revised['emissions_ktco2'] * 1_000_000 / revised['population']).round(2)
+    return revised
+
+
+def build_database(db_path: str, n_geos: int, n_sectors: int, start_year: int, end_year: int,
+                   forecast_years: int=10, seed: int=0) -> Path:
+    """
+    Write a complete emissions database: two vintages of emissions_data (the
+    second revising recent years), the forecasts and all indexes.
+    """
+    from analysis.forecast_writer import ForecastWriter
+    from etl.load import create_indexes
+    from etl.vintages import record_vintage
+
+    db_path = Path(db_path)
+    db_path.unlink(missing_ok=True)
+    emissions = make_emissions_table(n_geos, n_sectors, start_year, end_year, seed)
+    conn = sqlite3.connect(db_path)
+    try:
+        record_vintage(emissions, conn, f"{end_year + 1}-02-15")
+        emissions = revise_emissions(emissions, seed=seed)
+        record_vintage(emissions, conn, f"{end_year + 1}-09-15")
+        create_indexes(conn)
+    finally:
+        conn.close()
+    forecasts = make_forecast_table(emissions, forecast_years)
+    with ForecastWriter(list(forecasts.columns[3:]), db_path=db_path) as writer:
+        writer.add_frame(forecasts)
+    return db_path
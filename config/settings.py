@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 """
 Configuration and lookup tables for the EU Emissions Tracker project.
@@ -30,6 +31,13 @@ COUNTRY_MAP = {
     "EU27_2020": "EU (27 countries, from 2020)",
 }
 
+# Hierarchy used to reconcile forecasts (analysis/reconcile.py): the aggregate
+# geo is the sum of its member states (every other geo except the excluded
+# ones), and the total sector is the sum of the other sectors
+AGGREGATE_GEO = "EU27_2020"
+AGGREGATE_GEO_EXCLUDES = ["NO", "IS"]
+TOTAL_SECTOR = "TOTXMEMO"
+
 # Root project path (adjust if needed)
 PROJECT_ROOT = Path(__file__).parent.parent
 
@@ -38,3 +46,109 @@ DATA_DIR = PROJECT_ROOT / "data"
 
 # SQLite database path
 DB_PATH = DATA_DIR / "emissions.db"
+
+# Per-stage pipeline checkpoints (see etl/stages.py)
+CHECKPOINT_DIR = DATA_DIR / "checkpoints"
+
+# Backtest results (analysis/backtest.py) live in their own database, so
+# writing them does not change DB_PATH and invalidate its ready marker
+BACKTEST_DB_PATH = Path(os.getenv("BACKTEST_DB_PATH", str(DATA_DIR / "backtest.db")))
+
+# Analytics backend for analysis.trends, /aggregate and the API trend queries:
+# "sqlite" queries DB_PATH, "duckdb" queries a Parquet copy of emissions_data
+# and emissions_forecast (partitioned by year) in PARQUET_DIR with DuckDB,
+# an optional dependency. The pipeline writes the Parquet copy when
+# PARQUET_EXPORT is set, which it is by default with the duckdb backend.
+ANALYTICS_BACKEND = os.getenv("ANALYTICS_BACKEND", "sqlite").lower()
+PARQUET_DIR = Path(os.getenv("PARQUET_DIR", str(DATA_DIR / "parquet")))
+PARQUET_EXPORT = os.getenv("PARQUET_EXPORT", str(ANALYTICS_BACKEND == "duckdb")).lower() in ("1", "true", "yes")
+
+# Written by the pipeline once DB_PATH is completely loaded (see etl/readiness.py)
+READY_MARKER_PATH = DATA_DIR / "emissions.ready"
+READY_TIMEOUT_SECONDS = float(os.getenv("READY_TIMEOUT_SECONDS", "3600"))
+
+# Dashboard: ship every series to the browser once per data version and
+# redraw charts with clientside callbacks instead of a server round trip
+DASHBOARD_CLIENTSIDE = os.getenv("DASHBOARD_CLIENTSIDE", "false").lower() in ("1", "true", "yes")
+
+# Dashboard comparison view: traces beyond this are folded into "Other",
+# and longer traces are decimated before being sent to the browser
+COMPARE_MAX_TRACES = 12
+COMPARE_MAX_POINTS = 200
+
+# Serving: development runs uvicorn/Dash dev servers, production runs
+# gunicorn with the settings in gunicorn.conf.py
+SERVE_MODE = os.getenv("SERVE_MODE", "development")
+BIND_HOST = os.getenv("BIND_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+DASHBOARD_PORT = int(os.getenv("DASHBOARD_PORT", "8050"))
+DASHBOARD_DEBUG = os.getenv("DASHBOARD_DEBUG", "false").lower() in ("1", "true", "yes")
+
+# Async uvicorn workers need one process per core; the Flask dashboard
+# blocks on SQLite, so it gets the classic 2 * cores + 1 sync workers
+CPU_COUNT = os.cpu_count() or 1
+API_WORKERS = int(os.getenv("API_WORKERS", str(CPU_COUNT)))
+DASHBOARD_WORKERS = int(os.getenv("DASHBOARD_WORKERS", str(2 * CPU_COUNT + 1)))
+DASHBOARD_THREADS = int(os.getenv("DASHBOARD_THREADS", "2"))
+WORKER_TIMEOUT = int(os.getenv("WORKER_TIMEOUT", "60"))
+
+# How often the gunicorn master checks for a new data version and gracefully
+# reloads its workers
+DATA_VERSION_POLL_SECONDS = float(os.getenv("DATA_VERSION_POLL_SECONDS", "30"))
+
+# Structured JSON logs (monitoring/metrics.py)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Opt-in profiling (monitoring/profiling.py): "cprofile" writes pstats files,
+# "sample" writes collapsed stacks for flame graphs; empty disables it
+PROFILE_MODE = os.getenv("EUROSTAT_PROFILE", "").lower()
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(DATA_DIR / "profiles")))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+# Fraction of API requests to profile (0 disables the middleware)
+API_PROFILE_RATE = float(os.getenv("API_PROFILE_RATE", "0"))
+
+# /aggregate (analysis/aggregate.py): results are cached per data version;
+# requests with more result rows, filter values or aggregates are rejected
+AGGREGATE_MAX_ROWS = int(os.getenv("AGGREGATE_MAX_ROWS", "10000"))
+AGGREGATE_MAX_VALUES = int(os.getenv("AGGREGATE_MAX_VALUES", "200"))
+AGGREGATE_MAX_AGGREGATES = int(os.getenv("AGGREGATE_MAX_AGGREGATES", "8"))
+AGGREGATE_CACHE_SIZE = int(os.getenv("AGGREGATE_CACHE_SIZE", "256"))
+
+# Prediction intervals stored with every forecast, as coverage percentages
+# (80 -> the 80% interval, alpha 0.2); see analysis/forecast.py
+FORECAST_INTERVAL_LEVELS = [int(level) for level in os.getenv("FORECAST_INTERVAL_LEVELS", "80,95").split(",") if level.strip()]
+
+# Forecast reconciliation: "" (off), "bottom_up", "ols" or "wls"; with
+# bottom_up, FORECAST_SKIP_AGGREGATES builds aggregates from their parts
+# instead of fitting them
+FORECAST_RECONCILE = os.getenv("FORECAST_RECONCILE", "").lower()
+FORECAST_SKIP_AGGREGATES = os.getenv("FORECAST_SKIP_AGGREGATES", "false").lower() in ("1", "true", "yes")
+# An aggregate whose history is off from the sum of its parts by more than
+# this fraction in any year is reconciled as a series of its own
+FORECAST_RECONCILE_TOLERANCE = float(os.getenv("FORECAST_RECONCILE_TOLERANCE", "0.01"))
+
+# Per-capita forecasts: "arima" fits every per-capita series, "derived" divides
+# the emissions forecasts by one population trend per country
+FORECAST_PER_CAPITA = os.getenv("FORECAST_PER_CAPITA", "arima").lower()
+POPULATION_TREND_YEARS = int(os.getenv("POPULATION_TREND_YEARS", "10"))
+
+# Forecast engine: "statsmodels" fits one ARIMA per series, "batched" fits all
+# equal-length series together (analysis/batch_arima.py)
+FORECAST_ENGINE = os.getenv("FORECAST_ENGINE", "statsmodels").lower()
+
+# Forecasts are written to emissions_forecast in batches of this many rows as
+# series finish (analysis/forecast_writer.py), each batch its own transaction
+FORECAST_WRITE_BATCH = int(os.getenv("FORECAST_WRITE_BATCH", "2000"))
+
+# Distributed forecasting (analysis/worker.py): a task queue in a SQLite file
+# on the shared data volume. Workers hold a lease on claimed tasks, renewed by
+# heartbeats; a task whose lease runs out is handed to another worker, and a
+# failed task is retried up to QUEUE_MAX_ATTEMPTS times with exponential backoff.
+# FORECAST_QUEUE=true makes the pipeline's forecast stage go through the queue.
+QUEUE_PATH = Path(os.getenv("QUEUE_PATH", str(DATA_DIR / "forecast_queue.db")))
+QUEUE_LEASE_SECONDS = float(os.getenv("QUEUE_LEASE_SECONDS", "60"))
+QUEUE_MAX_ATTEMPTS = int(os.getenv("QUEUE_MAX_ATTEMPTS", "3"))
+QUEUE_RETRY_SECONDS = float(os.getenv("QUEUE_RETRY_SECONDS", "5"))
+QUEUE_POLL_SECONDS = float(os.getenv("QUEUE_POLL_SECONDS", "2"))
+WORKER_BATCH_SIZE = int(os.getenv("WORKER_BATCH_SIZE", "16"))
+FORECAST_QUEUE = os.getenv("FORECAST_QUEUE", "false").lower() in ("1", "true", "yes")
@@ -1,13 +1,31 @@
+from __future__ import annotations
+
+import logging
 import sys
+from functools import lru_cache
 from pathlib import Path
 
-from config.settings import DB_PATH
+from config.settings import (
+    DB_PATH, READY_MARKER_PATH, DASHBOARD_CLIENTSIDE, COMPARE_MAX_TRACES, COMPARE_MAX_POINTS,
+    BIND_HOST, DASHBOARD_PORT, DASHBOARD_DEBUG,
+)
+from analysis.queries import build_series_bundle, get_data_version, query_series, query_series_batch, split_series
+from etl.readiness import read_ready_marker
+from monitoring.metrics import histogram, log_event, render_prometheus
+from dashboard.traces import downsample, interval_levels, reduce_series, total_series
 
 import dash
-from dash import dcc, html, Input, Output
-import pandas as pd
+import flask
+from dash import dcc, html, Input, Output, State, ClientsideFunction
 import sqlite3
+from typing import TYPE_CHECKING
+import plotly.colors as px_colors
 import plotly.graph_objs as go
+import plotly.io as pio
+
+if TYPE_CHECKING:
+    # pandas is only needed once a chart callback runs
+    import pandas as pd
 
 # Add the project root to sys.path for imports
 PROJECT_ROOT = Path(__file__).parent.parent.resolve()
@@ -15,93 +33,222 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
 # Initialize Dash app
-app = dash.Dash(__name__)
+# (gzip matters for the series bundle shipped in clientside mode)
+app = dash.Dash(__name__, compress=DASHBOARD_CLIENTSIDE)
 server = app.server  # for deployment
 
+
+@server.route("/ready")
+def ready():
+    """ Readiness probe: 200 once the pipeline has completely loaded the current database. """
+    marker = read_ready_marker(DB_PATH, READY_MARKER_PATH)
+    if marker is None:
+        return flask.jsonify(ready=False), 503
+    return flask.jsonify(ready=True, data_version=marker['data_version'], completed_at=marker['completed_at'])
+
+
+@server.route("/metrics")
+def metrics():
+    """ Prometheus metrics for this worker process (dashboard_db_seconds per callback). """
+    return flask.Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
 # Global font settings
 FONT_FAMILY = 'Helvetica, Arial, sans-serif'
 TITLE_FONT_SIZE = 24
 AXIS_TITLE_FONT_SIZE = 14
 TEXT_FONT_SIZE = 16
 
+# Comparison view
+ALL_SECTORS = '__all__'
+TOTAL_COLOR = '#222222'
+# Fill for forecast intervals; nested bands darken towards the point forecast
+INTERVAL_FILL = 'rgba(99, 110, 250, 0.15)'
+
 # Queries
 
 
-def query_historical(country: str, sector: str) -> pd.DataFrame:
-    conn = sqlite3.connect(DB_PATH)
-    query = """
-        SELECT year, emissions_ktco2, emissions_per_capita
-        FROM emissions_data
-        WHERE country_name = ? AND sector_name = ?
-        ORDER BY year
+@lru_cache(maxsize=4)
+def _pairs_for_version(db_path: str, version: str) -> tuple:
+    conn = sqlite3.connect(db_path)
+    try:
+        query = "SELECT DISTINCT country_name, sector_name FROM emissions_data ORDER BY country_name, sector_name"
+        rows = conn.execute(query).fetchall()
+    except sqlite3.OperationalError:
+        # DB exists but has not been loaded yet
+        return ()
+    finally:
+        conn.close()
+    return tuple(rows)
+
+
+def get_country_sector_pairs(db_path: str | None=None) -> tuple:
     """
-    df = pd.read_sql_query(query, conn, params=(country, sector))
-    conn.close()
-    return df
-
-
-def query_forecast(country: str, sector: str) -> pd.DataFrame:
-    conn = sqlite3.connect(DB_PATH)
-    query = """
-        SELECT year, forecast_emissions_ktco2, forecast_emissions_per_capita
-        FROM emissions_forecast
-        WHERE country_name = ? AND sector_name = ?
-        ORDER BY year
+    Every (country, sector) pair in emissions_data, cached per data version.
+
+    Returns an empty tuple while the database does not exist yet.
     """
-    df = pd.read_sql_query(query, conn, params=(country, sector))
-    conn.close()
-    return df
+    db_path = str(db_path or DB_PATH)
+    version = get_data_version(db_path)
+    if version is None:
+        return ()
+    return _pairs_for_version(db_path, version)
+
+
+def get_country_sector_options(db_path: str | None=None) -> list[dict]:
+    """ Dropdown options for every country/sector pair. """
+    return [{'label': f"{c} - {s}", 'value': f"{c}|||{s}"} for c, s in get_country_sector_pairs(db_path)]
 
 
-def get_country_sector_options():
-    conn = sqlite3.connect(DB_PATH)
-    query = "SELECT DISTINCT country_name, sector_name FROM emissions_data ORDER BY country_name, sector_name"
-    rows = conn.execute(query).fetchall()
-    conn.close()
-    return [{'label': f"{c} - {s}", 'value': f"{c}|||{s}"} for c, s in rows]
+def get_compare_options(db_path: str | None=None) -> tuple[list[dict], list[dict]]:
+    """ Country and sector dropdown options for the comparison view. """
+    pairs = get_country_sector_pairs(db_path)
+    countries = sorted({c for c, _ in pairs})
+    sectors = sorted({s for _, s in pairs})
+    country_options = [{'label': c, 'value': c} for c in countries]
+    sector_options = [{'label': 'All sectors', 'value': ALL_SECTORS}] + [{'label': s, 'value': s} for s in sectors]
+    return country_options, sector_options
+
+
+@lru_cache(maxsize=2)
+def _bundle_for_version(db_path: str, version: str) -> dict:
+    bundle = build_series_bundle(db_path)
+    bundle['version'] = version
+    # the browser cannot resolve template names, so ship the default one
+    bundle['template'] = pio.templates[pio.templates.default].to_plotly_json()
+    return bundle
 
 # App layout
-app.layout = html.Div(
-    style={'fontFamily': FONT_FAMILY, 'margin': '40px'},
-    children=[
-        html.H1("EU Emissions Dashboard", style={'fontSize': TITLE_FONT_SIZE}),
-        html.P(
-            "Use this dashboard to explore historical and forecasted greenhouse gas emissions. "
-            "Select a country and sector below to view two separate charts: one for total emissions and another for emissions per capita.",
-            style={'fontSize': TEXT_FONT_SIZE}
-        ),
-        html.Div([
-            html.Label("Select Country and Sector:", style={'fontSize': TEXT_FONT_SIZE}),
-            dcc.Dropdown(
-                id="country-sector-dropdown",
-                options=get_country_sector_options(),
-                value=None,
-                placeholder="Select a country and sector",
-                clearable=True,
-                searchable=True,
-                style={
-                    'width': '400px',
-                    'fontSize': TEXT_FONT_SIZE
-                }
+
+
+def serve_layout():
+    """ Build the page layout. Called by Dash on every page load, so it must not touch the DB. """
+    return html.Div(
+        style={'fontFamily': FONT_FAMILY, 'margin': '40px'},
+        children=[
+            dcc.Location(id="url"),
+            html.H1("EU Emissions Dashboard", style={'fontSize': TITLE_FONT_SIZE}),
+            html.P(
+                "Use this dashboard to explore historical and forecasted greenhouse gas emissions. "
+                "Select a country and sector below to view two separate charts: one for total emissions and another for emissions per capita.",
+                style={'fontSize': TEXT_FONT_SIZE}
             ),
-        ], style={'marginBottom': '30px'}),
+            dcc.Tabs(id="view-tabs", value="single", children=[
+                dcc.Tab(label="Single series", value="single", children=[
+                        html.Div([
+                            html.Label("Select Country and Sector:", style={'fontSize': TEXT_FONT_SIZE}),
+                            dcc.Dropdown(
+                                id="country-sector-dropdown",
+                                options=[],
+                                value=None,
+                                placeholder="Select a country and sector",
+                                clearable=True,
+                                searchable=True,
+                                style={
+                                    'width': '400px',
+                                    'fontSize': TEXT_FONT_SIZE
+                                }
+                            ),
+                        ], style={'marginBottom': '30px'}),
 
-        html.Div([
-            dcc.Graph(id="total-emissions-chart"),
-            dcc.Graph(id="per-capita-chart")
-        ], style={'display': 'grid', 'gridTemplateColumns': '1fr 1fr', 'gap': '20px'}),
+                        html.Div([
+                            dcc.Graph(id="total-emissions-chart"),
+                            dcc.Graph(id="per-capita-chart")
+                        ], style={'display': 'grid', 'gridTemplateColumns': '1fr 1fr', 'gap': '20px'}),
+
+                        html.Div(id="no-data-message", style={'color': 'red', 'fontSize': TEXT_FONT_SIZE, 'marginTop': '20px'})
+                ]),
+                dcc.Tab(label="Compare", value="compare", children=[
+                    html.P(
+                        "Compare several countries for one sector, or all sectors of one country.",
+                        style={'fontSize': TEXT_FONT_SIZE}
+                    ),
+                    html.Div([
+                        html.Div([
+                            html.Label("Countries:", style={'fontSize': TEXT_FONT_SIZE}),
+                            dcc.Dropdown(id="compare-countries", options=[], multi=True,
+                                         placeholder="Select countries", style={'fontSize': TEXT_FONT_SIZE}),
+                        ]),
+                        html.Div([
+                            html.Label("Sector:", style={'fontSize': TEXT_FONT_SIZE}),
+                            dcc.Dropdown(id="compare-sector", options=[], value=None,
+                                         placeholder="Select a sector", style={'fontSize': TEXT_FONT_SIZE}),
+                        ]),
+                    ], style={'display': 'grid', 'gridTemplateColumns': '2fr 1fr', 'gap': '20px', 'marginBottom': '20px'}),
+                    dcc.RadioItems(
+                        id="compare-metric",
+                        options=[
+                            {'label': 'Total emissions', 'value': 'emissions_ktco2'},
+                            {'label': 'Emissions per capita', 'value': 'emissions_per_capita'},
+                        ],
+                        value='emissions_ktco2',
+                        inline=True,
+                        style={'fontSize': TEXT_FONT_SIZE}
+                    ),
+                    dcc.Checklist(
+                        id="compare-total",
+                        options=[{'label': 'Show total of selection', 'value': 'total'}],
+                        value=['total'],
+                        style={'fontSize': TEXT_FONT_SIZE}
+                    ),
+                    dcc.Graph(id="compare-chart"),
+                    html.Div(id="compare-message", style={'color': 'red', 'fontSize': TEXT_FONT_SIZE, 'marginTop': '20px'}),
+                ]),
+            ]),
+        ] + ([dcc.Store(id="series-bundle", storage_type="local")] if DASHBOARD_CLIENTSIDE else [])
+    )
+
+
+app.layout = serve_layout
+
+
+def record_db_time(callback: str, db_time_ms: float, **fields):
+    """ Time a callback spent in the database: dashboard_db_seconds per callback, plus a debug log line. """
+    histogram('dashboard_db_seconds', 'Dashboard callback time in the database').observe(db_time_ms / 1000, callback=callback)
+    log_event('dashboard_query', logging.DEBUG, callback=callback, db_time_ms=round(db_time_ms, 2), **fields)
 
-        html.Div(id="no-data-message", style={'color': 'red', 'fontSize': TEXT_FONT_SIZE, 'marginTop': '20px'})
-    ]
-)
 
 # Callbacks
 @app.callback(
-    [Output("total-emissions-chart", "figure"),
-     Output("per-capita-chart", "figure"),
-     Output("no-data-message", "children")],
-    [Input("country-sector-dropdown", "value")]
+    [Output("country-sector-dropdown", "options"),
+     Output("compare-countries", "options"),
+     Output("compare-sector", "options")],
+    Input("url", "pathname")
 )
+def load_dropdown_options(_pathname):
+    return (get_country_sector_options(), *get_compare_options())
+
+
+def load_series_bundle(_pathname, stored):
+    """ Send the series bundle only when the browser's copy is missing or out of date. """
+    version = get_data_version(DB_PATH)
+    if version is None:
+        return None
+    if stored and stored.get('version') == version:
+        return dash.no_update
+    return _bundle_for_version(str(DB_PATH), version)
+
+
+def _interval_traces(forecast_df: pd.DataFrame, column: str) -> list:
+    """ Shaded prediction interval bands for a forecast column, widest level first. """
+    traces = []
+    for level in interval_levels(forecast_df.columns, column):
+        lower = forecast_df[f"{column}_lower_{level}"]
+        upper = forecast_df[f"{column}_upper_{level}"]
+        if lower.isna().all():
+            continue
+        traces.append(go.Scatter(
+            x=forecast_df['year'], y=upper, mode='lines', line={'width': 0},
+            showlegend=False, hoverinfo='skip', legendgroup=f"interval_{level}",
+        ))
+        traces.append(go.Scatter(
+            x=forecast_df['year'], y=lower, mode='lines', line={'width': 0},
+            fill='tonexty', fillcolor=INTERVAL_FILL, name=f"{level}% interval",
+            legendgroup=f"interval_{level}",
+        ))
+    return traces
+
+
 def update_charts(selected_value):
     # Default empty
     empty_fig = go.Figure()
@@ -113,8 +260,9 @@ def update_charts(selected_value):
         return empty_fig, empty_fig, ""
 
     country, sector = selected_value.split("|||")
-    hist_df = query_historical(country, sector)
-    forecast_df = query_forecast(country, sector)
+    series_df = query_series(country, sector, db_path=DB_PATH)
+    record_db_time('update_charts', series_df.attrs['db_time_ms'], country=country, sector=sector)
+    hist_df, forecast_df = split_series(series_df)
 
     if hist_df.empty:
         return empty_fig, empty_fig, f"No data found for {country} - {sector}."
@@ -126,8 +274,9 @@ def update_charts(selected_value):
         mode='lines+markers', name='Historical',
     ))
     if not forecast_df.empty:
+        total_fig.add_traces(_interval_traces(forecast_df, 'emissions_ktco2'))
         total_fig.add_trace(go.Scatter(
-            x=forecast_df['year'], y=forecast_df['forecast_emissions_ktco2'],
+            x=forecast_df['year'], y=forecast_df['emissions_ktco2'],
             mode='lines+markers', name='Forecast', line=dict(dash='dash')
         ))
     total_fig.update_layout(
@@ -144,8 +293,9 @@ def update_charts(selected_value):
         mode='lines+markers', name='Historical',
     ))
     if not forecast_df.empty:
+        percap_fig.add_traces(_interval_traces(forecast_df, 'emissions_per_capita'))
         percap_fig.add_trace(go.Scatter(
-            x=forecast_df['year'], y=forecast_df['forecast_emissions_per_capita'],
+            x=forecast_df['year'], y=forecast_df['emissions_per_capita'],
             mode='lines+markers', name='Forecast', line=dict(dash='dash')
         ))
     percap_fig.update_layout(
@@ -159,5 +309,102 @@ def update_charts(selected_value):
     return total_fig, percap_fig, ""
 
 
+def _series_label(df: pd.DataFrame) -> pd.Series:
+    """ Name traces after whichever dimension varies in the selection. """
+    if df['country_name'].nunique() == 1:
+        return df['sector_name']
+    if df['sector_name'].nunique() == 1:
+        return df['country_name']
+    return df['country_name'] + ' - ' + df['sector_name']
+
+
+@app.callback(
+    [Output("compare-chart", "figure"),
+     Output("compare-message", "children")],
+    [Input("compare-countries", "value"),
+     Input("compare-sector", "value"),
+     Input("compare-metric", "value"),
+     Input("compare-total", "value")]
+)
+def update_comparison(countries, sector, metric, show_total):
+    import pandas as pd
+
+    empty_fig = go.Figure()
+    empty_fig.update_layout(
+        template='plotly_white',
+        font={'family': FONT_FAMILY}
+    )
+    if not countries or not sector:
+        return empty_fig, ""
+
+    sectors = None if sector == ALL_SECTORS else [sector]
+    df = query_series_batch(countries, sectors, metric, db_path=DB_PATH)
+    record_db_time('update_comparison', df.attrs['db_time_ms'], countries=len(countries), sector=sector)
+    if df.empty:
+        return empty_fig, "No data found for the selected countries and sector."
+
+    # Totals: per capita values only add up across the sectors of one country,
+    # and sector totals are series of their own, so they are not added again
+    summable = metric == 'emissions_ktco2' or len(countries) == 1
+    is_total_sector = df['sector_name'].str.startswith('Total') & (sectors is None)
+    df['label'] = _series_label(df)
+    df = df[['source', 'label', 'year', 'value']]
+    total = None
+    if show_total and summable:
+        total = total_series(df[~is_total_sector])
+
+    df = reduce_series(df, COMPARE_MAX_TRACES, how='sum' if summable else 'mean')
+    if total is not None:
+        df = pd.concat([df, total], ignore_index=True)
+
+    palette = px_colors.qualitative.Plotly
+    fig = go.Figure()
+    for i, (label, series) in enumerate(df.groupby('label', sort=False)):
+        color = TOTAL_COLOR if label == 'Total' else palette[i % len(palette)]
+        for source, dash_style in (('historical', None), ('forecast', 'dash')):
+            part = series[series['source'] == source].sort_values('year')
+            if part.empty:
+                continue
+            x, y = downsample(part['year'].to_numpy(), part['value'].to_numpy(dtype=float), COMPARE_MAX_POINTS)
+            fig.add_trace(go.Scatter(
+                x=x, y=y, mode='lines', name=label, legendgroup=label,
+                showlegend=source == 'historical',
+                line={'color': color, 'dash': dash_style}
+            ))
+
+    metric_title = "Total Emissions" if metric == 'emissions_ktco2' else "Emissions Per Capita"
+    fig.update_layout(
+        title=f"{metric_title}: {'all sectors' if sectors is None else sector}",
+        xaxis_title="Year",
+        yaxis_title="Emissions (kt CO₂)" if metric == 'emissions_ktco2' else "Emissions per Person (kg)",
+        font={'family': FONT_FAMILY}
+    )
+    message = "" if summable or not show_total else "Per capita totals are only shown for a single country."
+    return fig, message
+
+
+chart_outputs = [
+    Output("total-emissions-chart", "figure"),
+    Output("per-capita-chart", "figure"),
+    Output("no-data-message", "children"),
+]
+
+if DASHBOARD_CLIENTSIDE:
+    # Charts are drawn in the browser (assets/clientside.js) from the bundle
+    app.callback(
+        Output("series-bundle", "data"),
+        Input("url", "pathname"),
+        State("series-bundle", "data")
+    )(load_series_bundle)
+    app.clientside_callback(
+        ClientsideFunction(namespace="emissions", function_name="updateCharts"),
+        chart_outputs,
+        [Input("country-sector-dropdown", "value"), Input("series-bundle", "data")]
+    )
+else:
+    app.callback(chart_outputs, [Input("country-sector-dropdown", "value")])(update_charts)
+
+
 if __name__ == "__main__":
-    app.run(debug=True)
+    # Development server only; production uses gunicorn (see gunicorn.conf.py)
+    app.run(host=BIND_HOST, port=DASHBOARD_PORT, debug=DASHBOARD_DEBUG)
@@ -0,0 +1,94 @@
+// Clientside chart rendering for DASHBOARD_CLIENTSIDE mode.
+// Mirrors update_charts in dashboard/app.py, reading from the series bundle
+// built by analysis.queries.build_series_bundle.
+
+const FONT_FAMILY = 'Helvetica, Arial, sans-serif';
+const INTERVAL_FILL = 'rgba(99, 110, 250, 0.15)';
+
+function sliceSeries(part, index, column) {
+    return part[column].slice(part.offsets[index], part.offsets[index + 1]);
+}
+
+// Shaded prediction interval bands (e.g. emissions_ktco2_lower_80), widest first
+function intervalTraces(bundle, index, column, years) {
+    const prefix = column + '_lower_';
+    const levels = Object.keys(bundle.forecast)
+        .filter(key => key.startsWith(prefix) && (column + '_upper_' + key.slice(prefix.length)) in bundle.forecast)
+        .map(key => Number(key.slice(prefix.length)))
+        .sort((a, b) => b - a);
+    const traces = [];
+    for (const level of levels) {
+        const lower = sliceSeries(bundle.forecast, index, `${column}_lower_${level}`);
+        if (lower.every(v => v === null)) {
+            continue;
+        }
+        traces.push({
+            type: 'scatter', x: years, y: sliceSeries(bundle.forecast, index, `${column}_upper_${level}`),
+            mode: 'lines', line: {width: 0}, showlegend: false, hoverinfo: 'skip',
+            legendgroup: `interval_${level}`
+        });
+        traces.push({
+            type: 'scatter', x: years, y: lower,
+            mode: 'lines', line: {width: 0}, fill: 'tonexty', fillcolor: INTERVAL_FILL,
+            name: `${level}% interval`, legendgroup: `interval_${level}`
+        });
+    }
+    return traces;
+}
+
+function buildFigure(bundle, index, column, title, yTitle) {
+    const data = [{
+        type: 'scatter',
+        x: sliceSeries(bundle.historical, index, 'year'),
+        y: sliceSeries(bundle.historical, index, column),
+        mode: 'lines+markers',
+        name: 'Historical'
+    }];
+    const forecastYears = sliceSeries(bundle.forecast, index, 'year');
+    if (forecastYears.length > 0) {
+        data.push(...intervalTraces(bundle, index, column, forecastYears));
+        data.push({
+            type: 'scatter',
+            x: forecastYears,
+            y: sliceSeries(bundle.forecast, index, column),
+            mode: 'lines+markers',
+            name: 'Forecast',
+            line: {dash: 'dash'}
+        });
+    }
+    return {
+        data: data,
+        layout: {
+            template: bundle.template,
+            title: {text: title},
+            xaxis: {title: {text: 'Year'}},
+            yaxis: {title: {text: yTitle}},
+            font: {family: FONT_FAMILY}
+        }
+    };
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    emissions: {
+        updateCharts: function(selectedValue, bundle) {
+            const emptyFig = {data: [], layout: {font: {family: FONT_FAMILY}}};
+            if (!selectedValue || !bundle) {
+                return [emptyFig, emptyFig, ''];
+            }
+
+            const [country, sector] = selectedValue.split('|||');
+            const index = bundle.keys.indexOf(selectedValue);
+            if (index < 0 || bundle.historical.offsets[index] === bundle.historical.offsets[index + 1]) {
+                return [emptyFig, emptyFig, `No data found for ${country} - ${sector}.`];
+            }
+
+            return [
+                buildFigure(bundle, index, 'emissions_ktco2',
+                            `Total Emissions for ${country} - ${sector}`, 'Emissions (kt CO₂)'),
+                buildFigure(bundle, index, 'emissions_per_capita',
+                            `Emissions Per Capita for ${country} - ${sector}`, 'Emissions per Person (kg)'),
+                ''
+            ];
+        }
+    }
+});
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import itertools
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+
+def reduce_series(df: pd.DataFrame, max_series: int, how: str='sum') -> pd.DataFrame:
+    """
+    Keep the max_series largest series and fold the rest into a single 'Other' series.
+
+    Parameters:
+        df (pd.DataFrame): Long frame with [source, label, year, value]
+        max_series (int): Number of series to keep as individual traces
+        how (str): 'sum' or 'mean', how the folded series are combined
+
+    Returns:
+        pd.DataFrame: Same columns, with at most max_series + 1 labels
+    """
+    import pandas as pd
+
+    labels = df['label'].unique()
+    if len(labels) <= max_series:
+        return df
+
+    # rank by the latest historical value of each series
+    hist = df[df['source'] == 'historical'].sort_values('year')
+    latest = hist.groupby('label')['value'].last().abs().sort_values(ascending=False)
+    keep = set(latest.index[:max_series])
+
+    kept = df[df['label'].isin(keep)]
+    rest = df[~df['label'].isin(keep)]
+    other = rest.groupby(['source', 'year'], as_index=False)['value'].agg(how)
+    other['label'] = f"Other ({len(labels) - len(keep)} series)"
+    return pd.concat([kept, other[df.columns]], ignore_index=True)
+
+
+def total_series(df: pd.DataFrame, label: str='Total') -> pd.DataFrame:
+    """ Return one series summing all labels per source and year. """
+    total = df.groupby(['source', 'year'], as_index=False)['value'].sum(min_count=1)
+    total['label'] = label
+    return total[df.columns]
+
+
+def downsample(x: np.ndarray, y: np.ndarray, max_points: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Min/max decimation: split the series into buckets and keep each bucket's
+    extremes, so peaks survive while the point count stays under max_points.
+    """
+    import numpy as np
+
+    n = len(x)
+    if n <= max_points or max_points < 4:
+        return x, y
+
+    n_buckets = max_points // 2
+    edges = np.linspace(0, n, n_buckets + 1).astype(int)
+    keep = []
+    for start, end in itertools.pairwise(edges):
+        if end <= start:
+            continue
+        bucket = y[start:end]
+        if np.all(np.isnan(bucket)):
+            keep.append(start)
+            continue
+        lo = start + int(np.nanargmin(bucket))
+        hi = start + int(np.nanargmax(bucket))
+        keep.extend(sorted({lo, hi}))
+    keep = np.array(keep)
+    return x[keep], y[keep]
+
+
+def interval_levels(columns, column: str) -> list:
+    """ Levels with both <column>_lower_<level> and _upper_<level> present, widest first. """
+    columns = set(columns)
+    levels = set()
+    for name in columns:
+        prefix = f"{column}_lower_"
+        if name.startswith(prefix) and name[len(prefix):].isdigit():
+            level = int(name[len(prefix):])
+            if f"{column}_upper_{level}" in columns:
+                levels.add(level)
+    return sorted(levels, reverse=True)
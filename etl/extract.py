@@ -2,6 +2,8 @@ import pandas as pd
 
 from eurostatapiclient import EurostatAPIClient
 
+from etl.jsonstat import fetch_dataset
+
 
 def fetch_emissions_data(start_year: int=1990, end_year: int=2023, geo_filter: list=None) -> pd.DataFrame:
     """
@@ -26,9 +28,8 @@ def fetch_emissions_data(start_year: int=1990, end_year: int=2023, geo_filter: l
     if geo_filter:
         params['geo'] = geo_filter
 
-    dataset = client.get_dataset(dataset_code, params=params)
-
-    df = dataset.to_dataframe()
+    # decoded straight from the JSON-stat response (etl/jsonstat.py), observed cells only
+    df = fetch_dataset(client, dataset_code, params)
     df = df[(df['time'].astype(int) >= start_year) & (df['time'].astype(int) <= end_year)]
 
     return df
@@ -59,8 +60,7 @@ def fetch_population_data(start_year: int=1990, end_year: int=2023, geo_filter:
     if geo_filter:
         params['geo'] = geo_filter
 
-    dataset = client.get_dataset(dataset_code, params=params)
-    df = dataset.to_dataframe()
+    df = fetch_dataset(client, dataset_code, params)
 
     # Clean and format
     df = df.rename(columns={
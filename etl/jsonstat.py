@@ -0,0 +1,89 @@
+"""
+Vectorized JSON-stat 2.0 decoder for Eurostat API responses.
+
+eurostatapiclient's Dataset.to_dataframe() walks the whole cube one cell at a
+time in Python. A JSON-stat response already describes the cube completely:
+  - id / size:   dimension names and their lengths, in row-major order
+  - dimension[d]['category']['index']: category code -> position along d
+  - value:       flat row-major index -> observation, as a dict (sparse)
+                 or a list (dense, null for missing)
+so the columns can be built with NumPy: one array of flat indices, one
+np.unravel_index call for the per-dimension positions, and a categorical
+column per dimension whose codes are those positions.
+"""
+import numpy as np
+import pandas as pd
+
+
+def _category_labels(dimension: dict) -> list:
+    """ Category codes of one dimension ordered by their position. """
+    index = dimension['category']['index']
+    if isinstance(index, list):
+        return index
+    labels = [None] * len(index)
+    for code, position in index.items():
+        labels[position] = code
+    return labels
+
+
+def decode(payload: dict, dense: bool=True, value_column: str='values') -> pd.DataFrame:
+    """
+    JSON-stat 2.0 dataset to a DataFrame.
+
+    Parameters:
+        payload (dict): Parsed JSON-stat response
+        dense (bool): One row per cell of the cube with NaN for missing values,
+            like Dataset.to_dataframe(); False keeps observed cells only
+        value_column (str): Name of the value column
+
+    Returns:
+        pd.DataFrame: value_column followed by one categorical column of
+        category codes per dimension, in row-major cube order
+    """
+    dims = payload['id']
+    sizes = np.asarray(payload['size'], dtype=np.int64)
+    total = int(np.prod(sizes)) if len(sizes) else 0
+    raw = payload.get('value', {})
+
+    if isinstance(raw, dict):
+        flat = np.fromiter(map(int, raw.keys()), dtype=np.int64, count=len(raw))
+        observed = np.array(list(raw.values()), dtype=float)
+        order = np.argsort(flat, kind='stable')
+        flat, observed = flat[order], observed[order]
+    else:
+        observed = np.array(raw, dtype=float)
+        flat = np.arange(len(observed), dtype=np.int64)
+        if not dense:
+            keep = ~np.isnan(observed)
+            flat, observed = flat[keep], observed[keep]
+
+    if dense:
+        values = np.full(total, np.nan)
+        values[flat] = observed
+        positions = np.unravel_index(np.arange(total, dtype=np.int64), sizes) if total else [[]] * len(dims)
+    else:
+        values = observed
+        positions = np.unravel_index(flat, sizes) if len(flat) else [np.empty(0, dtype=np.int64)] * len(dims)
+
+    columns = {value_column: values}
+    for dim, codes in zip(dims, positions):
+        labels = _category_labels(payload['dimension'][dim])
+        columns[dim] = pd.Categorical.from_codes(np.asarray(codes, dtype=np.int64), categories=labels)
+    return pd.DataFrame(columns)
+
+
+def fetch_dataset(client, dataset_code: str, params: dict, dense: bool=False) -> pd.DataFrame:
+    """
+    Fetch a Eurostat dataset through the client's HTTP session and decode it
+    with decode(). The request is the one client.get_dataset() sends: the
+    dataset code appended to api_url, plus the client's format and language.
+    Clients without a session (or api_url) fall back to
+    client.get_dataset(...).to_dataframe().
+    """
+    session, api_url = getattr(client, 'session', None), getattr(client, 'api_url', None)
+    if session is None or api_url is None:
+        return client.get_dataset(dataset_code, params=params).to_dataframe()
+    params = {**params, 'format': client.response_type, 'lang': client.language}
+    response = session.get(f'{api_url}/{dataset_code}', params=params)
+    response.raise_for_status()
+    return decode(response.json(), dense=dense)
@@ -28,8 +28,27 @@ def create_table(conn: sqlite3.Connection):
     );
     ''')
 
+    conn.commit()
+    create_indexes(conn)
+
+
+def create_indexes(conn: sqlite3.Connection):
+    """
+    Create the lookup indexes on emissions_data and emissions_forecast.
+
+    to_sql(if_exists='replace') drops a table together with its indexes,
+    so this must run again after every full reload.
+    """
+    cursor = conn.cursor()
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_year ON emissions_data(year);")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_country ON emissions_data(country_name);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_series ON emissions_data(country_name, sector_name, year);")
+
+    has_forecast = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'emissions_forecast'"
+    ).fetchone()
+    if has_forecast:
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_forecast_series ON emissions_forecast(country_name, sector_name, year);")
 
     conn.commit()
 
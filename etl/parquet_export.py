@@ -0,0 +1,117 @@
+"""
+Parquet copy of emissions_data and emissions_forecast for the duckdb
+analytics backend (see analysis/backends.py).
+
+Each table is written as a hive-partitioned dataset, one file per year
+(<table>-<version>/year=2020/part-0.parquet), with rows sorted by country and
+sector so the Parquet min/max statistics also prune country filters. Tables are
+read back from SQLite one year at a time, so memory stays at one partition.
+
+A new export goes to new directories. manifest.json, which readers resolve
+table paths from, is then replaced atomically, so queries never see a
+half-written dataset. The previous export is kept for queries still reading
+it; older ones are deleted.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+from datetime import UTC, datetime
+from pathlib import Path
+
+from config.settings import DB_PATH, PARQUET_DIR
+from etl.readiness import db_fingerprint
+
+TABLES = ('emissions_data', 'emissions_forecast')
+PARTITION_COLUMN = 'year'
+MANIFEST_NAME = 'manifest.json'
+# SQLite declared type -> DuckDB type (anything else is stored as text)
+DUCKDB_TYPES = {'INTEGER': 'BIGINT', 'REAL': 'DOUBLE', 'TEXT': 'VARCHAR'}
+
+
+def read_manifest(parquet_dir: str | None=None) -> dict | None:
+    """ The current export's manifest, or None if nothing was exported yet. """
+    try:
+        return json.loads((Path(parquet_dir or PARQUET_DIR) / MANIFEST_NAME).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_table(conn: sqlite3.Connection, table: str, target: Path) -> dict:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_types = {'BIGINT': pa.int64(), 'DOUBLE': pa.float64(), 'VARCHAR': pa.string()}
+    columns = [(row[1], DUCKDB_TYPES.get(row[2].upper(), 'VARCHAR'))
+               for row in conn.execute(f"PRAGMA table_info({table})")]
+    values = [name for name, _ in columns if name != PARTITION_COLUMN]
+    schema = pa.schema([(name, arrow_types[kind]) for name, kind in columns if name != PARTITION_COLUMN])
+    order = ', '.join(c for c in ('country_name', 'sector_name') if c in values)
+
+    rows = 0
+    target.mkdir(parents=True)
+    years = [row[0] for row in conn.execute(f"SELECT DISTINCT {PARTITION_COLUMN} FROM {table} ORDER BY 1")]
+    for year in years:
+        cursor = conn.execute(
+            f"SELECT {', '.join(values)} FROM {table} WHERE {PARTITION_COLUMN} = ?" + (f" ORDER BY {order}" if order else ""),
+            (year,),
+        )
+        data = list(zip(*cursor.fetchall()))
+        partition = pa.table([pa.array(column, type=field.type) for column, field in zip(data, schema)], schema=schema)
+        (target / f"{PARTITION_COLUMN}={year}").mkdir()
+        pq.write_table(partition, target / f"{PARTITION_COLUMN}={year}" / 'part-0.parquet')
+        rows += partition.num_rows
+    return {'path': target.name, 'rows': rows, 'columns': columns}
+
+
+def export_parquet(db_path: str | None=None, parquet_dir: str | None=None) -> dict:
+    """
+    Write emissions_data and emissions_forecast (if present) as year-partitioned
+    Parquet and make them the current export.
+
+    Returns:
+        dict: The new manifest (version, data_version of the database, tables)
+    """
+    db_path = str(db_path or DB_PATH)
+    parquet_dir = Path(parquet_dir or PARQUET_DIR)
+    parquet_dir.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+    version = f"{datetime.now(UTC).strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        present = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        tables = {table: _write_table(conn, table, parquet_dir / f"{table}-{version}")
+                  for table in TABLES if table in present}
+    finally:
+        conn.close()
+
+    previous = read_manifest(parquet_dir)
+    manifest = {
+        'version': version,
+        'data_version': db_fingerprint(db_path),
+        'exported_at': datetime.now(UTC).isoformat(timespec='seconds'),
+        'tables': tables,
+    }
+    tmp_path = parquet_dir / (MANIFEST_NAME + '.tmp')
+    tmp_path.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp_path, parquet_dir / MANIFEST_NAME)
+
+    # keep this export and the previous one
+    keep = {entry['path'] for entry in tables.values()}
+    if previous is not None:
+        keep |= {entry['path'] for entry in previous['tables'].values()}
+    for path in parquet_dir.iterdir():
+        if path.is_dir() and path.name.startswith(TABLES) and path.name not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+    summary = ', '.join(f"{table} ({entry['rows']} rows)" for table, entry in tables.items())
+    print(f"Exported {summary} to {parquet_dir} "
+          f"in {time.perf_counter() - started:.2f}s")
+    return manifest
+
+
+if __name__ == "__main__":
+    export_parquet()
@@ -1,38 +1,169 @@
-from etl.extract import fetch_emissions_data
+import argparse
+import sqlite3
+
+from config.settings import DB_PATH, CHECKPOINT_DIR, COUNTRY_MAP, FORECAST_QUEUE, PARQUET_EXPORT, PROFILE_MODE
+from etl.extract import fetch_emissions_data, fetch_population_data
 from etl.transform import transform_emissions_data
-from etl.load import create_connection, create_table, load_transformed_data
-from analysis.forecast import forecast_all, load_forecasts_to_db
+from etl.load import create_connection
+from etl.readiness import mark_ready, read_ready_marker
+from etl.stages import Stage, StageRunner, format_report
+from etl.vintages import record_vintage
+from monitoring.profiling import PROFILE_MODES, resolve_mode, run_directory
+
+STAGE_NAMES = ['extract_emissions', 'extract_population', 'transform', 'load', 'forecast', 'materialize']
+
+
+def _table_exists(table: str) -> bool:
+    try:
+        conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+    except sqlite3.OperationalError:
+        return False
+    try:
+        return conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone() is not None
+    finally:
+        conn.close()
+
+
+def _emissions_loaded() -> bool:
+    """ True if emissions_data exists, i.e. the load stage's output is still there. """
+    return _table_exists('emissions_data')
+
+
+def _forecasts_loaded() -> bool:
+    """ True if emissions_forecast exists, i.e. the forecast stage's output is still there. """
+    return _table_exists('emissions_forecast')
 
 
-def run_pipeline(start_year: int=1990, end_year: int=2023):
+def _materialized() -> bool:
     """
-    Full ETL + Forecast pipeline:
-      1. Extract emissions data
-      2. Transform emissions data
-      3. Load historical data into SQLite
-      4. Forecast emissions & emissions_per_capita for all countries/sectors
-      5. Load forecasts into SQLite
+    True if the ready marker matches the database and, with PARQUET_EXPORT,
+    the Parquet export was written from this same version (e.g. not when the
+    export was switched on after the last run).
+    """
+    marker = read_ready_marker()
+    if marker is None:
+        return False
+    if not PARQUET_EXPORT:
+        return True
+    from etl.parquet_export import read_manifest
+    manifest = read_manifest()
+    return manifest is not None and manifest['data_version'] == marker['data_version']
+
+
+def build_stages(start_year: int=1990, end_year: int=2023, forecast_years: int=10, release_date: str | None=None) -> list:
+    """
+    The ETL + forecast stage graph:
+      (extract_emissions, extract_population) -> transform -> load -> forecast -> materialize
+
+    Both extracts only depend on configuration, so they run concurrently and
+    extraction takes as long as the slower of the two downloads. The load
+    stage records the extract as the vintage of release_date (default today),
+    writing only the values that changed since the previous vintage. The
+    forecast stage writes emissions_forecast in batches as series finish, so
+    it has no checkpointed output.
     """
-    print("Extracting emissions data...")
-    emissions_raw_data = fetch_emissions_data(start_year, end_year)
+    years = {'start_year': start_year, 'end_year': end_year}
 
-    print("Transforming emissions data...")
-    transformed_data = transform_emissions_data(emissions_raw_data)
+    def extract_emissions():
+        return fetch_emissions_data(start_year, end_year)
 
-    print("Creating table...")
-    conn = create_connection()
-    create_table(conn)
+    def extract_population():
+        # the configured countries, rather than waiting for the emissions extract
+        return fetch_population_data(start_year, end_year, geo_filter=list(COUNTRY_MAP))
 
-    print("Loading transformed data...")
-    load_transformed_data(transformed_data, conn)
-    conn.close()
+    def transform(emissions_raw, population):
+        return transform_emissions_data(emissions_raw, start_year, end_year, population_df=population)
 
-    print("Running ARIMA forecasts...")
-    forecasts_df = forecast_all(forecast_years=10)
-    load_forecasts_to_db(forecasts_df)
+    def load(transformed):
+        conn = create_connection()
+        try:
+            record_vintage(transformed, conn, release_date)
+        finally:
+            conn.close()
 
+    def forecast(_loaded):
+        # imported here so the other stages start without the forecasting stack
+        from analysis.forecast import load_forecasts_to_db, stream_forecasts
+        from analysis.worker import coordinate
+
+        # reads the freshly loaded emissions_data table; with FORECAST_QUEUE the
+        # fits are shared with any `analysis.worker work` processes
+        if FORECAST_QUEUE:
+            load_forecasts_to_db(coordinate(forecast_years=forecast_years))
+        else:
+            stream_forecasts(forecast_years=forecast_years)
+
+    def materialize(_forecasted):
+        marker = mark_ready()
+        print(f"Data version {marker['data_version']} marked ready.")
+
+    return [
+        Stage('extract_emissions', extract_emissions, params=years, always_run=True),
+        Stage('extract_population', extract_population, params=years, always_run=True),
+        Stage('transform', transform, deps=('extract_emissions', 'extract_population'), params=years),
+        Stage('load', load, deps=('transform',), is_current=_emissions_loaded),
+        Stage('forecast', forecast, deps=('load',), params={'forecast_years': forecast_years},
+              is_current=_forecasts_loaded),
+        Stage('materialize', materialize, deps=('forecast',), is_current=_materialized),
+    ]
+
+
+def run_pipeline(start_year: int=1990, end_year: int=2023, forecast_years: int=10,
+                 resume_from: str | None=None, only: list | None=None, force: bool=False,
+                 checkpoint_dir: str | None=None, profile_mode: str | None=None, release_date: str | None=None) -> dict:
+    """
+    Full ETL + Forecast pipeline:
+      1. Extract emissions and population data
+      2. Transform emissions data
+      3. Load the changes to the historical data into SQLite as a new vintage
+      4. Forecast emissions & emissions_per_capita for all countries/sectors,
+         writing them to SQLite as they finish
+      5. Export the Parquet copy (with PARQUET_EXPORT) and write the readiness marker
+
+    Every stage checkpoints its output, so a failed run can be resumed from
+    any stage, and stages whose inputs did not change are skipped.
+
+    profile_mode ('cprofile' or 'sample', default EUROSTAT_PROFILE) writes one
+    profile per stage to a new directory under PROFILE_DIR.
+
+    Returns:
+        dict: Per-stage status, rows, wall time, CPU time and peak memory
+    """
+    profile_mode = resolve_mode(profile_mode or PROFILE_MODE)
+    profile_dir = run_directory() if profile_mode else None
+    runner = StageRunner(build_stages(start_year, end_year, forecast_years, release_date), checkpoint_dir or CHECKPOINT_DIR,
+                         profile_mode=profile_mode, profile_dir=profile_dir)
+    results = runner.run(resume_from=resume_from, only=only, force=force)
+    print(format_report(results))
+    if profile_dir:
+        print(f"Stage profiles written to {profile_dir}")
     print("Pipeline complete (Historical + Forecast data updated).")
+    return results
+
+
+def main(argv: list | None=None):
+    parser = argparse.ArgumentParser(description="Run the Eurostat emissions ETL + forecast pipeline.")
+    parser.add_argument('--start-year', type=int, default=1990)
+    parser.add_argument('--end-year', type=int, default=2023)
+    parser.add_argument('--forecast-years', type=int, default=10)
+    parser.add_argument('--from', dest='resume_from', choices=STAGE_NAMES,
+                        help='Resume from this stage, reading earlier stages from checkpoints')
+    parser.add_argument('--only', nargs='+', choices=STAGE_NAMES,
+                        help='Run only these stages, reading their inputs from checkpoints')
+    parser.add_argument('--force', action='store_true', help='Run stages even if their inputs are unchanged')
+    parser.add_argument('--checkpoint-dir', default=None, help=f'Checkpoint directory (default {CHECKPOINT_DIR})')
+    parser.add_argument('--profile', nargs='?', const='cprofile', choices=PROFILE_MODES,
+                        help='Profile every stage (cprofile, or sample for flame graphs)')
+    parser.add_argument('--release-date', default=None,
+                        help='ISO date of the Eurostat release being loaded (default today)')
+    args = parser.parse_args(argv)
+
+    run_pipeline(args.start_year, args.end_year, args.forecast_years,
+                 resume_from=args.resume_from, only=args.only, force=args.force,
+                 checkpoint_dir=args.checkpoint_dir, profile_mode=args.profile, release_date=args.release_date)
 
 
 if __name__ == "__main__":
-    run_pipeline()
+    main()
@@ -0,0 +1,149 @@
+"""
+Readiness signalling between the pipeline and the serving containers.
+
+After a successful load the pipeline writes a small JSON marker next to the
+database recording the data version it produced. The marker is only valid
+while the database on disk still matches that version, so services never
+start on a half-written database, and they can block on the marker with
+inotify instead of polling for the database file.
+"""
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+
+from config.settings import DB_PATH, PARQUET_EXPORT, READY_MARKER_PATH
+
+# inotify event masks (see <sys/inotify.h>)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+
+def db_fingerprint(db_path: str | None=None) -> str | None:
+    """ Version string of the database file on disk (mtime and size), None if missing. """
+    try:
+        stat = os.stat(str(db_path or DB_PATH))
+    except FileNotFoundError:
+        return None
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def write_ready_marker(db_path: str | None=None, marker_path: str | None=None) -> dict:
+    """
+    Record that the database is completely loaded.
+
+    Call this after the last write of a pipeline run. The marker is replaced
+    atomically, so readers never see a partial file.
+    """
+    db_path = Path(db_path or DB_PATH)
+    marker_path = Path(marker_path or READY_MARKER_PATH)
+    version = db_fingerprint(db_path)
+    if version is None:
+        raise FileNotFoundError(f"Cannot mark missing database as ready: {db_path}")
+
+    marker = {
+        'data_version': version,
+        'db_path': str(db_path),
+        'completed_at': datetime.now(UTC).isoformat(timespec='seconds'),
+    }
+    tmp_path = marker_path.with_name(marker_path.name + '.tmp')
+    tmp_path.write_text(json.dumps(marker))
+    os.replace(tmp_path, marker_path)
+    return marker
+
+
+def read_ready_marker(db_path: str | None=None, marker_path: str | None=None) -> dict | None:
+    """ Return the marker if it exists and still matches the database, else None. """
+    try:
+        marker = json.loads(Path(marker_path or READY_MARKER_PATH).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if marker.get('data_version') != db_fingerprint(db_path):
+        # database changed since the marker was written (e.g. a reload in progress)
+        return None
+    return marker
+
+
+def mark_ready(db_path: str | None=None, marker_path: str | None=None) -> dict:
+    """
+    Publish the database after its last write: export the Parquet copy the
+    duckdb analytics backend reads (with PARQUET_EXPORT), then write the
+    marker. Anything that writes the database outside the pipeline's
+    materialize stage (e.g. analysis.worker finalize) must call this too.
+    """
+    if PARQUET_EXPORT:
+        from etl.parquet_export import export_parquet
+        export_parquet(db_path)
+    return write_ready_marker(db_path, marker_path)
+
+
+def _inotify_fd(directory: Path) -> int | None:
+    """ Watch directory for completed writes and renames; None if inotify is unavailable. """
+    libc_name = ctypes.util.find_library('c')
+    if not libc_name:
+        return None
+    try:
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except AttributeError:
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(str(directory)), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def wait_until_ready(timeout: float | None=None, db_path: str | None=None, marker_path: str | None=None,
+                     poll_interval: float=0.5) -> dict:
+    """
+    Block until a valid readiness marker exists and return it.
+
+    Uses inotify on the marker's directory where available and falls back to
+    polling every poll_interval seconds otherwise. Even with inotify the
+    marker is re-checked at least every few seconds.
+
+    Raises:
+        TimeoutError: if the data is not ready within timeout seconds
+    """
+    marker_path = Path(marker_path or READY_MARKER_PATH)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    fd = None
+    watching = False
+    try:
+        while True:
+            marker = read_ready_marker(db_path, marker_path)
+            if marker is not None:
+                return marker
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError(f"Data not ready after {timeout} seconds")
+
+            if not watching and marker_path.parent.is_dir():
+                fd = _inotify_fd(marker_path.parent)
+                watching = True
+
+            wait = poll_interval if fd is None else 5.0
+            if remaining is not None:
+                wait = min(wait, remaining)
+
+            if fd is None:
+                time.sleep(wait)
+            elif select.select([fd], [], [], wait)[0]:
+                # drain the queued events; we only need to know something happened
+                try:
+                    while os.read(fd, 4096):
+                        pass
+                except BlockingIOError:
+                    pass
+    finally:
+        if fd is not None:
+            os.close(fd)
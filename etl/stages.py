@@ -0,0 +1,338 @@
+"""
+Small stage-graph runner used by etl.pipeline.
+
+Each stage is a function of its dependencies' outputs. DataFrame outputs are
+checkpointed as Parquet next to a JSON metadata file recording a fingerprint
+of the stage's inputs, so a later run can:
+  - skip a stage whose inputs have not changed,
+  - resume from any stage using the checkpoints of the stages before it,
+  - run independent stages concurrently.
+Wall time, CPU time and peak resident memory (see PeakMemory) are recorded
+for every stage, and each stage can be profiled into its own file (see
+monitoring/profiling.py). CPU time is that of the whole process (all threads,
+plus child processes once they have exited), so stages running at the same
+time share it, like their memory peaks.
+"""
+import hashlib
+import json
+import resource
+import sys
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+
+import pandas as pd
+
+from monitoring.metrics import counter, gauge, histogram, log_event
+from monitoring.profiling import profile
+
+
+@dataclass
+class Stage:
+    """
+    A pipeline step.
+
+    Attributes:
+        name: Unique stage name
+        func: Called with the outputs of `deps` (in order); returns a DataFrame or None
+        deps: Names of the stages this one needs
+        params: Parameters that change the result; part of the input fingerprint
+        always_run: Run even if the inputs are unchanged (e.g. downloads, whose
+            inputs are only the request parameters)
+        is_current: For stages with side effects, returns False if the effect is
+            gone (e.g. the database was deleted) and the stage must run again
+    """
+    name: str
+    func: Callable
+    deps: tuple = ()
+    params: dict = field(default_factory=dict)
+    always_run: bool = False
+    is_current: Callable = None
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """ Content hash of a DataFrame (values and column names, not the index). """
+    digest = hashlib.sha1(','.join(map(str, df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _cpu_seconds() -> float:
+    """ User + system CPU time of every thread of the process and its reaped children. """
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def _high_water_mb() -> float:
+    """ Peak RSS since the last reset of the kernel's high-water mark (VmHWM). """
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+    raise OSError("No VmHWM in /proc/self/status")
+
+
+def _reset_high_water() -> bool:
+    """ Reset VmHWM to the current RSS (Linux 4.0+); False where that is not possible. """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class PeakMemory:
+    """
+    Peak resident memory per stage.
+
+    Whenever a stage starts or finishes, the kernel's high-water mark is
+    credited to every stage running at the time and then reset, so a stage's
+    peak only covers the time it ran; stages running at the same time share
+    the peaks of that time. Where the mark cannot be reset (not Linux), every
+    stage reports the process peak so far.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running = {}
+        self.per_stage = _reset_high_water()
+
+    def _fold(self):
+        peak = _high_water_mb()
+        for name, value in self._running.items():
+            self._running[name] = max(value, peak)
+        _reset_high_water()
+
+    def start(self, name: str):
+        if not self.per_stage:
+            return
+        with self._lock:
+            self._fold()
+            self._running[name] = 0.0
+
+    def stop(self, name: str) -> float:
+        if not self.per_stage:
+            return _peak_rss_mb()
+        with self._lock:
+            self._fold()
+            return self._running.pop(name)
+
+
+class StageRunner:
+    """
+    Runs a list of stages with checkpoints in checkpoint_dir.
+
+    With profile_mode ('cprofile' or 'sample') every stage that runs writes a
+    profile named after it to profile_dir.
+    """
+
+    def __init__(self, stages: list, checkpoint_dir: str, max_workers: int=4,
+                 profile_mode: str | None=None, profile_dir: str | None=None):
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Stage names must be unique")
+        for stage in stages:
+            unknown = [d for d in stage.deps if d not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages {unknown}")
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.max_workers = max_workers
+        self.profile_mode = profile_mode
+        self.profile_dir = profile_dir
+        self._outputs = {}
+        self._lock = threading.Lock()
+        self._memory = PeakMemory()
+
+    # ---------- checkpoints ----------
+    def _meta_path(self, name: str) -> Path:
+        return self.checkpoint_dir / f"{name}.json"
+
+    def _data_path(self, name: str) -> Path:
+        return self.checkpoint_dir / f"{name}.parquet"
+
+    def _read_meta(self, name: str) -> dict | None:
+        try:
+            return json.loads(self._meta_path(name).read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_checkpoint(self, name: str, output, meta: dict):
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        if isinstance(output, pd.DataFrame):
+            tmp = self._data_path(name).with_suffix('.parquet.tmp')
+            output.to_parquet(tmp, index=False)
+            tmp.replace(self._data_path(name))
+        else:
+            # a frame from an earlier run is not this stage's output any more
+            self._data_path(name).unlink(missing_ok=True)
+        self._meta_path(name).write_text(json.dumps(meta, indent=2))
+
+    def _output(self, name: str):
+        """ Output of a finished stage, read from its checkpoint on first use. """
+        with self._lock:
+            if name not in self._outputs:
+                # only stages that returned a frame have rows in their metadata
+                meta = self._read_meta(name)
+                has_frame = meta is not None and meta.get('rows') is not None
+                self._outputs[name] = pd.read_parquet(self._data_path(name)) if has_frame else None
+            return self._outputs[name]
+
+    # ---------- graph ----------
+    def descendants(self, name: str) -> set:
+        found = {name}
+        changed = True
+        while changed:
+            changed = False
+            for stage in self.stages.values():
+                if stage.name not in found and found.intersection(stage.deps):
+                    found.add(stage.name)
+                    changed = True
+        return found
+
+    def _input_fingerprint(self, stage: Stage, fingerprints: dict) -> str:
+        payload = json.dumps({
+            'stage': stage.name,
+            'params': stage.params,
+            'deps': [fingerprints[d] for d in stage.deps],
+        }, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    # ---------- execution ----------
+    def _execute(self, stage: Stage, input_fp: str, force: bool) -> dict:
+        meta = self._read_meta(stage.name)
+        unchanged = (
+            not force and not stage.always_run
+            and meta is not None and meta.get('input_fingerprint') == input_fp
+            and (stage.is_current is None or stage.is_current())
+        )
+        if unchanged:
+            counter('etl_stage_runs_total', 'Pipeline stage executions by status').inc(stage=stage.name, status='skipped')
+            log_event('stage_complete', stage=stage.name, status='skipped')
+            return {**meta, 'status': 'skipped', 'wall_s': 0.0, 'cpu_s': 0.0}
+
+        args = [self._output(d) for d in stage.deps]
+        wall_start = time.perf_counter()
+        cpu_start = _cpu_seconds()
+        self._memory.start(stage.name)
+        try:
+            with profile(stage.name, self.profile_mode, self.profile_dir):
+                output = stage.func(*args)
+        finally:
+            peak_mb = self._memory.stop(stage.name)
+        wall = time.perf_counter() - wall_start
+        cpu = _cpu_seconds() - cpu_start
+
+        with self._lock:
+            self._outputs[stage.name] = output
+        is_frame = isinstance(output, pd.DataFrame)
+        meta = {
+            'stage': stage.name,
+            'input_fingerprint': input_fp,
+            'output_fingerprint': frame_fingerprint(output) if is_frame else input_fp,
+            'rows': len(output) if is_frame else None,
+            'completed_at': datetime.now(UTC).isoformat(timespec='seconds'),
+            'wall_s': round(wall, 3),
+            'cpu_s': round(cpu, 3),
+            'peak_rss_mb': round(peak_mb, 1),
+        }
+        self._write_checkpoint(stage.name, output, meta)
+
+        counter('etl_stage_runs_total', 'Pipeline stage executions by status').inc(stage=stage.name, status='ran')
+        histogram('etl_stage_seconds', 'Pipeline stage wall time').observe(wall, stage=stage.name)
+        if meta['rows'] is not None:
+            gauge('etl_stage_rows', 'Rows produced by the last run of a stage').set(meta['rows'], stage=stage.name)
+        log_event('stage_complete', stage=stage.name, status='ran', rows=meta['rows'],
+                  wall_s=meta['wall_s'], cpu_s=meta['cpu_s'], peak_rss_mb=meta['peak_rss_mb'])
+        return {**meta, 'status': 'ran'}
+
+    def run(self, resume_from: str | None=None, only: list | None=None, force: bool=False) -> dict:
+        """
+        Run the graph and return {stage name: result dict}.
+
+        Parameters:
+            resume_from (str): Run this stage and everything downstream of it;
+                earlier stages are read from their checkpoints
+            only (list): Run just these stages, reading their inputs from checkpoints
+            force (bool): Run selected stages even if their inputs are unchanged
+        """
+        for name in (only or []) + ([resume_from] if resume_from else []):
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage {name!r}; choose from {list(self.stages)}")
+
+        if only:
+            selected = set(only)
+        elif resume_from:
+            selected = self.descendants(resume_from)
+        else:
+            selected = set(self.stages)
+
+        results = {}
+        fingerprints = {}
+        # stages we are not running must already have checkpoints
+        for name in self.stages:
+            if name in selected:
+                continue
+            meta = self._read_meta(name)
+            if meta is None:
+                if any(name in self.stages[s].deps for s in selected):
+                    raise RuntimeError(f"No checkpoint for stage {name!r}; run it first")
+                continue
+            fingerprints[name] = meta['output_fingerprint']
+            results[name] = {**meta, 'status': 'checkpoint', 'wall_s': 0.0, 'cpu_s': 0.0}
+
+        pending = {name for name in self.stages if name in selected}
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='stage') as pool:
+            while pending or running:
+                for name in sorted(pending):
+                    stage = self.stages[name]
+                    if all(d in fingerprints for d in stage.deps):
+                        pending.discard(name)
+                        input_fp = self._input_fingerprint(stage, fingerprints)
+                        print(f"[pipeline] {name}: starting")
+                        running[pool.submit(self._execute, stage, input_fp, force)] = name
+
+                if not running:
+                    raise RuntimeError(f"Stages {sorted(pending)} have unresolved dependencies")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception:
+                        # let running stages finish, then surface the failure
+                        pending.clear()
+                        for other in running:
+                            other.cancel()
+                        raise
+                    results[name] = result
+                    fingerprints[name] = result['output_fingerprint']
+                    print(f"[pipeline] {name}: {result['status']} ({result['wall_s']:.2f}s)")
+        return {name: results[name] for name in self.stages if name in results}
+
+
+def format_report(results: dict) -> str:
+    """ Text table of per-stage status and timings. """
+    lines = [f"{'stage':<20} {'status':<10} {'rows':>8} {'wall s':>8} {'cpu s':>8} {'peak MB':>8}"]
+    for name, r in results.items():
+        rows = '' if r.get('rows') is None else r['rows']
+        lines.append(
+            f"{name:<20} {r['status']:<10} {rows:>8} {r.get('wall_s', 0):>8.2f} "
+            f"{r.get('cpu_s', 0):>8.2f} {r.get('peak_rss_mb', 0):>8.1f}"
+        )
+    return '\n'.join(lines)
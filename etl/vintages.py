@@ -0,0 +1,173 @@
+"""
+Vintage tracking for Eurostat releases.
+
+Eurostat revises back-years of env_air_gge between releases. Instead of
+replacing emissions_data on every load, each extract (a "vintage") is diffed
+against the current table on (country_name, sector_name, year), and only the
+cells that changed are written:
+  - emissions_data:      the current view; changed keys are deleted and
+                         re-inserted, untouched rows are left alone
+  - emissions_revisions: one row per new, revised or removed key and release
+                         date, holding the values as of that release
+  - emissions_vintages:  one row per release date with the change counts
+
+The first vintage writes every row to emissions_revisions; later ones only the
+delta. The table is keyed (country_name, sector_name, year, release_date), so
+"the value as of a date" is the latest revision at or before it, one index
+seek per key (see analysis.queries.query_as_of).
+"""
+import sqlite3
+from datetime import UTC, date, datetime
+
+import numpy as np
+import pandas as pd
+
+from etl.load import create_indexes, create_table
+
+KEY_COLUMNS = ['country_name', 'sector_name', 'year']
+VALUE_COLUMNS = ['population', 'emissions_ktco2', 'emissions_per_capita']
+
+
+def create_vintage_tables(conn: sqlite3.Connection):
+    """ Create emissions_revisions and emissions_vintages if they do not exist. """
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS emissions_revisions
+    (
+        country_name         TEXT,
+        sector_name          TEXT,
+        year                 INTEGER,
+        release_date         TEXT,
+        population           INTEGER,
+        emissions_ktco2      REAL,
+        emissions_per_capita REAL,
+        change               TEXT,
+        PRIMARY KEY (country_name, sector_name, year, release_date)
+    ) WITHOUT ROWID;
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_revisions_release ON emissions_revisions(release_date);")
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS emissions_vintages
+    (
+        release_date TEXT PRIMARY KEY,
+        loaded_at    TEXT,
+        rows         INTEGER,
+        new          INTEGER,
+        revised      INTEGER,
+        removed      INTEGER
+    );
+    ''')
+    conn.commit()
+
+
+def diff_vintage(previous: pd.DataFrame, current: pd.DataFrame) -> pd.DataFrame:
+    """
+    Keyed comparison of two emissions_data snapshots.
+
+    Returns:
+        pd.DataFrame: KEY_COLUMNS + VALUE_COLUMNS + ['change'] for every key
+        that is 'new' (only in current), 'revised' (any value differs; two NaN
+        count as equal) or 'removed' (only in previous, with NaN values)
+    """
+    merged = previous[KEY_COLUMNS + VALUE_COLUMNS].merge(
+        current[KEY_COLUMNS + VALUE_COLUMNS], on=KEY_COLUMNS, how='outer', suffixes=('_previous', ''), indicator=True,
+    )
+    revised = np.zeros(len(merged), dtype=bool)
+    for column in VALUE_COLUMNS:
+        old = merged[f"{column}_previous"].to_numpy(dtype=float)
+        new = merged[column].to_numpy(dtype=float)
+        revised |= ~((old == new) | (np.isnan(old) & np.isnan(new)))
+    side = merged['_merge'].to_numpy()
+    change = np.select([side == 'right_only', side == 'left_only', revised], ['new', 'removed', 'revised'], default='')
+
+    delta = merged.loc[change != '', KEY_COLUMNS + VALUE_COLUMNS].reset_index(drop=True)
+    delta['change'] = change[change != '']
+    return delta
+
+
+def _read_current(conn: sqlite3.Connection) -> pd.DataFrame:
+    columns = ', '.join(KEY_COLUMNS + VALUE_COLUMNS)
+    try:
+        return pd.read_sql_query(f"SELECT {columns} FROM emissions_data", conn)
+    except (pd.errors.DatabaseError, sqlite3.OperationalError):
+        return pd.DataFrame(columns=KEY_COLUMNS + VALUE_COLUMNS)
+
+
+def _rows(df: pd.DataFrame, columns: list) -> list:
+    """ Plain Python tuples for executemany (NaN -> NULL, NumPy scalars -> int/float). """
+    out = df[columns].astype(object)
+    return list(out.where(out.notna(), None).itertuples(index=False, name=None))
+
+
+def record_vintage(df: pd.DataFrame, conn: sqlite3.Connection, release_date: str | None=None) -> dict:
+    """
+    Load a transformed extract as the vintage released on release_date,
+    writing only what changed since the previous vintage.
+
+    Parameters:
+        df (pd.DataFrame): Transformed data (the emissions_data columns)
+        conn (sqlite3.Connection): Database connection
+        release_date (str): ISO date of the Eurostat release (default today, UTC)
+
+    Returns:
+        dict: release_date and the number of rows, new, revised and removed keys
+    """
+    missing = [col for col in KEY_COLUMNS + VALUE_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f'Missing columns in DataFrame: {missing}')
+    release_date = release_date or datetime.now(UTC).date().isoformat()
+    date.fromisoformat(release_date)
+
+    create_table(conn)
+    create_vintage_tables(conn)
+    latest = conn.execute("SELECT MAX(release_date) FROM emissions_vintages").fetchone()[0]
+    if latest is not None and release_date < latest:
+        raise ValueError(f"Release {release_date} is older than the latest recorded vintage {latest}")
+
+    current = df[KEY_COLUMNS + VALUE_COLUMNS]
+    # before the first vintage there is nothing to diff against, whatever emissions_data holds
+    previous = _read_current(conn) if latest is not None else current.iloc[0:0]
+    delta = diff_vintage(previous, current)
+    counts = delta['change'].value_counts()
+    stats = {
+        'release_date': release_date,
+        'rows': len(current),
+        'new': int(counts.get('new', 0)),
+        'revised': int(counts.get('revised', 0)),
+        'removed': int(counts.get('removed', 0)),
+    }
+
+    with conn:
+        if latest is None:
+            conn.execute("DELETE FROM emissions_data")
+        else:
+            stale = delta[delta['change'] != 'new']
+            conn.executemany(
+                "DELETE FROM emissions_data WHERE country_name = ? AND sector_name = ? AND year = ?",
+                _rows(stale, KEY_COLUMNS),
+            )
+        upserts = delta[delta['change'] != 'removed']
+        conn.executemany(
+            f"INSERT INTO emissions_data ({', '.join(KEY_COLUMNS + VALUE_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+            _rows(upserts, KEY_COLUMNS + VALUE_COLUMNS),
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO emissions_revisions "
+            f"({', '.join(KEY_COLUMNS)}, release_date, {', '.join(VALUE_COLUMNS)}, change) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [key + (release_date,) + rest
+             for key, rest in zip(_rows(delta, KEY_COLUMNS), _rows(delta, VALUE_COLUMNS + ['change']))],
+        )
+        # a second load on the same release date adds to that vintage's counts
+        conn.execute('''
+            INSERT INTO emissions_vintages (release_date, loaded_at, rows, new, revised, removed)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(release_date) DO UPDATE SET
+                loaded_at = excluded.loaded_at, rows = excluded.rows, new = new + excluded.new,
+                revised = revised + excluded.revised, removed = removed + excluded.removed
+        ''', (release_date, datetime.now(UTC).isoformat(timespec='seconds'),
+              stats['rows'], stats['new'], stats['revised'], stats['removed']))
+    create_indexes(conn)
+
+    print(f"Vintage {release_date}: {stats['new']} new, {stats['revised']} revised, "
+          f"{stats['removed']} removed of {stats['rows']} rows")
+    return stats
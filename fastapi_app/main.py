@@ -1,10 +1,19 @@
-from fastapi import FastAPI, HTTPException, Query
+import random
+import time
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
 import uvicorn
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, create_model
+from datetime import date
+from typing import Annotated, List, Optional, Union
 import sqlite3
-import pandas as pd
-from config.settings import DB_PATH
+from config.settings import DB_PATH, READY_MARKER_PATH, BIND_HOST, API_PORT, API_PROFILE_RATE, FORECAST_INTERVAL_LEVELS
+from etl.readiness import read_ready_marker
+from analysis.aggregate import SOURCE_CHOICES, run_aggregate
+from analysis.backends import BackendUnavailable, query_rows
+from analysis.queries import forecast_bound_columns, list_vintages, query_as_of, query_revisions, query_series_rows
+from monitoring.metrics import histogram, render_prometheus
+from monitoring.profiling import profile_request
 
 app = FastAPI(
     title="EU Emissions API",
@@ -20,12 +29,57 @@ class EmissionRecord(BaseModel):
     emissions_ktco2: float
     emissions_per_capita: float
 
-class ForecastRecord(BaseModel):
+class RevisionRecord(BaseModel):
+    release_date: str
+    year: int
+    emissions_ktco2: Optional[float]
+    emissions_per_capita: Optional[float]
+    population: Optional[int]
+    change: str
+
+class VintageRecord(BaseModel):
+    release_date: str
+    loaded_at: str
+    rows: int
+    new: int
+    revised: int
+    removed: int
+
+class ForecastPoint(BaseModel):
     year: int
     sector_name: str
     country_name: str
-    forecast_emissions_ktco2: float
-    forecast_emissions_per_capita: float
+    # NULL for a series whose fit failed, and per capita where population is unknown
+    forecast_emissions_ktco2: Optional[float] = None
+    forecast_emissions_per_capita: Optional[float] = None
+
+def _bound_fields(metrics: tuple) -> dict:
+    """Optional lower/upper fields per configured interval level, e.g. forecast_emissions_ktco2_lower_80."""
+    return {
+        f"{metric}_{side}_{level}": (Optional[float], None)
+        for metric in metrics for level in FORECAST_INTERVAL_LEVELS for side in ("lower", "upper")
+    }
+
+ForecastRecord = create_model(
+    "ForecastRecord", __base__=ForecastPoint,
+    **_bound_fields(("forecast_emissions_ktco2", "forecast_emissions_per_capita")),
+)
+
+class SeriesPoint(BaseModel):
+    year: int
+    emissions_ktco2: Optional[float]
+    emissions_per_capita: Optional[float]
+
+SeriesForecastPoint = create_model(
+    "SeriesForecastPoint", __base__=SeriesPoint,
+    **_bound_fields(("emissions_ktco2", "emissions_per_capita")),
+)
+
+class SeriesResponse(BaseModel):
+    country_name: str
+    sector_name: str
+    historical: List[SeriesPoint]
+    forecast: List[SeriesForecastPoint]
 
 class TopEmitter(BaseModel):
     country_name: str
@@ -39,24 +93,86 @@ class ChangeRecord(BaseModel):
     end_emissions: float
     pct_change: float
 
+class AggregateResponse(BaseModel):
+    columns: List[str]
+    rows: List[List[Union[int, float, str, None]]]
+    data_version: Optional[str]
+    cached: bool
+
 # Utility function to query DB
-def query_db(query: str, params: tuple = ()) -> pd.DataFrame:
+# (plain rows rather than pandas, which would add its import time to every cold start)
+def query_db(query: str, params: tuple = ()) -> List[dict]:
     conn = sqlite3.connect(DB_PATH)
     try:
-        df = pd.read_sql_query(query, conn, params=params)
+        cursor = conn.execute(query, params)
+        columns = [c[0] for c in cursor.description]
+        records = [dict(zip(columns, row)) for row in cursor.fetchall()]
     finally:
         conn.close()
-    return df
+    return records
+
+# The trend queries run on the analytics backend (SQLite, or DuckDB over Parquet)
+def query_analytics(query: str, params: tuple = ()) -> List[dict]:
+    try:
+        columns, rows = query_rows(query, params, db_path=DB_PATH)
+    except BackendUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return [dict(zip(columns, row)) for row in rows]
+
+# Request timing
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # label by route template, not raw path, to keep the label set bounded
+        route = request.scope.get("route")
+        histogram("api_request_seconds", "API request latency").observe(
+            time.perf_counter() - start,
+            route=getattr(route, "path", "unmatched"), method=request.method, status=status,
+        )
+
+# Opt-in sampling profiler for a fraction of requests (see monitoring/profiling.py)
+if API_PROFILE_RATE > 0:
+    @app.middleware("http")
+    async def profile_sampled_requests(request: Request, call_next):
+        if random.random() >= API_PROFILE_RATE:
+            return await call_next(request)
+        with profile_request(f"{request.method}-{request.url.path}"):
+            return await call_next(request)
 
 # Endpoints
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    """Prometheus metrics for this worker process."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: 200 once the pipeline has completely loaded the current database."""
+    marker = read_ready_marker(DB_PATH, READY_MARKER_PATH)
+    if marker is None:
+        return JSONResponse(status_code=503, content={"ready": False})
+    return {"ready": True, "data_version": marker["data_version"], "completed_at": marker["completed_at"]}
+
 @app.get("/historical", response_model=List[EmissionRecord])
 def get_historical(
     country: str = Query(..., description="Country name, e.g., Germany"),
     sector: str = Query(..., description="Sector name, e.g., Energy industries"),
     start_year: Optional[int] = Query(None),
-    end_year: Optional[int] = Query(None)
+    end_year: Optional[int] = Query(None),
+    as_of: Annotated[Optional[date], Query(description="Return the values as published in the release current on this date")] = None
 ):
-    """Retrieve historical emissions data for a country and sector."""
+    """Retrieve historical emissions data for a country and sector, optionally as of an earlier release."""
+    if as_of is not None:
+        records = query_as_of(country, sector, as_of.isoformat(), start_year, end_year, db_path=DB_PATH)
+        if not records:
+            raise HTTPException(status_code=404, detail="No historical data found for that release.")
+        return records
     query = """
         SELECT year, sector_name, country_name, emissions_ktco2, emissions_per_capita
         FROM emissions_data
@@ -70,10 +186,27 @@ def get_historical(
         query += " AND year <= ?"
         params.append(end_year)
     query += " ORDER BY year"
-    df = query_db(query, tuple(params))
-    if df.empty:
+    records = query_db(query, tuple(params))
+    if not records:
         raise HTTPException(status_code=404, detail="No historical data found.")
-    return df.to_dict(orient="records")
+    return records
+
+@app.get("/revisions", response_model=List[RevisionRecord])
+def get_revisions(
+    country: str = Query(...),
+    sector: str = Query(...),
+    year: Optional[int] = Query(None)
+):
+    """Every published vintage of a series' values, oldest release first."""
+    records = query_revisions(country, sector, year, db_path=DB_PATH)
+    if not records:
+        raise HTTPException(status_code=404, detail="No revision history found.")
+    return records
+
+@app.get("/vintages", response_model=List[VintageRecord])
+def get_vintages():
+    """Recorded Eurostat releases with the number of new, revised and removed values."""
+    return list_vintages(DB_PATH)
 
 @app.get("/forecast", response_model=List[ForecastRecord])
 def get_forecast(
@@ -82,9 +215,10 @@ def get_forecast(
     start_year: Optional[int] = Query(None),
     end_year: Optional[int] = Query(None)
 ):
-    """Retrieve forecasted emissions data for a country and sector."""
-    query = """
-        SELECT year, sector_name, country_name, forecast_emissions_ktco2, forecast_emissions_per_capita
+    """Retrieve forecasted emissions data, with prediction interval bounds, for a country and sector."""
+    bounds = "".join(f", {column}" for column in forecast_bound_columns(DB_PATH))
+    query = f"""
+        SELECT year, sector_name, country_name, forecast_emissions_ktco2, forecast_emissions_per_capita{bounds}
         FROM emissions_forecast
         WHERE country_name = ? AND sector_name = ?
     """
@@ -96,10 +230,63 @@ def get_forecast(
         query += " AND year <= ?"
         params.append(end_year)
     query += " ORDER BY year"
-    df = query_db(query, tuple(params))
-    if df.empty:
+    # plain rows keep NULL bounds (series without intervals) as None instead of NaN
+    records = query_db(query, tuple(params))
+    if not records:
         raise HTTPException(status_code=404, detail="No forecast data found.")
-    return df.to_dict(orient="records")
+    return records
+
+@app.get("/series", response_model=SeriesResponse)
+def get_series(
+    response: Response,
+    country: str = Query(..., description="Country name, e.g., Germany"),
+    sector: str = Query(..., description="Sector name, e.g., Energy industries")
+):
+    """Retrieve historical and forecasted emissions for a country and sector in one query."""
+    columns, rows, db_time_ms = query_series_rows(country, sector, db_path=DB_PATH)
+    response.headers["Server-Timing"] = f"db;dur={db_time_ms:.2f}"
+    if not rows:
+        raise HTTPException(status_code=404, detail="No data found.")
+    historical, forecast = [], []
+    for row in rows:
+        record = dict(zip(columns[1:], row[1:]))
+        (historical if row[0] == 'historical' else forecast).append(record)
+    return {
+        "country_name": country,
+        "sector_name": sector,
+        "historical": historical,
+        "forecast": forecast,
+    }
+
+@app.get("/aggregate", response_model=AggregateResponse)
+def aggregate(
+    response: Response,
+    source: str = Query("historical", description=f"One of {', '.join(SOURCE_CHOICES)}"),
+    group_by: Annotated[Optional[List[str]], Query(description="Dimensions: country_name, sector_name, year (and source when combined)")] = None,
+    agg: Annotated[Optional[List[str]], Query(description="function:metric, e.g. avg:emissions_per_capita or share:emissions_ktco2 (default sum:emissions_ktco2)")] = None,
+    country: Annotated[Optional[List[str]], Query(description="Only these countries (repeatable)")] = None,
+    sector: Annotated[Optional[List[str]], Query(description="Only these sectors (repeatable)")] = None,
+    start_year: Optional[int] = Query(None),
+    end_year: Optional[int] = Query(None),
+    year_step: int = Query(1, description="Group years into buckets of this many years"),
+    share_by: Annotated[Optional[List[str]], Query(description="Compute shares within these group-by dimensions")] = None,
+    order_by: Optional[str] = Query(None, description="Output column, '-' prefix for descending"),
+    limit: Optional[int] = Query(None)
+):
+    """Group, filter and aggregate historical and/or forecast emissions in the database; cached per data version."""
+    try:
+        result = run_aggregate(
+            DB_PATH, source=source, group_by=group_by or [], aggregates=agg or ["sum:emissions_ktco2"],
+            countries=country or [], sectors=sector or [], start_year=start_year, end_year=end_year,
+            year_step=year_step, share_by=share_by or [],
+            order_by=order_by, limit=limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except BackendUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    response.headers["Server-Timing"] = f"db;dur={result['db_time_ms']:.2f}"
+    return result
 
 @app.get("/trends/top_emitters", response_model=List[TopEmitter])
 def top_emitters(year: int = Query(..., description="Year to query"), top_n: int = Query(10)):
@@ -111,10 +298,10 @@ def top_emitters(year: int = Query(..., description="Year to query"), top_n: int
         ORDER BY emissions_ktco2 DESC
         LIMIT ?
     """
-    df = query_db(query, (year, top_n))
-    if df.empty:
+    records = query_analytics(query, (year, top_n))
+    if not records:
         raise HTTPException(status_code=404, detail="No data for given year.")
-    return df.to_dict(orient="records")
+    return records
 
 @app.get("/trends/decreases", response_model=List[ChangeRecord])
 def biggest_decreases(
@@ -136,19 +323,19 @@ def biggest_decreases(
         ORDER BY pct_change DESC
         LIMIT ?
     """
-    df = query_db(query, (start_year, end_year, top_n))
-    if df.empty:
+    records = query_analytics(query, (start_year, end_year, top_n))
+    if not records:
         raise HTTPException(status_code=404, detail="No data for given years.")
-    return df.to_dict(orient="records")
+    return records
 
 @app.get("/trends/forecast_increases", response_model=List[ChangeRecord])
 def worst_forecast_increases(top_n: int = Query(10)):
     """Return top N forecasted % increases comparing last hist vs last forecast."""
     # Determine years
-    conn = sqlite3.connect(DB_PATH)
-    hist_year = pd.read_sql_query("SELECT MAX(year) AS year FROM emissions_data", conn).iloc[0]['year']
-    fore_year = pd.read_sql_query("SELECT MAX(year) AS year FROM emissions_forecast", conn).iloc[0]['year']
-    conn.close()
+    hist_year = query_analytics("SELECT MAX(year) AS year FROM emissions_data")[0]['year']
+    fore_year = query_analytics("SELECT MAX(year) AS year FROM emissions_forecast")[0]['year']
+    if hist_year is None or fore_year is None:
+        raise HTTPException(status_code=404, detail="No forecast data available.")
 
     query = """
         SELECT h.country_name, h.sector_name,
@@ -163,11 +350,11 @@ def worst_forecast_increases(top_n: int = Query(10)):
         ORDER BY pct_change DESC
         LIMIT ?
     """
-    df = query_db(query, (hist_year, fore_year, top_n))
-    if df.empty:
+    records = query_analytics(query, (hist_year, fore_year, top_n))
+    if not records:
         raise HTTPException(status_code=404, detail="No forecast data available.")
-    return df.to_dict(orient="records")
+    return records
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(app, host=BIND_HOST, port=API_PORT)
@@ -0,0 +1,72 @@
+# ruff: noqa: N999 - gunicorn looks for a file with this name
+"""
+Gunicorn settings for production serving of the API and the dashboard.
+
+Pick the application with SERVE_APP:
+    SERVE_APP=api gunicorn -c gunicorn.conf.py
+    SERVE_APP=dashboard gunicorn -c gunicorn.conf.py
+
+Worker counts, ports and timeouts come from config/settings.py (overridable
+through environment variables).
+"""
+import os
+import signal
+import threading
+import time
+
+from config.settings import (
+    API_PORT,
+    API_WORKERS,
+    BIND_HOST,
+    DASHBOARD_PORT,
+    DASHBOARD_THREADS,
+    DASHBOARD_WORKERS,
+    DATA_VERSION_POLL_SECONDS,
+    WORKER_TIMEOUT,
+)
+
+SERVE_APP = os.getenv("SERVE_APP", "api")
+
+if SERVE_APP == "api":
+    wsgi_app = "fastapi_app.main:app"
+    worker_class = "uvicorn_worker.UvicornWorker"
+    workers = API_WORKERS
+    bind = f"{BIND_HOST}:{API_PORT}"
+elif SERVE_APP == "dashboard":
+    wsgi_app = "dashboard.app:server"
+    worker_class = "gthread"
+    workers = DASHBOARD_WORKERS
+    threads = DASHBOARD_THREADS
+    bind = f"{BIND_HOST}:{DASHBOARD_PORT}"
+else:
+    raise ValueError(f"SERVE_APP must be 'api' or 'dashboard', got {SERVE_APP!r}")
+
+# Import the app once in the master and fork workers from it
+preload_app = True
+timeout = WORKER_TIMEOUT
+graceful_timeout = WORKER_TIMEOUT
+keepalive = 5
+accesslog = "-"
+errorlog = "-"
+
+
+def when_ready(server):
+    """ Gracefully reload the workers whenever the pipeline publishes a new data version. """
+    from etl.readiness import read_ready_marker
+
+    def current_version():
+        marker = read_ready_marker()
+        return marker and marker['data_version']
+
+    def watch_data_version():
+        version = current_version()
+        while True:
+            time.sleep(DATA_VERSION_POLL_SECONDS)
+            current = current_version()
+            # None means a load is in progress; wait for it to complete
+            if current is not None and current != version:
+                server.log.info("Data version changed (%s -> %s), reloading workers", version, current)
+                version = current
+                os.kill(server.pid, signal.SIGHUP)
+
+    threading.Thread(target=watch_data_version, name="data-version-watch", daemon=True).start()
@@ -0,0 +1,226 @@
+"""
+Lightweight in-process metrics and structured logging.
+
+Counters and histograms live in a process-wide registry and are exported in
+the Prometheus text format (see fastapi_app /metrics). Events are written as
+one JSON object per line to stderr. Recording a value is a dict lookup and a
+few additions under a lock, so instrumentation can stay on in production.
+
+Each process (e.g. every gunicorn worker) keeps its own registry.
+"""
+import bisect
+import functools
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import ContextDecorator
+from datetime import UTC, datetime
+
+from config.settings import LOG_LEVEL
+
+# Default histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: tuple, extra: tuple=()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = [(k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in pairs]
+    return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+
+class Counter:
+    """ Monotonic counter, optionally split by labels. """
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str=''):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self) -> list:
+        with self._lock:
+            return [(self.name, key, (), v) for key, v in self._values.items()]
+
+
+class Gauge(Counter):
+    """ Value that can go up and down (e.g. rows produced by the last run of a stage). """
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram:
+    """ Cumulative-bucket histogram, optionally split by labels. """
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str='', buckets: tuple=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(_label_key(labels))
+        return entry[2] if entry else 0
+
+    def samples(self) -> list:
+        out = []
+        with self._lock:
+            for key, (counts, total, n) in self._values.items():
+                cumulative = 0
+                for bound, c in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += c
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    out.append((f"{self.name}_bucket", key, (('le', le),), cumulative))
+                out.append((f"{self.name}_sum", key, (), total))
+                out.append((f"{self.name}_count", key, (), n))
+        return out
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _get_or_create(cls, name: str, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} already registered as {metric.kind}")
+        return metric
+
+
+def counter(name: str, help: str='') -> Counter:
+    return _get_or_create(Counter, name, help=help)
+
+
+def gauge(name: str, help: str='') -> Gauge:
+    return _get_or_create(Gauge, name, help=help)
+
+
+def histogram(name: str, help: str='', buckets: tuple=DEFAULT_BUCKETS) -> Histogram:
+    return _get_or_create(Histogram, name, help=help, buckets=buckets)
+
+
+def reset_metrics():
+    """ Drop all registered metrics (for tests). """
+    with _registry_lock:
+        _registry.clear()
+
+
+def render_prometheus() -> str:
+    """ All metrics in the Prometheus text exposition format. """
+    with _registry_lock:
+        metrics = list(_registry.values())
+    lines = []
+    for metric in sorted(metrics, key=lambda m: m.name):
+        if metric.help:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for sample_name, key, extra, value in metric.samples():
+            lines.append(f"{sample_name}{_format_labels(key, extra)} {value}")
+    return '\n'.join(lines) + '\n'
+
+
+class timer(ContextDecorator):
+    """
+    Time a block or function into a histogram (seconds).
+
+        with timer('forecast_fit_seconds', path='lbfgs'):
+            ...
+
+        @timer('transform_seconds')
+        def transform(...): ...
+
+    The elapsed time is available as .elapsed after the block.
+    """
+
+    def __init__(self, name: str, help: str='', **labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.elapsed = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self._start
+        histogram(self.name, self.help).observe(self.elapsed, **self.labels)
+        return False
+
+
+def counted(name: str, help: str='', **labels):
+    """ Decorator counting calls of a function. """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            counter(name, help).inc(**labels)
+            return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ---------- structured logging ----------
+class JsonFormatter(logging.Formatter):
+    """ One JSON object per line: timestamp, level, logger, event and any extra fields. """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'ts': datetime.fromtimestamp(record.created, UTC).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'event': record.getMessage(),
+        }
+        payload.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            payload['exception'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+logger = logging.getLogger('eurostat')
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(JsonFormatter())
+    logger.addHandler(_handler)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+
+def log_event(event: str, level: int=logging.INFO, exc_info: bool=False, **fields):
+    """ Write a structured log line, e.g. log_event('forecast_fit', path='nm', seconds=0.3). """
+    if logger.isEnabledFor(level):
+        logger.log(level, event, exc_info=exc_info, extra={'fields': fields})
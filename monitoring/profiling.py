@@ -0,0 +1,255 @@
+"""
+Opt-in profiling for the pipeline, the forecaster and the API.
+
+Two modes:
+  - cprofile: deterministic cProfile of a block, written as a .prof file
+    (open with pstats, snakeviz, ...)
+  - sample:   a background thread samples the block's stack every few
+    milliseconds and writes collapsed stacks (.collapsed), one
+    "frame;frame;frame count" line per stack, ready for flamegraph.pl or
+    speedscope
+
+Enable with EUROSTAT_PROFILE=cprofile|sample or --profile on
+`python -m etl.pipeline` and `python -m analysis.forecast`. Summarize the
+hottest functions across runs with:
+
+    python -m monitoring.profiling data/profiles --top 25
+"""
+import argparse
+import cProfile
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from config.settings import PROFILE_DIR, PROFILE_SAMPLE_INTERVAL
+from monitoring.metrics import log_event
+
+PROFILE_MODES = ('cprofile', 'sample')
+
+# cProfile can only be active in one thread at a time on recent Pythons;
+# concurrent blocks (e.g. the two extract stages) fall back to sampling
+_cprofile_lock = threading.Lock()
+
+
+def resolve_mode(mode: str | None=None) -> str | None:
+    """ Normalize a mode from the CLI or environment: None, 'cprofile' or 'sample'. """
+    if not mode or mode in ('0', 'false', 'no', 'off'):
+        return None
+    if mode in ('1', 'true', 'yes', 'on'):
+        return 'cprofile'
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode {mode!r}; choose from {PROFILE_MODES}")
+    return mode
+
+
+def run_directory(base_dir: str | None=None) -> Path:
+    """ A fresh timestamped directory for one run's profiles. """
+    path = Path(base_dir or PROFILE_DIR) / datetime.now().strftime('%Y%m%dT%H%M%S')
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})".replace(';', ',')
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler based on sys._current_frames().
+
+    Samples the given threads (default: the thread that calls start(), or
+    every thread with all_threads=True) every `interval` seconds and counts
+    collapsed stacks. `include`, if given, is called with the list of code
+    objects of a stack (outermost first) and decides whether to keep it.
+    """
+
+    def __init__(self, interval: float | None=None, thread_ids: set | None=None, include=None, all_threads: bool=False):
+        self.interval = interval or PROFILE_SAMPLE_INTERVAL
+        self.thread_ids = thread_ids
+        self.include = include
+        self.all_threads = all_threads
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or (not self.all_threads and thread_id not in self.thread_ids):
+                    continue
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                codes.reverse()
+                if self.include is not None and not self.include(codes):
+                    continue
+                self.stacks[';'.join(_frame_label(c) for c in codes)] += 1
+                self.samples += 1
+
+    def start(self):
+        if self.thread_ids is None and not self.all_threads:
+            self.thread_ids = {threading.get_ident()}
+        self._thread = threading.Thread(target=self._sample, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def write_collapsed(self, path: Path):
+        with open(path, 'w') as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', name).strip('_') or 'profile'
+
+
+@contextmanager
+def profile(name: str, mode: str | None=None, output_dir: str | None=None):
+    """
+    Profile the enclosed block and write <output_dir>/<name>.prof or .collapsed.
+
+    A no-op when mode is None, so callers can wrap hot paths unconditionally.
+    Yields the path the profile will be written to (or None).
+    """
+    mode = resolve_mode(mode)
+    if mode is None:
+        yield None
+        return
+
+    output_dir = Path(output_dir or PROFILE_DIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    safe_name = _safe_name(name)
+
+    if mode == 'cprofile' and _cprofile_lock.acquire(blocking=False):
+        path = output_dir / f"{safe_name}.prof"
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                yield path
+            finally:
+                profiler.disable()
+        finally:
+            _cprofile_lock.release()
+        profiler.dump_stats(path)
+    else:
+        path = output_dir / f"{safe_name}.collapsed"
+        sampler = SamplingProfiler().start()
+        started = time.perf_counter()
+        try:
+            yield path
+        finally:
+            sampler.stop()
+        sampler.write_collapsed(path)
+    log_event('profile_written', name=name, mode=mode, path=str(path),
+              seconds=round(time.perf_counter() - started, 4))
+
+
+_PROJECT_PREFIX = str(Path(__file__).resolve().parent.parent)
+
+
+def _in_project(codes: list) -> bool:
+    """ True if a stack runs code from this repository (not the stdlib or site-packages). """
+    return any(
+        c.co_filename.startswith(_PROJECT_PREFIX) and 'site-packages' not in c.co_filename
+        for c in codes
+    )
+
+
+@contextmanager
+def profile_request(name: str, output_dir: str | None=None):
+    """
+    Sample a web request into <output_dir>/<timestamp>-<name>.collapsed.
+
+    Sync endpoints run in a thread pool, so every thread is sampled and only
+    stacks that are inside this project's code are kept. Requests served
+    concurrently by the same worker can show up in each other's profiles.
+    """
+    output_dir = Path(output_dir or PROFILE_DIR / 'api')
+    output_dir.mkdir(parents=True, exist_ok=True)
+    path = output_dir / f"{time.strftime('%Y%m%dT%H%M%S')}-{time.time_ns() % 10**9:09d}-{_safe_name(name)}.collapsed"
+    sampler = SamplingProfiler(all_threads=True, include=_in_project).start()
+    try:
+        yield path
+    finally:
+        sampler.stop()
+        if sampler.samples:
+            sampler.write_collapsed(path)
+
+
+# ---------- summarizing ----------
+def _profile_files(paths: list) -> tuple[list, list]:
+    prof, collapsed = [], []
+    for p in map(Path, paths):
+        files = sorted(p.rglob('*')) if p.is_dir() else [p]
+        for f in files:
+            if f.suffix == '.prof':
+                prof.append(f)
+            elif f.suffix == '.collapsed':
+                collapsed.append(f)
+    return prof, collapsed
+
+
+def summarize_collapsed(files: list) -> tuple[Counter, Counter, int]:
+    """ Self and inclusive sample counts per frame across collapsed-stack files. """
+    self_counts, total_counts = Counter(), Counter()
+    samples = 0
+    for path in files:
+        with open(path) as f:
+            for line in f:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                if not stack:
+                    continue
+                count = int(count)
+                frames = stack.split(';')
+                samples += count
+                self_counts[frames[-1]] += count
+                for frame in set(frames):
+                    total_counts[frame] += count
+    return self_counts, total_counts, samples
+
+
+def main(argv: list | None=None):
+    parser = argparse.ArgumentParser(description="Summarize the top functions across profile runs.")
+    parser.add_argument('paths', nargs='*', default=[str(PROFILE_DIR)],
+                        help=f'.prof/.collapsed files or directories (default {PROFILE_DIR})')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--sort', choices=['cumulative', 'tottime'], default='cumulative',
+                        help='Order for cProfile results; sampled results use the matching self/total counts')
+    args = parser.parse_args(argv)
+
+    prof, collapsed = _profile_files(args.paths)
+    if not prof and not collapsed:
+        print(f"No .prof or .collapsed files under {', '.join(args.paths)}")
+        return
+
+    if prof:
+        print(f"== cProfile: {len(prof)} file(s) ==")
+        stats = pstats.Stats(*map(str, prof), stream=sys.stdout)
+        stats.sort_stats(args.sort).print_stats(args.top)
+
+    if collapsed:
+        self_counts, total_counts, samples = summarize_collapsed(collapsed)
+        ranked = total_counts if args.sort == 'cumulative' else self_counts
+        print(f"== sampled: {len(collapsed)} file(s), {samples} samples ==")
+        print(f"{'total %':>8} {'self %':>8}  function")
+        for frame, _ in ranked.most_common(args.top):
+            print(f"{100 * total_counts[frame] / samples:>8.1f} {100 * self_counts[frame] / samples:>8.1f}  {frame}")
+
+
+if __name__ == "__main__":
+    main()
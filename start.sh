@@ -1,8 +1,14 @@
 #!/bin/bash
 set -e
 
+if [ "${SERVE_MODE:-development}" = "production" ]; then
+    # gunicorn with workers sized to the available cores (see gunicorn.conf.py)
+    SERVE_APP=api gunicorn -c gunicorn.conf.py &
+    SERVE_APP=dashboard exec gunicorn -c gunicorn.conf.py
+fi
+
 # Run FastAPI on port 8000 in the background
 uvicorn fastapi_app.main:app --host 0.0.0.0 --port 8000 &
 
 # Run Dash dashboard on port 8050
-python dashboard/app.py --host 0.0.0.0 --port 8050
+python -m dashboard.app
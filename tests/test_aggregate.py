@@ -0,0 +1,82 @@
+import os
+import sqlite3
+
+import pytest
+
+from analysis import aggregate
+from analysis.aggregate import compile_aggregate, run_aggregate
+
+
+def make_db(tmp_path):
+    db_path = tmp_path / "aggregate.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE emissions_data (year INTEGER, sector_name TEXT, country_name TEXT, population INTEGER, emissions_ktco2 REAL, emissions_per_capita REAL)')
+    conn.execute('CREATE INDEX idx_series ON emissions_data(country_name, sector_name, year)')
+    conn.execute('CREATE TABLE emissions_forecast (year INTEGER, country_name TEXT, sector_name TEXT, forecast_emissions_ktco2 REAL, forecast_emissions_per_capita REAL, PRIMARY KEY (year, country_name, sector_name))')
+    conn.execute('CREATE INDEX idx_forecast_series ON emissions_forecast(country_name, sector_name, year)')
+    rows = [(year, sector, country, 100, value * (year - 2015), 1.0)
+            for country, value in (('Germany', 10.0), ('France', 5.0), ('Spain', 1.0))
+            for sector in ('Energy', 'Waste') for year in range(2016, 2022)]
+    conn.executemany('INSERT INTO emissions_data VALUES (?,?,?,?,?,?)', rows)
+    conn.executemany('INSERT INTO emissions_forecast VALUES (2030, ?, ?, ?, 0.5)',
+                     [('Germany', 'Energy', 60.0), ('Germany', 'Waste', 40.0)])
+    conn.commit()
+    conn.close()
+    return db_path
+
+def test_rollups(tmp_path):
+    db_path = make_db(tmp_path)
+    # a custom country group over a year range
+    out = run_aggregate(db_path, group_by=['sector_name'], aggregates=['sum:emissions_ktco2', 'count:emissions_ktco2'],
+                        countries=['Germany', 'France'], start_year=2020, end_year=2021)
+    assert out['columns'] == ['sector_name', 'sum_emissions_ktco2', 'count_emissions_ktco2']
+    assert out['rows'] == [('Energy', 15.0 * 11, 4), ('Waste', 15.0 * 11, 4)]
+
+    # multi-year averages in 3-year buckets
+    out = run_aggregate(db_path, group_by=['year'], year_step=3, aggregates=['avg:emissions_ktco2'], countries=['Spain'])
+    assert out['rows'] == [(2016, 2.0), (2019, 5.0)]
+
+    # sector shares within each country and source, largest first
+    out = run_aggregate(db_path, source='combined', group_by=['source', 'country_name', 'sector_name'],
+                        share_by=['source', 'country_name'], aggregates=['share:emissions_ktco2'],
+                        countries=['Germany'], order_by='-share_emissions_ktco2', limit=3)
+    assert out['rows'] == [('forecast', 'Germany', 'Energy', 60.0), ('historical', 'Germany', 'Energy', 50.0),
+                           ('historical', 'Germany', 'Waste', 50.0)]
+
+def test_filters_use_indexes_and_values_are_bound(tmp_path):
+    db_path = make_db(tmp_path)
+    sql, params = compile_aggregate(source='combined', group_by=['country_name'], aggregates=['sum:emissions_ktco2'],
+                                    countries=["Germany' OR 1=1 --"], sectors=['Energy'])
+    assert 'Germany' not in sql and params[0] == "Germany' OR 1=1 --"
+    conn = sqlite3.connect(db_path)
+    plan = ' | '.join(row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params))
+    conn.close()
+    assert 'SEARCH emissions_data USING INDEX idx_series' in plan
+    assert 'SEARCH emissions_forecast USING INDEX idx_forecast_series' in plan
+
+def test_invalid_requests_and_limits(tmp_path, monkeypatch):
+    db_path = make_db(tmp_path)
+    for request in ({'group_by': ['population']}, {'aggregates': ['median:emissions_ktco2']},
+                    {'aggregates': ['sum:population'], 'source': 'forecast'}, {'group_by': ['source']},
+                    {'order_by': 'emissions_ktco2; DROP TABLE emissions_data'}, {'share_by': ['year']}):
+        with pytest.raises(ValueError):
+            compile_aggregate(**{'aggregates': ['sum:emissions_ktco2'], **request})
+    monkeypatch.setattr(aggregate, 'AGGREGATE_MAX_ROWS', 5)
+    with pytest.raises(ValueError, match='More than 5 result rows'):
+        run_aggregate(db_path, group_by=['country_name', 'sector_name'], aggregates=['sum:emissions_ktco2'])
+    assert len(run_aggregate(db_path, group_by=['country_name', 'sector_name'], aggregates=['sum:emissions_ktco2'], limit=5)['rows']) == 5
+
+def test_results_are_cached_per_data_version(tmp_path):
+    db_path = make_db(tmp_path)
+    request = {'group_by': ['country_name'], 'aggregates': ['max:emissions_ktco2']}
+    first = run_aggregate(db_path, **request)
+    assert not first['cached'] and run_aggregate(db_path, **request)['cached']
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE emissions_data SET emissions_ktco2 = 1000 WHERE country_name = 'Spain' AND year = 2021")
+    conn.commit()
+    conn.close()
+    # same size, so make sure the mtime moves on
+    os.utime(db_path, ns=(os.stat(db_path).st_atime_ns, os.stat(db_path).st_mtime_ns + 1_000_000))
+    again = run_aggregate(db_path, **request)
+    assert not again['cached'] and ('Spain', 1000.0) in again['rows']
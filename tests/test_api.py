@@ -76,4 +76,139 @@ def test_forecast_endpoint(tmp_path, monkeypatch):
     assert res.status_code == 200
     data = res.json()
     assert len(data) >= 1
-    assert data[0]['year'] == 2030
\ No newline at end of file
+    assert data[0]['year'] == 2030
+def test_series_endpoint(tmp_path, monkeypatch):
+    db_path = setup_temp_db(tmp_path)
+    monkeypatch.setattr(api_module, 'DB_PATH', str(db_path))
+
+    client = TestClient(app)
+    res = client.get('/series', params={'country':'Germany', 'sector':'Total'})
+    assert res.status_code == 200
+    assert res.headers['Server-Timing'].startswith('db;dur=')
+    data = res.json()
+    assert [d['year'] for d in data['historical']] == [2020, 2021]
+    assert [d['year'] for d in data['forecast']] == [2030]
+    assert data['forecast'][0]['emissions_ktco2'] == 500.0
+
+    res = client.get('/series', params={'country':'Atlantis', 'sector':'Total'})
+    assert res.status_code == 404
+
+def test_series_endpoint_before_the_first_forecast(tmp_path, monkeypatch):
+    db_path = setup_temp_db(tmp_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute('DROP TABLE emissions_forecast')
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(api_module, 'DB_PATH', str(db_path))
+
+    res = TestClient(app).get('/series', params={'country':'Germany', 'sector':'Total'})
+    assert res.status_code == 200
+    assert [d['year'] for d in res.json()['historical']] == [2020, 2021]
+    assert res.json()['forecast'] == []
+
+def test_ready_endpoint(tmp_path, monkeypatch):
+    from etl.readiness import write_ready_marker
+    db_path = setup_temp_db(tmp_path)
+    marker_path = tmp_path / "emissions.ready"
+    monkeypatch.setattr(api_module, 'DB_PATH', str(db_path))
+    monkeypatch.setattr(api_module, 'READY_MARKER_PATH', str(marker_path))
+
+    client = TestClient(app)
+    assert client.get('/ready').status_code == 503
+    write_ready_marker(db_path, marker_path)
+    res = client.get('/ready')
+    assert res.status_code == 200
+    assert res.json()['ready'] is True
+
+def test_metrics_endpoint(tmp_path, monkeypatch):
+    db_path = setup_temp_db(tmp_path)
+    monkeypatch.setattr(api_module, 'DB_PATH', str(db_path))
+    client = TestClient(app)
+    client.get('/historical', params={'country': 'Germany'})
+    res = client.get('/metrics')
+    assert res.status_code == 200
+    assert res.headers['content-type'].startswith('text/plain')
+    assert 'api_request_seconds_count{method="GET",route="/historical",status="200"}' in res.text
+
+def test_forecast_increases_endpoint(tmp_path, monkeypatch):
+    db_path = setup_temp_db(tmp_path)
+    monkeypatch.setattr(api_module, 'DB_PATH', str(db_path))
+    client = TestClient(app)
+    res = client.get('/trends/forecast_increases', params={'top_n': 5})
+    assert res.status_code == 200
+    data = res.json()
+    assert [d['country_name'] for d in data] == ['Germany']
+    assert data[0]['start_emissions'] == 950.0
+
+def test_forecast_endpoint_returns_bounds(tmp_path, monkeypatch):
+    db_path = setup_temp_db(tmp_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute('ALTER TABLE emissions_forecast ADD COLUMN forecast_emissions_ktco2_lower_80 REAL')
+    conn.execute('ALTER TABLE emissions_forecast ADD COLUMN forecast_emissions_ktco2_upper_80 REAL')
+    conn.execute("UPDATE emissions_forecast SET forecast_emissions_ktco2_lower_80 = 450.0, forecast_emissions_ktco2_upper_80 = 550.0 WHERE country_name = 'Germany'")
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(api_module, 'DB_PATH', str(db_path))
+
+    client = TestClient(app)
+    data = client.get('/forecast', params={'country': 'Germany', 'sector': 'Total'}).json()
+    assert data[0]['forecast_emissions_ktco2_lower_80'] == 450.0
+    assert data[0]['forecast_emissions_ktco2_upper_80'] == 550.0
+    data = client.get('/forecast', params={'country': 'France', 'sector': 'Total'}).json()
+    assert data[0]['forecast_emissions_ktco2_lower_80'] is None
+
+def test_forecast_endpoint_allows_null_forecasts(tmp_path, monkeypatch):
+    db_path = setup_temp_db(tmp_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO emissions_forecast VALUES (2031, 'Germany', 'Total', NULL, NULL)")
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(api_module, 'DB_PATH', str(db_path))
+
+    res = TestClient(app).get('/forecast', params={'country': 'Germany', 'sector': 'Total'})
+    assert res.status_code == 200
+    row = next(d for d in res.json() if d['year'] == 2031)
+    assert row['forecast_emissions_ktco2'] is None and row['forecast_emissions_per_capita'] is None
+
+def test_vintage_endpoints(tmp_path, monkeypatch):
+    import pandas as pd
+
+    from etl.vintages import record_vintage
+    db_path = tmp_path / "vintages.db"
+    columns = ['year', 'sector_name', 'country_name', 'population', 'emissions_ktco2', 'emissions_per_capita']
+    conn = sqlite3.connect(db_path)
+    record_vintage(pd.DataFrame([(2019, 'Total', 'Germany', 83000000, 900.0, 10.84)], columns=columns), conn, '2024-03-01')
+    record_vintage(pd.DataFrame([(2019, 'Total', 'Germany', 83000000, 920.0, 11.08)], columns=columns), conn, '2024-09-01')
+    conn.close()
+    monkeypatch.setattr(api_module, 'DB_PATH', str(db_path))
+
+    client = TestClient(app)
+    params = {'country': 'Germany', 'sector': 'Total'}
+    assert client.get('/historical', params=params).json()[0]['emissions_ktco2'] == 920.0
+    assert client.get('/historical', params={**params, 'as_of': '2024-06-30'}).json()[0]['emissions_ktco2'] == 900.0
+    assert client.get('/historical', params={**params, 'as_of': '2023-06-30'}).status_code == 404
+    assert [r['change'] for r in client.get('/revisions', params=params).json()] == ['new', 'revised']
+    assert [v['revised'] for v in client.get('/vintages').json()] == [0, 1]
+
+def test_aggregate_endpoint(tmp_path, monkeypatch):
+    db_path = setup_temp_db(tmp_path)
+    monkeypatch.setattr(api_module, 'DB_PATH', str(db_path))
+    client = TestClient(app)
+    res = client.get('/aggregate', params={'source': 'combined', 'group_by': ['source', 'country_name'],
+                                           'agg': ['sum:emissions_ktco2'], 'country': ['Germany']})
+    assert res.status_code == 200
+    data = res.json()
+    assert data['columns'] == ['source', 'country_name', 'sum_emissions_ktco2']
+    assert data['rows'] == [['forecast', 'Germany', 500.0], ['historical', 'Germany', 1950.0]]
+    assert client.get('/aggregate', params={'agg': 'sum:secret'}).status_code == 400
+
+def test_analytics_endpoints_are_unavailable_without_an_export(tmp_path, monkeypatch):
+    from analysis import backends
+    db_path = setup_temp_db(tmp_path)
+    monkeypatch.setattr(api_module, 'DB_PATH', str(db_path))
+    monkeypatch.setattr(backends, 'ANALYTICS_BACKEND', 'duckdb')
+    monkeypatch.setattr(backends, 'PARQUET_DIR', tmp_path / 'parquet')
+    client = TestClient(app)
+    assert client.get('/trends/top_emitters', params={'year': 2020}).status_code == 503
+    assert client.get('/trends/forecast_increases').status_code == 503
+    assert client.get('/aggregate').status_code == 503
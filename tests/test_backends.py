@@ -0,0 +1,72 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from analysis import trends
+from analysis.aggregate import run_aggregate
+from analysis.backends import query_rows, resolve_backend
+from benchmarks.synthetic import build_database
+from etl.parquet_export import export_parquet, read_manifest
+
+
+def exported(tmp_path, n_geos=6):
+    db_path = build_database(tmp_path / "backends.db", n_geos, 4, 2000, 2012, forecast_years=3)
+    parquet_dir = tmp_path / "parquet"
+    export_parquet(db_path, parquet_dir)
+    return db_path, parquet_dir
+
+def test_export_partitions_by_year(tmp_path):
+    db_path, parquet_dir = exported(tmp_path)
+    manifest = read_manifest(parquet_dir)
+    conn = sqlite3.connect(db_path)
+    for table, entry in manifest['tables'].items():
+        assert entry['rows'] == conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    conn.close()
+    years = sorted(p.name for p in (parquet_dir / manifest['tables']['emissions_forecast']['path']).iterdir())
+    assert years == ['year=2013', 'year=2014', 'year=2015']
+    with pytest.raises(ValueError):
+        resolve_backend('postgres')
+
+def test_duckdb_matches_sqlite(tmp_path, monkeypatch):
+    pytest.importorskip('duckdb')
+    db_path, parquet_dir = exported(tmp_path)
+    monkeypatch.setattr(trends, 'DB_PATH', str(db_path))
+    monkeypatch.setattr('analysis.backends.PARQUET_DIR', parquet_dir)
+    for name, call in (('top', lambda b: trends.get_top_emitters(2012, 5, backend=b)),
+                       ('decreases', lambda b: trends.get_biggest_decreases(2000, 2012, 5, backend=b)),
+                       ('increases', lambda b: trends.get_worst_forecast_increases(5, backend=b))):
+        pd.testing.assert_frame_equal(call('duckdb'), call('sqlite'), check_dtype=False, obj=name)
+
+    requests = [
+        {'group_by': ['country_name'], 'aggregates': ['sum:emissions_ktco2', 'avg:emissions_per_capita'], 'start_year': 2005},
+        {'source': 'combined', 'group_by': ['source', 'year'], 'year_step': 5, 'aggregates': ['max:emissions_ktco2', 'count:emissions_ktco2']},
+        {'source': 'combined', 'group_by': ['source', 'sector_name'], 'share_by': ['source'], 'aggregates': ['share:emissions_ktco2'],
+         'countries': ['Germany', 'France']},
+    ]
+    for request in requests:
+        sqlite_out = run_aggregate(db_path, backend='sqlite', **request)
+        duckdb_out = run_aggregate(db_path, backend='duckdb', parquet_dir=parquet_dir, **request)
+        assert duckdb_out['columns'] == sqlite_out['columns']
+        n = len(request['group_by'])
+        assert [r[:n] for r in duckdb_out['rows']] == [r[:n] for r in sqlite_out['rows']]
+        for duckdb_row, sqlite_row in zip(duckdb_out['rows'], sqlite_out['rows']):
+            assert duckdb_row[n:] == pytest.approx(sqlite_row[n:])
+
+def test_duckdb_follows_new_exports(tmp_path):
+    pytest.importorskip('duckdb')
+    db_path, parquet_dir = exported(tmp_path)
+    count = 'SELECT COUNT(*) FROM emissions_forecast'
+    assert query_rows(count, backend='duckdb', parquet_dir=parquet_dir)[1][0][0] > 0
+
+    conn = sqlite3.connect(db_path)
+    conn.execute('DELETE FROM emissions_forecast')
+    conn.commit()
+    conn.close()
+    first = read_manifest(parquet_dir)
+    export_parquet(db_path, parquet_dir)
+    export_parquet(db_path, parquet_dir)
+    # an empty table still has its schema, and only the last two exports are kept
+    assert query_rows(count, backend='duckdb', parquet_dir=parquet_dir)[1] == [(0,)]
+    assert not (parquet_dir / first['tables']['emissions_data']['path']).exists()
+    assert len([p for p in parquet_dir.iterdir() if p.is_dir()]) == 4
@@ -0,0 +1,60 @@
+import sqlite3
+
+import numpy as np
+
+from analysis import backtest
+from etl.readiness import read_ready_marker, write_ready_marker
+
+
+def setup_db(tmp_path, n_years=16):
+    db_path = tmp_path / "backtest.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE emissions_data (year INTEGER, sector_name TEXT, country_name TEXT, population INTEGER, emissions_ktco2 REAL, emissions_per_capita REAL)')
+    rows = [(2000 + i, sector, 'Germany', 1000, start - 2.0 * i, 1.0)
+            for sector, start in (('Energy', 100.0), ('Waste', 50.0)) for i in range(n_years)]
+    rows.append((2000, 'Agriculture', 'Germany', 1000, 5.0, 1.0))  # too short to backtest
+    conn.executemany('INSERT INTO emissions_data VALUES (?,?,?,?,?,?)', rows)
+    conn.commit()
+    conn.close()
+    return str(db_path)
+
+def test_backtest_series_rolls_the_origin():
+    years, values = np.arange(2000, 2015), np.linspace(100, 72, 15)
+    rows = backtest.backtest_series('Germany', 'Energy', years, values, ['naive', 'linear'], horizon=3, min_train=10)
+    naive = [r for r in rows if r['model'] == 'naive']
+    # cutoffs 2009..2013, horizons truncated at the last actual year
+    assert sorted({r['cutoff_year'] for r in naive}) == [2009, 2010, 2011, 2012, 2013]
+    assert len(naive) == 3 + 3 + 3 + 2 + 1
+    first = naive[0]
+    assert first['forecast'] == values[9] and first['actual'] == values[10]
+    # one-step naive error equals the in-sample naive error, so MASE is 1
+    assert first['scaled_error'] == 1.0
+    # a linear series is forecast exactly by the linear trend
+    assert max(r['abs_pct_error'] for r in rows if r['model'] == 'linear') < 1e-8
+
+def test_run_backtest_stores_table_and_report(tmp_path, monkeypatch):
+    db_path = setup_db(tmp_path)
+    df = backtest.run_backtest(['naive', 'linear', 'arima_lbfgs'], horizon=2, min_train=12, workers=1, db_path=db_path)
+    assert set(df['sector_name']) == {'Energy', 'Waste'}
+    assert df['forecast'].notna().all()
+
+    # results go to their own database; the served one stays marked ready
+    marker_path = tmp_path / 'emissions.ready'
+    write_ready_marker(db_path, marker_path)
+    monkeypatch.setattr(backtest, 'BACKTEST_DB_PATH', tmp_path / 'results.db')
+    backtest.load_backtest_to_db(df)
+    conn = sqlite3.connect(tmp_path / 'results.db')
+    assert conn.execute('SELECT COUNT(*) FROM forecast_backtest').fetchone()[0] == len(df)
+    conn.close()
+    assert read_ready_marker(db_path, marker_path) is not None
+
+    summary = backtest.summarize_backtest(df)
+    assert summary.index[0] == 'linear'
+    assert summary.loc['linear', 'best_on_series'] == 2
+    assert 'Lowest mean MASE: linear' in backtest.backtest_report(df)
+
+def test_process_pool_matches_serial_run(tmp_path):
+    db_path = setup_db(tmp_path)
+    serial = backtest.run_backtest(['naive', 'linear'], horizon=2, min_train=12, workers=1, db_path=db_path)
+    pooled = backtest.run_backtest(['naive', 'linear'], horizon=2, min_train=12, workers=2, db_path=db_path)
+    assert serial.equals(pooled)
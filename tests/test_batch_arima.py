@@ -0,0 +1,92 @@
+import sqlite3
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+from statsmodels.tsa.arima.model import ARIMA
+
+from analysis import batch_arima, forecast
+
+
+def panel(n_series=8, n_years=30, seed=0):
+    rng = np.random.default_rng(seed)
+    return 1000 * np.exp(np.cumsum(rng.normal(-0.01, 0.03, size=(n_series, n_years)), axis=1))
+
+def statsmodels_model(y, order):
+    return ARIMA(y, order=order, enforce_stationarity=False, enforce_invertibility=False)
+
+@pytest.mark.parametrize('order', [(2, 1, 2), (1, 1, 0), (0, 2, 1), (1, 1, 1)])
+def test_loglike_matches_statsmodels(order):
+    y = panel()
+    params = np.array([statsmodels_model(row, order).start_params for row in y])
+    expected = [statsmodels_model(row, order).loglike(prm) for row, prm in zip(y, params)]
+    np.testing.assert_allclose(batch_arima.loglike(y, params, order), expected, rtol=1e-7, atol=1e-5)
+
+def test_fit_forecast_matches_statsmodels():
+    y = panel(n_series=12)
+    for order, share in (((1, 1, 0), 1.0), ((2, 1, 2), 0.75)):
+        mean, bounds, ok = batch_arima.fit_forecast(y, 5, order, levels=[80])
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            fits = [statsmodels_model(row, order).fit() for row in y]
+        expected = np.array([fit.forecast(5) for fit in fits])
+        expected_upper = np.array([fit.get_forecast(5).conf_int(alpha=0.2)[:, 1] for fit in fits])
+        close = np.all(np.isclose(mean, expected, rtol=1e-3), axis=1) & np.all(np.isclose(bounds[80][1], expected_upper, rtol=1e-3), axis=1)
+        # ARMA(2, 2) likelihoods have several optima; most series must land on statsmodels' one
+        assert (close & ok).mean() >= share
+
+def test_line_search_rounds_are_bounded(monkeypatch):
+    y = panel(n_series=4)
+    calls = []
+    original = batch_arima._objective
+    monkeypatch.setattr(batch_arima, '_objective', lambda y, x, order: calls.append(len(x)) or original(y, x, order))
+    # a step that is never acceptable: the full step plus two rounds of three halvings, then the series stop
+    monkeypatch.setattr(batch_arima, '_gradient', lambda y, x, order: -np.ones_like(x) * 1e6)
+    batch_arima.fit(y, (1, 1, 0), maxiter=5, halvings=3, max_line_search_rounds=2)
+    assert calls == [4, 4, 4 * 3, 4 * 3]
+
+def test_batch_falls_back_per_series(monkeypatch):
+    y = panel(n_series=3)
+    series = [pd.Series(row, index=range(1990, 2020)) for row in y] + [pd.Series([5.0, 6.0, 7.0, 8.0], index=range(2016, 2020))]
+    monkeypatch.setattr(batch_arima, 'fit', lambda y, order: (batch_arima.start_params(y, order), np.array([True, False, True])))
+    per_series = []
+    original = forecast.forecast_series_intervals
+    monkeypatch.setattr(forecast, 'forecast_series_intervals',
+                        lambda s, *args, **kwargs: per_series.append(len(s)) or original(s, *args, **kwargs))
+    frames = forecast.forecast_batch_intervals(series, forecast_years=3, levels=[80])
+    # the unconverged series and the one too short to batch
+    assert per_series == [30, 4]
+    assert all(list(frame.index) == [2020, 2021, 2022] for frame in frames)
+    assert all(list(frame.columns) == ['mean', 'lower_80', 'upper_80'] for frame in frames)
+
+def test_forecast_all_batched_engine(tmp_path, monkeypatch):
+    db_path = tmp_path / "forecast.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE emissions_data (year INTEGER, sector_name TEXT, country_name TEXT, population INTEGER, emissions_ktco2 REAL, emissions_per_capita REAL)')
+    rows = [(1990 + t, sector, 'Germany', 1000, value, value / 10)
+            for sector, series in zip(('Energy', 'Waste', 'Agriculture'), panel(n_series=3)) for t, value in enumerate(series)]
+    conn.executemany('INSERT INTO emissions_data VALUES (?,?,?,?,?,?)', rows)
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(forecast, 'DB_PATH', str(db_path))
+    monkeypatch.setattr(forecast, 'FORECAST_INTERVAL_LEVELS', [80])
+
+    batched = forecast.forecast_all(forecast_years=3, engine='batched')
+    reference = forecast.forecast_all(forecast_years=3, engine='statsmodels')
+    assert list(batched.columns) == list(reference.columns)
+    assert len(batched) == len(reference) == 9
+    np.testing.assert_allclose(batched['forecast_emissions_ktco2'], reference['forecast_emissions_ktco2'], rtol=0.05)
+    with pytest.raises(ValueError):
+        forecast.forecast_all(forecast_years=3, engine='gpu')
+
+def test_padded_series_match_unpadded():
+    y = panel(n_series=3)
+    params = np.array([statsmodels_model(row, (2, 1, 2)).start_params for row in y])
+    padded = y.copy()
+    padded[1, :7] = np.nan
+    expected = batch_arima.loglike(y[1:2, 7:], params[1:2])
+    np.testing.assert_allclose(batch_arima.loglike(padded, params)[1], expected[0], rtol=1e-10)
+    mean, _, _ = batch_arima.fit_forecast(padded, 4)
+    alone, _, _ = batch_arima.fit_forecast(y[1:2, 7:], 4)
+    np.testing.assert_allclose(mean[1], alone[0], rtol=1e-6)
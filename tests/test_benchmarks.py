@@ -0,0 +1,49 @@
+import etl.extract
+import etl.transform
+from benchmarks import bench_api
+from benchmarks.run import compare
+from benchmarks.synthetic import (
+    install_maps,
+    install_stub_client,
+    make_raw_emissions,
+    synthetic_maps,
+)
+from etl.extract import fetch_emissions_data, fetch_population_data
+from etl.transform import transform_emissions_data
+
+
+def test_synthetic_maps_extend_real_codes():
+    countries, sectors = synthetic_maps(40, 9)
+    assert len(countries) == 40 and len(sectors) == 9
+    assert countries['DE'] == 'Germany'
+    assert 'TOTXMEMO' in sectors
+
+def test_raw_emissions_shape():
+    df = make_raw_emissions(5, 3, 2000, 2009, missing=0)
+    assert len(df) == 5 * 3 * 10
+    assert set(df.columns) == {'values', 'unit', 'airpol', 'src_crf', 'geo', 'time'}
+    assert df.groupby(['geo', 'src_crf'])['time'].nunique().eq(10).all()
+
+def test_stub_client_feeds_extract_and_transform(monkeypatch):
+    monkeypatch.setattr(etl.extract, 'EurostatAPIClient', etl.extract.EurostatAPIClient)
+    monkeypatch.setattr(etl.transform, 'COUNTRY_MAP', etl.transform.COUNTRY_MAP)
+    monkeypatch.setattr(etl.transform, 'SECTOR_MAP', etl.transform.SECTOR_MAP)
+    install_stub_client(50, 7, 2000, 2009)
+    install_maps(50, 7)
+
+    emissions = fetch_emissions_data(2000, 2009)
+    population = fetch_population_data(2000, 2009, geo_filter=['DE', 'Z0045'])
+    assert set(population['country_code']) == {'DE', 'Z0045'}
+
+    population = fetch_population_data(2000, 2009, geo_filter=emissions['geo'].unique().tolist())
+    out = transform_emissions_data(emissions, 2000, 2009, population_df=population)
+    assert out['country_name'].nunique() == 50
+    assert out['emissions_per_capita'].notna().all()
+
+def test_every_api_route_is_benchmarked():
+    assert bench_api.missing_routes() == []
+
+def test_compare_flags_regressions():
+    results = {'a': {'min': 1.3, 'median': 1.4}, 'b': {'min': 1.1, 'median': 1.2}, 'c': {'min': 1.0, 'median': 1.0}}
+    rows = {name: regressed for name, _, _, _, regressed in compare(results, {'a': 1.0, 'b': 1.0}, threshold=0.25)}
+    assert rows == {'a': True, 'b': False, 'c': False}
@@ -0,0 +1,85 @@
+import sqlite3
+import time
+
+import dashboard.app as dashboard_module
+
+
+def create_db(db_path, rows):
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE IF NOT EXISTS emissions_data (year INTEGER, sector_name TEXT, country_name TEXT)')
+    conn.executemany('INSERT INTO emissions_data VALUES (?,?,?)', rows)
+    conn.commit()
+    conn.close()
+
+def test_layout_does_not_touch_db(tmp_path, monkeypatch):
+    db_path = tmp_path / "missing.db"
+    monkeypatch.setattr(dashboard_module, 'DB_PATH', db_path)
+
+    layout = dashboard_module.serve_layout()
+    assert layout is not None
+    assert dashboard_module.get_country_sector_options() == []
+    # must not create an empty DB file as a side effect
+    assert not db_path.exists()
+
+def test_options_follow_data_version(tmp_path, monkeypatch):
+    db_path = tmp_path / "dash.db"
+    monkeypatch.setattr(dashboard_module, 'DB_PATH', db_path)
+
+    create_db(db_path, [(2020, 'Energy', 'Germany')])
+    options = dashboard_module.get_country_sector_options()
+    assert options == [{'label': 'Germany - Energy', 'value': 'Germany|||Energy'}]
+
+    # new data shows up without a restart
+    time.sleep(0.01)
+    create_db(db_path, [(2020, 'Energy', 'France')])
+    values = [o['value'] for o in dashboard_module.get_country_sector_options()]
+    assert values == ['France|||Energy', 'Germany|||Energy']
+
+def create_series_db(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE emissions_data (year INTEGER, sector_name TEXT, country_name TEXT, emissions_ktco2 REAL, emissions_per_capita REAL)')
+    conn.execute('CREATE TABLE emissions_forecast (year INTEGER, country_name TEXT, sector_name TEXT, forecast_emissions_ktco2 REAL, forecast_emissions_per_capita REAL)')
+    rows = []
+    for country in ['Germany', 'France', 'Spain']:
+        for sector, value in [('Energy', 10.0), ('Waste management', 2.0), ('Total (excluding memo items)', 12.0)]:
+            rows += [(year, sector, country, value, value / 10) for year in (2020, 2021)]
+    conn.executemany('INSERT INTO emissions_data VALUES (?,?,?,?,?)', rows)
+    conn.execute("INSERT INTO emissions_forecast VALUES (2022, 'Germany', 'Energy', 9.0, 0.9)")
+    conn.commit()
+    conn.close()
+
+def test_update_comparison_countries(tmp_path, monkeypatch):
+    db_path = tmp_path / "compare.db"
+    create_series_db(db_path)
+    monkeypatch.setattr(dashboard_module, 'DB_PATH', db_path)
+
+    fig, message = dashboard_module.update_comparison(['Germany', 'France'], 'Energy', 'emissions_ktco2', ['total'])
+    assert message == ""
+    names = [t.name for t in fig.data]
+    assert names.count('Germany') == 2  # historical + forecast
+    total = next(t for t in fig.data if t.name == 'Total')
+    assert list(total.y) == [20.0, 20.0]
+    metrics = dashboard_module.server.test_client().get('/metrics').get_data(as_text=True)
+    assert 'dashboard_db_seconds_count{callback="update_comparison"}' in metrics
+
+def test_update_comparison_sectors_excludes_total_sector(tmp_path, monkeypatch):
+    db_path = tmp_path / "compare.db"
+    create_series_db(db_path)
+    monkeypatch.setattr(dashboard_module, 'DB_PATH', db_path)
+
+    fig, _ = dashboard_module.update_comparison(['Spain'], dashboard_module.ALL_SECTORS, 'emissions_ktco2', ['total'])
+    total = next(t for t in fig.data if t.name == 'Total')
+    assert list(total.y) == [12.0, 12.0]
+
+def test_ready_route(tmp_path, monkeypatch):
+    from etl.readiness import write_ready_marker
+    db_path = tmp_path / "dash.db"
+    marker_path = tmp_path / "emissions.ready"
+    create_db(db_path, [(2020, 'Energy', 'Germany')])
+    monkeypatch.setattr(dashboard_module, 'DB_PATH', db_path)
+    monkeypatch.setattr(dashboard_module, 'READY_MARKER_PATH', marker_path)
+
+    client = dashboard_module.server.test_client()
+    assert client.get('/ready').status_code == 503
+    write_ready_marker(db_path, marker_path)
+    assert client.get('/ready').get_json()['ready'] is True
@@ -0,0 +1,98 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from analysis import forecast
+from analysis.forecast import (
+    _linear_trend_forecast,
+    forecast_series,
+    forecast_series_intervals,
+    interval_columns,
+)
+
+
+def make_series(n=25, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.Series(np.linspace(100, 60, n) + rng.normal(0, 2, n), index=range(1998, 1998 + n))
+
+def test_intervals_nest_around_mean():
+    frame = forecast_series_intervals(make_series(), forecast_years=5, levels=[80, 95])
+    assert list(frame.columns) == ['mean', 'lower_80', 'upper_80', 'lower_95', 'upper_95']
+    assert list(frame.index) == [2023, 2024, 2025, 2026, 2027]
+    assert (frame['lower_95'] <= frame['lower_80']).all()
+    assert (frame['lower_80'] <= frame['mean']).all()
+    assert (frame['mean'] <= frame['upper_80']).all()
+    assert (frame['upper_80'] <= frame['upper_95']).all()
+
+def test_forecast_series_still_returns_point_forecast():
+    series = make_series()
+    points = forecast_series(series, forecast_years=3)
+    assert isinstance(points, pd.Series)
+    np.testing.assert_allclose(points.values, forecast_series_intervals(series, 3, levels=[])['mean'].values)
+
+def test_linear_fallback_intervals_widen():
+    frame = _linear_trend_forecast(make_series(), 4, levels=[90])
+    width = frame['upper_90'] - frame['lower_90']
+    assert (width > 0).all()
+    assert width.is_monotonic_increasing
+
+def test_linear_fallback_without_enough_points_has_no_bounds():
+    frame = _linear_trend_forecast(pd.Series([5.0, 6.0], index=[2020, 2021]), 2, levels=[80])
+    assert frame['mean'].tolist() == [7.0, 8.0]
+    assert frame['lower_80'].isna().all()
+
+def test_forecast_all_writes_bounds(tmp_path, monkeypatch):
+    db_path = tmp_path / "forecast.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE emissions_data (year INTEGER, sector_name TEXT, country_name TEXT, population INTEGER, emissions_ktco2 REAL, emissions_per_capita REAL)')
+    series = make_series()
+    conn.executemany('INSERT INTO emissions_data VALUES (?,?,?,?,?,?)',
+                     [(year, 'Energy', 'Germany', 1000, value, value / 10) for year, value in series.items()])
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(forecast, 'DB_PATH', str(db_path))
+    monkeypatch.setattr(forecast, 'FORECAST_INTERVAL_LEVELS', [80])
+
+    df = forecast.forecast_all(forecast_years=3)
+    forecast.load_forecasts_to_db(df)
+    conn = sqlite3.connect(db_path)
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(emissions_forecast)')]
+    conn.close()
+    for column in interval_columns('forecast_emissions_ktco2', [80]) + interval_columns('forecast_emissions_per_capita', [80]):
+        assert column in columns
+    assert (df['forecast_emissions_ktco2_lower_80'] < df['forecast_emissions_ktco2']).all()
+
+def test_forecast_population_extends_trend():
+    population = pd.DataFrame({'country_name': ['A'] * 5 + ['B'] * 3,
+                               'year': [2015, 2016, 2017, 2018, 2019, 2015, 2016, 2017],
+                               'population': [100, 110, 120, 130, 140, 50, 50, 50]})
+    out = forecast.forecast_population(population, forecast_years=2)
+    assert out.loc['A', 2019] == 140
+    assert out.loc['A', 2021] == 160
+    # B's history ends earlier; its trend starts after its own last year
+    assert out.loc['B', 2018] == 50 and out.loc['B', 2021] == 50
+    assert list(out.columns) == list(range(2015, 2022))
+
+def test_forecast_all_derives_per_capita(tmp_path, monkeypatch):
+    db_path = tmp_path / "forecast.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE emissions_data (year INTEGER, sector_name TEXT, country_name TEXT, population INTEGER, emissions_ktco2 REAL, emissions_per_capita REAL)')
+    series = make_series()
+    conn.executemany('INSERT INTO emissions_data VALUES (?,?,?,?,?,?)',
+                     [(year, sector, 'Germany', 1000 + 10 * (year - 1998), value, value * 1_000_000 / 1000)
+                      for sector in ('Energy', 'Waste') for year, value in series.items()])
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(forecast, 'DB_PATH', str(db_path))
+    monkeypatch.setattr(forecast, 'FORECAST_INTERVAL_LEVELS', [80])
+    fitted = []
+    original = forecast.forecast_series_intervals
+    monkeypatch.setattr(forecast, 'forecast_series_intervals',
+                        lambda s, *args, **kwargs: fitted.append(s.name) or original(s, *args, **kwargs))
+
+    df = forecast.forecast_all(forecast_years=3, per_capita='derived')
+    assert len(fitted) == 2 and all(name.endswith('emissions_ktco2') for name in fitted)
+    population = 1000 + 10 * (df['year'] - 1998)
+    np.testing.assert_allclose(df['forecast_emissions_per_capita'], df['forecast_emissions_ktco2'] * 1_000_000 / population)
+    np.testing.assert_allclose(df['forecast_emissions_per_capita_upper_80'], df['forecast_emissions_ktco2_upper_80'] * 1_000_000 / population)
@@ -0,0 +1,86 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import forecast
+from analysis.forecast_writer import ForecastWriter, create_forecast_table
+
+
+def make_db(tmp_path, sectors=('Energy', 'Waste', 'Agriculture')):
+    db_path = tmp_path / "forecast.db"
+    rng = np.random.default_rng(0)
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE emissions_data (year INTEGER, sector_name TEXT, country_name TEXT, population INTEGER, emissions_ktco2 REAL, emissions_per_capita REAL)')
+    conn.executemany('INSERT INTO emissions_data VALUES (?,?,?,?,?,?)',
+                     [(1998 + t, sector, 'Germany', 1000, value, value / 10)
+                      for sector in sectors for t, value in enumerate(np.linspace(100, 60, 25) + rng.normal(0, 2, 25))])
+    conn.commit()
+    conn.close()
+    return db_path
+
+def read_forecasts(db_path):
+    conn = sqlite3.connect(db_path)
+    df = pd.read_sql_query('SELECT * FROM emissions_forecast ORDER BY country_name, sector_name, year', conn)
+    conn.close()
+    return df
+
+def test_stream_matches_forecast_all_and_drops_stale_rows(tmp_path, monkeypatch):
+    db_path = make_db(tmp_path)
+    monkeypatch.setattr(forecast, 'DB_PATH', str(db_path))
+    monkeypatch.setattr(forecast, 'FORECAST_INTERVAL_LEVELS', [80])
+    conn = sqlite3.connect(db_path)
+    create_forecast_table(conn, forecast.output_columns([80]))
+    conn.execute("INSERT INTO emissions_forecast (year, country_name, sector_name) VALUES (2030, 'France', 'Energy')")
+    conn.commit()
+    conn.close()
+
+    # batches of 4 rows split series of 3 years across flushes
+    assert forecast.stream_forecasts(forecast_years=3, reconcile='', batch_rows=4) == 9
+    streamed = read_forecasts(db_path)
+    expected = forecast.forecast_all(forecast_years=3, reconcile='').sort_values(['country_name', 'sector_name', 'year'])
+    pd.testing.assert_frame_equal(streamed, expected[streamed.columns].reset_index(drop=True), check_dtype=False)
+
+    conn = sqlite3.connect(db_path)
+    key = [row[1] for row in conn.execute('PRAGMA table_info(emissions_forecast)') if row[5]]
+    conn.close()
+    assert key == ['year', 'country_name', 'sector_name']
+
+def test_flushed_batches_survive_a_crash(tmp_path, monkeypatch):
+    db_path = make_db(tmp_path)
+    monkeypatch.setattr(forecast, 'DB_PATH', str(db_path))
+    monkeypatch.setattr(forecast, 'FORECAST_INTERVAL_LEVELS', [80])
+    forecast.stream_forecasts(forecast_years=3, reconcile='')
+    before = read_forecasts(db_path)
+
+    fitted = []
+    original = forecast.forecast_series_intervals
+    def fit(s, *args, **kwargs):
+        if len(fitted) == 4:
+            raise KeyboardInterrupt
+        fitted.append(s.name)
+        return original(s.iloc[:-1], *args, **kwargs)
+    monkeypatch.setattr(forecast, 'forecast_series_intervals', fit)
+    with pytest.raises(KeyboardInterrupt):
+        forecast.stream_forecasts(forecast_years=3, reconcile='', batch_rows=2)
+
+    # the two finished series were written (one year earlier, since the last one was dropped)
+    # and the third still has the previous run's rows
+    after = read_forecasts(db_path)
+    assert after.groupby('sector_name')['year'].min().to_dict() == {'Agriculture': 2022, 'Energy': 2022, 'Waste': 2023}
+    assert len(after) == 9 + 2
+    pd.testing.assert_frame_equal(after[after['sector_name'] == 'Waste'].reset_index(drop=True),
+                                  before[before['sector_name'] == 'Waste'].reset_index(drop=True))
+
+def test_table_without_key_is_recreated(tmp_path):
+    db_path = tmp_path / "forecast.db"
+    conn = sqlite3.connect(db_path)
+    pd.DataFrame({'year': [2030], 'country_name': ['Germany'], 'sector_name': ['Energy'], 'forecast_emissions_ktco2': [1.0]}).to_sql('emissions_forecast', conn, index=False)
+    conn.close()
+    frame = pd.DataFrame({'forecast_emissions_ktco2': [1.0, np.nan]}, index=[2024, 2025])
+    with ForecastWriter(['forecast_emissions_ktco2', 'forecast_emissions_per_capita'], db_path=db_path, batch_rows=8) as writer:
+        writer.add('Germany', 'Energy', frame)
+        writer.add('Germany', 'Energy', frame * 2)
+    rows = sqlite3.connect(db_path).execute('SELECT * FROM emissions_forecast ORDER BY year').fetchall()
+    assert rows == [(2024, 'Germany', 'Energy', 2.0, None), (2025, 'Germany', 'Energy', None, None)]
@@ -0,0 +1,83 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_jsonstat, make_raw_emissions, make_raw_population
+from etl.jsonstat import decode, fetch_dataset
+from etl.transform import transform_emissions_data
+
+DIMS = ['unit', 'airpol', 'geo', 'src_crf', 'time']
+
+def rowwise(payload):
+    """ Cell-by-cell decoding, the way Dataset.to_dataframe() builds the cube. """
+    labels = [sorted(payload['dimension'][d]['category']['index'], key=payload['dimension'][d]['category']['index'].get)
+              for d in payload['id']]
+    rows = []
+    for flat, combo in enumerate(itertools.product(*labels)):
+        rows.append({'values': payload['value'].get(str(flat), np.nan), **dict(zip(payload['id'], combo))})
+    return pd.DataFrame(rows)
+
+def test_decode_matches_rowwise_output():
+    raw = make_raw_emissions(4, 3, 2000, 2010, missing=0.1)
+    payload = make_jsonstat(raw, DIMS)
+    df = decode(payload)
+    expected = rowwise(payload)
+    assert list(df.columns) == ['values'] + DIMS
+    assert isinstance(df['geo'].dtype, pd.CategoricalDtype)
+    pd.testing.assert_frame_equal(df.astype({d: str for d in DIMS}), expected.astype({d: str for d in DIMS}))
+    # the raw extract is in the same row-major order
+    np.testing.assert_array_equal(df['values'].to_numpy(), raw['values'].to_numpy())
+
+def test_sparse_decode_keeps_observed_cells():
+    payload = make_jsonstat(make_raw_emissions(4, 3, 2000, 2010, missing=0.1), DIMS)
+    dense, sparse = decode(payload), decode(payload, dense=False)
+    observed = dense.dropna(subset=['values']).reset_index(drop=True)
+    assert len(sparse) == len(payload['value'])
+    pd.testing.assert_frame_equal(sparse.astype({d: str for d in DIMS}), observed.astype({d: str for d in DIMS}))
+
+def test_decode_list_values_and_list_index():
+    payload = {
+        'id': ['geo', 'time'],
+        'size': [2, 2],
+        'dimension': {'geo': {'category': {'index': ['DE', 'FR']}},
+                      'time': {'category': {'index': {'2020': 0, '2021': 1}}}},
+        'value': [1.0, None, 3.0, 4.0],
+    }
+    df = decode(payload, dense=False)
+    assert df['values'].tolist() == [1.0, 3.0, 4.0]
+    assert df['geo'].tolist() == ['DE', 'FR', 'FR']
+    assert df['time'].tolist() == ['2020', '2020', '2021']
+
+def test_fetch_dataset_uses_session_and_feeds_transform():
+    emissions = make_jsonstat(make_raw_emissions(3, 2, 2000, 2005), DIMS)
+    population = make_jsonstat(make_raw_population(['BE', 'BG', 'CZ'], 2000, 2005), ['age', 'sex', 'unit', 'geo', 'time'])
+
+    class Response:
+        def __init__(self, payload):
+            self.payload = payload
+        def raise_for_status(self):
+            pass
+        def json(self):
+            return self.payload
+
+    class Session:
+        def get(self, url, params=None):
+            assert url in ('https://example.invalid/eurostat/api/dissemination/statistics/1.0/data/env_air_gge',
+                           'https://example.invalid/eurostat/api/dissemination/statistics/1.0/data/demo_pjan')
+            assert params['format'] == 'JSON' and params['lang'] == 'EN'
+            return Response(emissions if url.endswith('env_air_gge') else population)
+
+    class Client:
+        # the shape of EurostatAPIClient.api_url: no trailing slash
+        session = Session()
+        api_url = 'https://example.invalid/eurostat/api/dissemination/statistics/1.0/data'
+        response_type = 'JSON'
+        language = 'EN'
+
+    raw = fetch_dataset(Client(), 'env_air_gge', {})
+    pop = fetch_dataset(Client(), 'demo_pjan', {}).rename(columns={'geo': 'country_code', 'time': 'year', 'values': 'population'})
+    pop['year'] = pop['year'].astype(int)
+    out = transform_emissions_data(raw, 2000, 2005, population_df=pop[['country_code', 'year', 'population']])
+    assert len(out) == 3 * 2 * 6
+    assert set(out['country_name']) == {'Belgium', 'Bulgaria', 'Czechia'}
@@ -0,0 +1,72 @@
+import logging
+
+import pandas as pd
+
+from analysis.forecast import forecast_series
+from etl.stages import Stage, StageRunner
+from monitoring import metrics
+from monitoring.metrics import (
+    counter,
+    gauge,
+    histogram,
+    log_event,
+    render_prometheus,
+    reset_metrics,
+    timer,
+)
+
+
+def setup_function():
+    reset_metrics()
+
+def test_counter_and_gauge_render():
+    counter('jobs_total', 'Jobs').inc(kind='a')
+    counter('jobs_total').inc(2, kind='a')
+    gauge('queue_depth').set(7)
+    text = render_prometheus()
+    assert '# TYPE jobs_total counter' in text
+    assert 'jobs_total{kind="a"} 3' in text
+    assert 'queue_depth 7' in text
+
+def test_histogram_buckets_are_cumulative():
+    h = histogram('latency_seconds', buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        h.observe(value)
+    text = render_prometheus()
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+    assert 'latency_seconds_count 3' in text
+
+def test_timer_records_elapsed():
+    with timer('block_seconds', step='x') as t:
+        pass
+    assert t.elapsed >= 0
+    assert histogram('block_seconds').count(step='x') == 1
+
+def test_log_event_writes_json(caplog):
+    metrics.logger.propagate = True
+    try:
+        with caplog.at_level(logging.INFO, logger='eurostat'):
+            log_event('forecast_fit', path='nm', seconds=0.25)
+    finally:
+        metrics.logger.propagate = False
+    record = caplog.records[-1]
+    assert record.getMessage() == 'forecast_fit'
+    line = metrics.JsonFormatter().format(record)
+    assert '"path": "nm"' in line and '"seconds": 0.25' in line
+
+def test_forecast_series_counts_fit_path():
+    series = pd.Series([float(v) for v in range(10, 30)], index=range(2000, 2020), name='Germany|Energy|emissions_ktco2')
+    result = forecast_series(series, forecast_years=3)
+    assert len(result) == 3
+    fits = counter('forecast_fits_total')
+    assert sum(fits.value(path=p) for p in ('lbfgs', 'nm', 'linear', 'last_value')) == 1
+
+def test_stage_runner_records_stage_metrics(tmp_path):
+    stages = [Stage('a', lambda: pd.DataFrame({'x': [1, 2, 3]}))]
+    StageRunner(stages, tmp_path).run()
+    assert gauge('etl_stage_rows').value(stage='a') == 3
+    assert histogram('etl_stage_seconds').count(stage='a') == 1
+    StageRunner(stages, tmp_path).run()
+    assert counter('etl_stage_runs_total').value(stage='a', status='skipped') == 1
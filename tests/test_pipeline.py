@@ -0,0 +1,33 @@
+from etl import pipeline
+
+
+def test_extracts_are_independent_stages(monkeypatch):
+    calls = {}
+    monkeypatch.setattr(pipeline, 'fetch_population_data',
+                        lambda start_year, end_year, geo_filter=None: calls.setdefault('geo', geo_filter))
+
+    stages = {s.name: s for s in pipeline.build_stages(2000, 2020)}
+    assert stages['extract_population'].deps == ()
+    assert stages['extract_emissions'].deps == ()
+    assert stages['transform'].deps == ('extract_emissions', 'extract_population')
+
+    # population is requested for the configured countries, not derived from emissions
+    stages['extract_population'].func()
+    assert set(calls['geo']) == set(pipeline.COUNTRY_MAP)
+
+def test_materialize_reruns_when_the_parquet_export_is_missing(tmp_path, monkeypatch):
+    import json
+
+    from etl import parquet_export
+    monkeypatch.setattr(pipeline, 'read_ready_marker', lambda: {'data_version': 'v1'})
+    monkeypatch.setattr(parquet_export, 'PARQUET_DIR', tmp_path)
+    materialize = {s.name: s for s in pipeline.build_stages(2000, 2020)}['materialize']
+    assert materialize.is_current()
+
+    # ANALYTICS_BACKEND=duckdb switched on after the last run
+    monkeypatch.setattr(pipeline, 'PARQUET_EXPORT', True)
+    assert not materialize.is_current()
+    (tmp_path / 'manifest.json').write_text(json.dumps({'version': 'x', 'data_version': 'v0', 'tables': {}}))
+    assert not materialize.is_current()
+    (tmp_path / 'manifest.json').write_text(json.dumps({'version': 'y', 'data_version': 'v1', 'tables': {}}))
+    assert materialize.is_current()
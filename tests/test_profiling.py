@@ -0,0 +1,75 @@
+import time
+
+import pandas as pd
+import pytest
+
+from etl.stages import Stage, StageRunner
+from monitoring.profiling import (
+    main,
+    profile,
+    profile_request,
+    resolve_mode,
+    summarize_collapsed,
+)
+
+
+def busy(seconds=0.05):
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += sum(range(100))
+    return total
+
+def test_resolve_mode():
+    assert resolve_mode(None) is None
+    assert resolve_mode('') is None
+    assert resolve_mode('1') == 'cprofile'
+    assert resolve_mode('sample') == 'sample'
+    with pytest.raises(ValueError):
+        resolve_mode('perf')
+
+def test_profile_disabled_is_noop(tmp_path):
+    with profile('stage', None, tmp_path) as path:
+        busy(0.01)
+    assert path is None
+    assert list(tmp_path.iterdir()) == []
+
+def test_cprofile_writes_prof(tmp_path):
+    with profile('transform', 'cprofile', tmp_path) as path:
+        busy()
+    assert path == tmp_path / 'transform.prof'
+    assert path.exists()
+
+def test_sampling_writes_collapsed_stacks(tmp_path):
+    with profile('forecast', 'sample', tmp_path) as path:
+        busy(0.1)
+    lines = path.read_text().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(' ', 1)
+    assert int(count) > 0
+    assert any('busy (test_profiling.py' in frame for frame in stack.split(';'))
+
+def test_profile_request_keeps_project_stacks(tmp_path):
+    with profile_request('GET-/series', tmp_path) as path:
+        busy(0.1)
+    _, total_counts, samples = summarize_collapsed([path])
+    assert samples > 0
+    assert any(frame.startswith('busy ') for frame in total_counts)
+
+def test_stage_runner_writes_profile_per_stage(tmp_path):
+    stages = [
+        Stage('a', lambda: pd.DataFrame({'x': [busy(0.01)]})),
+        Stage('b', lambda a: a, deps=('a',)),
+    ]
+    StageRunner(stages, tmp_path / 'ckpt', profile_mode='cprofile', profile_dir=tmp_path / 'prof').run()
+    assert sorted(p.name for p in (tmp_path / 'prof').iterdir()) == ['a.prof', 'b.prof']
+
+def test_summary_cli(tmp_path, capsys):
+    with profile('one', 'cprofile', tmp_path):
+        busy(0.01)
+    with profile('two', 'sample', tmp_path):
+        busy(0.05)
+    main([str(tmp_path), '--top', '5'])
+    out = capsys.readouterr().out
+    assert 'cProfile: 1 file(s)' in out
+    assert 'sampled: 1 file(s)' in out
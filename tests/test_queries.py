@@ -0,0 +1,92 @@
+import sqlite3
+
+from analysis import queries
+
+
+def setup_temp_db(tmp_path):
+    db_path = tmp_path / "queries.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE emissions_data (year INTEGER, sector_name TEXT, country_name TEXT, emissions_ktco2 REAL, emissions_per_capita REAL)')
+    conn.execute('CREATE TABLE emissions_forecast (year INTEGER, country_name TEXT, sector_name TEXT, forecast_emissions_ktco2 REAL, forecast_emissions_per_capita REAL)')
+    conn.executemany('INSERT INTO emissions_data VALUES (?,?,?,?,?)', [
+        (2021, 'Energy', 'Germany', 90.0, 1.1),
+        (2020, 'Energy', 'Germany', 100.0, 1.2),
+        (2020, 'Energy', 'France', 50.0, 0.8),
+    ])
+    conn.execute('INSERT INTO emissions_forecast VALUES (2022, ?, ?, 80.0, 1.0)', ('Germany', 'Energy'))
+    conn.commit()
+    conn.close()
+    return db_path
+
+def test_query_series_returns_both_sources(tmp_path):
+    db_path = setup_temp_db(tmp_path)
+    df = queries.query_series('Germany', 'Energy', db_path=str(db_path))
+    assert df['source'].tolist() == ['historical', 'historical', 'forecast']
+    assert df['year'].tolist() == [2020, 2021, 2022]
+    assert df.attrs['db_time_ms'] >= 0
+
+    hist_df, forecast_df = queries.split_series(df)
+    assert len(hist_df) == 2
+    assert forecast_df.iloc[0]['emissions_ktco2'] == 80.0
+
+def test_query_series_before_the_first_forecast(tmp_path):
+    db_path = setup_temp_db(tmp_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute('DROP TABLE emissions_forecast')
+    conn.commit()
+    conn.close()
+    df = queries.query_series('Germany', 'Energy', db_path=str(db_path))
+    assert df['source'].tolist() == ['historical', 'historical']
+    batch = queries.query_series_batch(['Germany', 'France'], db_path=str(db_path))
+    assert set(batch['source']) == {'historical'}
+
+    # the forecast branch comes back once the table exists (a new data version)
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE emissions_forecast (year INTEGER, country_name TEXT, sector_name TEXT, forecast_emissions_ktco2 REAL, forecast_emissions_per_capita REAL)')
+    conn.execute('INSERT INTO emissions_forecast VALUES (2022, ?, ?, 80.0, 1.0)', ('Germany', 'Energy'))
+    conn.commit()
+    conn.close()
+    df = queries.query_series('Germany', 'Energy', db_path=str(db_path))
+    assert df['source'].tolist() == ['historical', 'historical', 'forecast']
+    queries.close_connections()
+
+def test_get_connection_is_reused(tmp_path):
+    db_path = setup_temp_db(tmp_path)
+    conn = queries.get_connection(str(db_path))
+    assert queries.get_connection(str(db_path)) is conn
+    queries.close_connections()
+    assert queries.get_connection(str(db_path)) is not conn
+    queries.close_connections()
+
+def test_build_series_bundle(tmp_path):
+    db_path = setup_temp_db(tmp_path)
+    bundle = queries.build_series_bundle(str(db_path))
+    queries.close_connections()
+
+    assert bundle['keys'] == ['France|||Energy', 'Germany|||Energy']
+    hist = bundle['historical']
+    assert hist['offsets'] == [0, 1, 3]
+    # Germany rows are contiguous and sorted by year
+    assert hist['year'][1:3] == [2020, 2021]
+    assert hist['emissions_ktco2'][1:3] == [100.0, 90.0]
+    assert bundle['forecast']['offsets'] == [0, 0, 1]
+    assert bundle['forecast']['emissions_per_capita'] == [1.0]
+
+def test_query_series_includes_interval_bounds(tmp_path):
+    db_path = setup_temp_db(tmp_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute('ALTER TABLE emissions_forecast ADD COLUMN forecast_emissions_ktco2_lower_80 REAL')
+    conn.execute('ALTER TABLE emissions_forecast ADD COLUMN forecast_emissions_ktco2_upper_80 REAL')
+    conn.execute('UPDATE emissions_forecast SET forecast_emissions_ktco2_lower_80 = 70.0, forecast_emissions_ktco2_upper_80 = 90.0')
+    conn.commit()
+    conn.close()
+
+    df = queries.query_series('Germany', 'Energy', db_path=str(db_path))
+    hist_df, forecast_df = queries.split_series(df)
+    assert hist_df['emissions_ktco2_lower_80'].isna().all()
+    assert forecast_df.iloc[0]['emissions_ktco2_lower_80'] == 70.0
+
+    bundle = queries.build_series_bundle(str(db_path))
+    queries.close_connections()
+    assert bundle['forecast']['emissions_ktco2_upper_80'] == [90.0]
+    assert 'emissions_ktco2_upper_80' not in bundle['historical']
@@ -0,0 +1,50 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from etl import readiness
+
+
+def create_db(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE IF NOT EXISTS emissions_data (year INTEGER)')
+    conn.execute('INSERT INTO emissions_data VALUES (2020)')
+    conn.commit()
+    conn.close()
+
+def test_marker_tracks_database_version(tmp_path):
+    db_path = tmp_path / "emissions.db"
+    marker_path = tmp_path / "emissions.ready"
+    assert readiness.read_ready_marker(db_path, marker_path) is None
+
+    create_db(db_path)
+    # a database without a marker is not ready (load may still be running)
+    assert readiness.read_ready_marker(db_path, marker_path) is None
+
+    marker = readiness.write_ready_marker(db_path, marker_path)
+    assert readiness.read_ready_marker(db_path, marker_path) == marker
+
+    # a new load invalidates the marker until it is written again
+    time.sleep(0.01)
+    create_db(db_path)
+    assert readiness.read_ready_marker(db_path, marker_path) is None
+
+def test_wait_until_ready_wakes_on_marker(tmp_path):
+    db_path = tmp_path / "emissions.db"
+    marker_path = tmp_path / "emissions.ready"
+    create_db(db_path)
+
+    timer = threading.Timer(0.2, readiness.write_ready_marker, args=(db_path, marker_path))
+    timer.start()
+    start = time.monotonic()
+    marker = readiness.wait_until_ready(timeout=10, db_path=db_path, marker_path=marker_path, poll_interval=5)
+    elapsed = time.monotonic() - start
+    assert marker['data_version'] == readiness.db_fingerprint(db_path)
+    # woken by the file event rather than the 5 s poll interval
+    assert elapsed < 2
+
+def test_wait_until_ready_times_out(tmp_path):
+    with pytest.raises(TimeoutError):
+        readiness.wait_until_ready(timeout=0.2, db_path=tmp_path / "missing.db", marker_path=tmp_path / "emissions.ready")
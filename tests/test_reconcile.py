@@ -0,0 +1,185 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import forecast
+from analysis.reconcile import (
+    AGGREGATE_NAME,
+    TOTAL_NAME,
+    aggregate_keys,
+    build_hierarchy,
+    incoherent_aggregates,
+    reconcile,
+    reconcile_forecasts,
+)
+
+KEYS = [
+    ('Germany', 'Energy'), ('Germany', 'Agriculture'), ('Germany', TOTAL_NAME),
+    ('France', 'Energy'), ('France', 'Agriculture'), ('France', TOTAL_NAME),
+    ('Norway', 'Energy'), ('Norway', TOTAL_NAME),
+    (AGGREGATE_NAME, 'Energy'), (AGGREGATE_NAME, 'Agriculture'), (AGGREGATE_NAME, TOTAL_NAME),
+]
+
+def is_coherent(values, nodes):
+    value = dict(zip(nodes, values))
+    for country in ('Germany', 'France', AGGREGATE_NAME):
+        np.testing.assert_allclose(value[(country, TOTAL_NAME)], value[(country, 'Energy')] + value[(country, 'Agriculture')])
+    np.testing.assert_allclose(value[('Norway', TOTAL_NAME)], value[('Norway', 'Energy')])
+    for sector in ('Energy', 'Agriculture', TOTAL_NAME):
+        # Norway is not an EU member
+        np.testing.assert_allclose(value[(AGGREGATE_NAME, sector)], value[('Germany', sector)] + value[('France', sector)])
+    return True
+
+def test_hierarchy_excludes_non_members_and_totals():
+    nodes, bottom, S = build_hierarchy(KEYS)
+    assert bottom == sorted([('France', 'Agriculture'), ('France', 'Energy'), ('Germany', 'Agriculture'),
+                             ('Germany', 'Energy'), ('Norway', 'Energy')])
+    assert S.shape == (len(KEYS), 5)
+    assert S[nodes.index((AGGREGATE_NAME, TOTAL_NAME))].sum() == 4
+    assert set(aggregate_keys(KEYS)) == set(KEYS) - set(bottom)
+
+@pytest.mark.parametrize('method', ['bottom_up', 'ols', 'wls'])
+def test_reconciled_forecasts_add_up(method):
+    nodes, _, S = build_hierarchy(KEYS)
+    rng = np.random.default_rng(1)
+    base = S @ rng.uniform(10, 100, (S.shape[1], 6)) + rng.normal(0, 5, (len(nodes), 6))
+    out = reconcile(base, S, method, variances=rng.uniform(1, 4, len(nodes)))
+    assert out.shape == base.shape
+    for column in out.T:
+        assert is_coherent(column, nodes)
+
+def test_coherent_forecasts_are_unchanged():
+    _, _, S = build_hierarchy(KEYS)
+    base = S @ np.arange(1.0, 11.0).reshape(5, 2)
+    for method in ('ols', 'wls'):
+        np.testing.assert_allclose(reconcile(base, S, method), base)
+
+def test_reconcile_forecasts_builds_skipped_aggregates():
+    bottom = [k for k in KEYS if k not in aggregate_keys(KEYS)]
+    rows = [{'year': year, 'country_name': c, 'sector_name': s,
+             'forecast_emissions_ktco2': 10.0 + i, 'forecast_emissions_per_capita': 1.0,
+             'forecast_emissions_ktco2_lower_80': 7.0 + i, 'forecast_emissions_ktco2_upper_80': 13.0 + i}
+            for i, (c, s) in enumerate(bottom) for year in (2024, 2025)]
+    population = {'Germany': 1_000_000, 'France': 1_000_000, 'Norway': 1_000_000, AGGREGATE_NAME: 2_000_000}
+    out = reconcile_forecasts(pd.DataFrame(rows), 'bottom_up', keys=KEYS, population=population, levels=[80])
+
+    assert len(out) == len(KEYS) * 2
+    row = out[(out['country_name'] == AGGREGATE_NAME) & (out['sector_name'] == TOTAL_NAME)].iloc[0]
+    assert row['forecast_emissions_ktco2'] == pytest.approx(10 + 11 + 12 + 13)
+    assert row['forecast_emissions_per_capita'] == pytest.approx(46 * 1_000_000 / 2_000_000)
+    # four independent half-widths of 3
+    assert row['forecast_emissions_ktco2_upper_80'] - row['forecast_emissions_ktco2'] == pytest.approx(6.0)
+
+def test_totals_with_missing_parts_are_not_forced_to_the_rest():
+    nodes, _, S = build_hierarchy(KEYS)
+    rng = np.random.default_rng(2)
+    base = S @ rng.uniform(10, 100, (S.shape[1], 3)) + rng.normal(0, 5, (len(nodes), 3))
+    energy, total = nodes.index(('Germany', 'Energy')), nodes.index(('Germany', TOTAL_NAME))
+    base[energy, 1] = np.nan
+    for method in ('bottom_up', 'ols', 'wls'):
+        out = reconcile(base, S, method)
+        # the year with a missing part keeps Germany's and the EU's forecasts as they were
+        assert np.isnan(out[energy, 1])
+        assert out[total, 1] == base[total, 1]
+        assert out[nodes.index((AGGREGATE_NAME, TOTAL_NAME)), 1] == base[nodes.index((AGGREGATE_NAME, TOTAL_NAME)), 1]
+        value = dict(zip(nodes, out[:, 1]))
+        np.testing.assert_allclose(value[('France', TOTAL_NAME)], value[('France', 'Energy')] + value[('France', 'Agriculture')])
+        for column in (0, 2):
+            assert is_coherent(out[:, column], nodes)
+
+def test_reconcile_forecasts_with_an_unfitted_sector():
+    rows = [{'year': 2024, 'country_name': c, 'sector_name': s, 'forecast_emissions_ktco2': 150.0 if s == TOTAL_NAME else 100.0,
+             'forecast_emissions_per_capita': 1.0} for c, s in KEYS if (c, s) != ('Germany', 'Energy')]
+    out = reconcile_forecasts(pd.DataFrame(rows), 'ols', keys=KEYS, levels=[])
+    value = out.set_index(['country_name', 'sector_name'])['forecast_emissions_ktco2']
+    assert ('Germany', 'Energy') not in value.index
+    assert value[('Germany', TOTAL_NAME)] == 150.0
+    assert value[('France', TOTAL_NAME)] == pytest.approx(value[('France', 'Energy')] + value[('France', 'Agriculture')])
+
+def test_forecast_all_skips_aggregates(tmp_path, monkeypatch):
+    db_path = tmp_path / "forecast.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE emissions_data (year INTEGER, sector_name TEXT, country_name TEXT, population INTEGER, emissions_ktco2 REAL, emissions_per_capita REAL)')
+    rows = []
+    for year in range(2000, 2020):
+        energy, agriculture = 100 - year % 7, 50 + year % 3
+        rows += [(year, 'Energy', 'Germany', 1000, energy, energy),
+                 (year, 'Agriculture', 'Germany', 1000, agriculture, agriculture),
+                 (year, TOTAL_NAME, 'Germany', 1000, energy + agriculture + 1, energy + agriculture + 1)]
+    conn.executemany('INSERT INTO emissions_data VALUES (?,?,?,?,?,?)', rows)
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(forecast, 'DB_PATH', str(db_path))
+    fitted = []
+    original = forecast.forecast_series_intervals
+    monkeypatch.setattr(forecast, 'forecast_series_intervals',
+                        lambda series, *args, **kwargs: fitted.append(series.name) or original(series, *args, **kwargs))
+
+    df = forecast.forecast_all(forecast_years=2, reconcile='bottom_up', skip_aggregates=True)
+    assert not any(TOTAL_NAME in name for name in fitted)
+    totals = df[df['sector_name'] == TOTAL_NAME].set_index('year')['forecast_emissions_ktco2']
+    parts = df[df['sector_name'] != TOTAL_NAME].groupby('year')['forecast_emissions_ktco2'].sum()
+    np.testing.assert_allclose(totals.values, parts.loc[totals.index].values)
+    assert df[df['sector_name'] == TOTAL_NAME]['forecast_emissions_per_capita'].notna().all()
+
+    with pytest.raises(ValueError):
+        forecast.forecast_all(forecast_years=2, reconcile='ols', skip_aggregates=True)
+
+def test_skipped_aggregate_with_a_short_part_is_recorded(tmp_path, monkeypatch):
+    db_path = tmp_path / "forecast.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE emissions_data (year INTEGER, sector_name TEXT, country_name TEXT, population INTEGER, emissions_ktco2 REAL, emissions_per_capita REAL)')
+    rows = [(year, 'Agriculture', 'Germany', 1000, 50 + year % 3, 1.0) for year in range(2000, 2020)]
+    rows += [(year, TOTAL_NAME, 'Germany', 1000, 50 + year % 3 + (100.0 if year >= 2018 else 0.0), 1.0) for year in range(2000, 2020)]
+    rows += [(year, 'Energy', 'Germany', 1000, 100.0, 1.0) for year in (2018, 2019)]
+    conn.executemany('INSERT INTO emissions_data VALUES (?,?,?,?,?,?)', rows)
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(forecast, 'DB_PATH', str(db_path))
+
+    df = forecast.forecast_all(forecast_years=2, reconcile='bottom_up', skip_aggregates=True)
+    assert set(df['sector_name']) == {'Agriculture'}
+    conn = sqlite3.connect(db_path)
+    failures = conn.execute('SELECT sector_name, reason FROM forecast_failures ORDER BY sector_name').fetchall()
+    conn.close()
+    assert failures == [('Energy', 'insufficient_history'), (TOTAL_NAME, 'missing_parts')]
+
+def test_totals_that_do_not_add_up_are_not_reconciled_to_their_parts(tmp_path, monkeypatch):
+    # the net LULUCF sink is negative from 2010 on, so etl.transform dropped those
+    # rows, while the reported total still includes it
+    db_path = tmp_path / "forecast.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE emissions_data (year INTEGER, sector_name TEXT, country_name TEXT, population INTEGER, emissions_ktco2 REAL, emissions_per_capita REAL)')
+    rows = []
+    for year in range(2000, 2020):
+        energy, lulucf = 100.0 - year % 5, 20.0 - 3 * (year - 2000)
+        rows += [(year, 'Energy', 'Germany', 1000, energy, 1.0),
+                 (year, TOTAL_NAME, 'Germany', 1000, energy + lulucf, 1.0)]
+        if lulucf > 0:
+            rows.append((year, 'LULUCF', 'Germany', 1000, lulucf, 1.0))
+    conn.executemany('INSERT INTO emissions_data VALUES (?,?,?,?,?,?)', rows)
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(forecast, 'DB_PATH', str(db_path))
+
+    history = forecast.get_emissions_history()
+    keys = forecast.get_all_country_sector_combos()
+    assert incoherent_aggregates(keys, history) == [('Germany', TOTAL_NAME)]
+    assert aggregate_keys(keys, history) == []
+
+    fitted = []
+    original = forecast.forecast_series_intervals
+    monkeypatch.setattr(forecast, 'forecast_series_intervals',
+                        lambda series, *args, **kwargs: fitted.append(series.name) or original(series, *args, **kwargs))
+    base = forecast.forecast_all(forecast_years=2, reconcile='', per_capita='derived')
+    for method in ('bottom_up', 'ols', 'wls'):
+        fitted.clear()
+        df = forecast.forecast_all(forecast_years=2, reconcile=method, skip_aggregates=method == 'bottom_up',
+                                   per_capita='derived')
+        # the total is fitted and kept, not replaced by (or pulled toward) the sum of what is left of its parts
+        assert f"Germany|{TOTAL_NAME}|emissions_ktco2" in fitted
+        pd.testing.assert_frame_equal(df.sort_values(['sector_name', 'year']).reset_index(drop=True),
+                                      base.sort_values(['sector_name', 'year']).reset_index(drop=True),
+                                      check_like=True)
@@ -0,0 +1,118 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from etl.stages import Stage, StageRunner
+
+
+def make_stages(calls, source_value=1, barrier=None):
+    def source_a():
+        calls.append('a')
+        if barrier:
+            barrier.wait(timeout=5)
+        return pd.DataFrame({'x': [source_value]})
+
+    def source_b():
+        calls.append('b')
+        if barrier:
+            barrier.wait(timeout=5)
+        return pd.DataFrame({'y': [10]})
+
+    def combine(a, b):
+        calls.append('combine')
+        return pd.DataFrame({'z': a['x'] + b['y']})
+
+    def sink(combined):
+        calls.append('sink')
+
+    return [
+        Stage('a', source_a, always_run=True),
+        Stage('b', source_b, always_run=True),
+        Stage('combine', combine, deps=('a', 'b')),
+        Stage('sink', sink, deps=('combine',)),
+    ]
+
+def test_unchanged_inputs_are_skipped(tmp_path):
+    calls = []
+    results = StageRunner(make_stages(calls), tmp_path).run()
+    assert [results[s]['status'] for s in results] == ['ran'] * 4
+    assert results['combine']['rows'] == 1
+    assert {'wall_s', 'cpu_s', 'peak_rss_mb'} <= set(results['combine'])
+
+    calls.clear()
+    results = StageRunner(make_stages(calls), tmp_path).run()
+    assert sorted(calls) == ['a', 'b']
+    assert results['combine']['status'] == 'skipped'
+    assert results['sink']['status'] == 'skipped'
+
+    # changed source data propagates downstream
+    calls.clear()
+    StageRunner(make_stages(calls, source_value=2), tmp_path).run()
+    assert 'combine' in calls and 'sink' in calls
+
+def test_resume_from_stage_uses_checkpoints(tmp_path):
+    calls = []
+    StageRunner(make_stages(calls), tmp_path).run()
+
+    calls.clear()
+    results = StageRunner(make_stages(calls), tmp_path).run(resume_from='combine', force=True)
+    assert calls == ['combine', 'sink']
+    assert results['a']['status'] == 'checkpoint'
+
+def test_resume_without_checkpoint_fails(tmp_path):
+    with pytest.raises(RuntimeError):
+        StageRunner(make_stages([]), tmp_path).run(only=['combine'])
+
+def test_independent_stages_run_concurrently(tmp_path):
+    # both sources must be running at the same time to pass the barrier
+    barrier = threading.Barrier(2)
+    results = StageRunner(make_stages([], barrier=barrier), tmp_path).run()
+    assert results['combine']['status'] == 'ran'
+
+def test_peak_memory_is_per_stage(tmp_path):
+    def big():
+        block = np.ones(300 * 2**20 // 8)
+        return pd.DataFrame({'x': [block.sum()]})
+
+    def small(big):
+        return big
+
+    runner = StageRunner([Stage('big', big), Stage('small', small, deps=('big',))], tmp_path)
+    if not runner._memory.per_stage:
+        pytest.skip("the high-water mark cannot be reset on this platform")
+    results = runner.run()
+    # the 300 MB block is gone before the second stage starts
+    assert results['big']['peak_rss_mb'] - results['small']['peak_rss_mb'] > 250
+
+def test_stage_without_a_frame_drops_its_old_checkpoint(tmp_path):
+    received = []
+
+    def stages(returns_frame):
+        def source():
+            return pd.DataFrame({'x': [1]}) if returns_frame else None
+        return [Stage('source', source, params={'frame': returns_frame}),
+                Stage('sink', lambda df: received.append(df), deps=('source',))]
+
+    StageRunner(stages(True), tmp_path).run()
+    StageRunner(stages(False), tmp_path).run()
+    assert not (tmp_path / 'source.parquet').exists()
+    received.clear()
+    StageRunner(stages(False), tmp_path).run(only=['sink'], force=True)
+    assert received == [None]
+
+def test_cpu_time_includes_threads_the_stage_starts(tmp_path):
+    def spin():
+        end = time.thread_time() + 0.3
+        while time.thread_time() < end:
+            pass
+
+    def stage():
+        thread = threading.Thread(target=spin)
+        thread.start()
+        thread.join()
+
+    results = StageRunner([Stage('threaded', stage)], tmp_path).run()
+    assert results['threaded']['cpu_s'] >= 0.25
@@ -0,0 +1,27 @@
+import os
+
+import pytest
+
+from benchmarks.bench_startup import (
+    IMPORT_BUDGETS,
+    check_import_budget,
+    forbidden_imports,
+    import_profile,
+)
+
+
+@pytest.mark.parametrize('module', list(IMPORT_BUDGETS))
+def test_no_heavy_imports_at_startup(module):
+    assert forbidden_imports(module) == []
+
+# wall-clock budgets only hold on an otherwise idle machine
+@pytest.mark.skipif(not os.getenv('CHECK_IMPORT_BUDGETS'), reason="set CHECK_IMPORT_BUDGETS=1 to time imports")
+@pytest.mark.parametrize('module', list(IMPORT_BUDGETS))
+def test_import_budget(module):
+    assert check_import_budget(module) == []
+
+def test_import_profile_reports_cumulative_times():
+    times, loaded = import_profile('analysis.forecast')
+    assert 'analysis.forecast' in loaded and 'statsmodels' not in loaded
+    # nested imports are listed under their own names
+    assert times['analysis.forecast'] >= times['analysis.batch_arima'] > 0
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from dashboard.traces import downsample, reduce_series, total_series
+
+
+def make_frame(n_series):
+    rows = []
+    for i in range(n_series):
+        for year in (2020, 2021):
+            rows.append({'source': 'historical', 'label': f's{i}', 'year': year, 'value': float(i)})
+    return pd.DataFrame(rows)
+
+def test_reduce_series_folds_smallest():
+    df = reduce_series(make_frame(5), max_series=2)
+    labels = set(df['label'])
+    assert labels == {'s4', 's3', 'Other (3 series)'}
+    other = df[df['label'] == 'Other (3 series)']
+    assert other['value'].tolist() == [3.0, 3.0]
+
+def test_total_series():
+    total = total_series(make_frame(3))
+    assert total['value'].tolist() == [3.0, 3.0]
+    assert set(total['label']) == {'Total'}
+
+def test_downsample_keeps_extremes():
+    x = np.arange(1000)
+    y = np.sin(x / 50.0)
+    y[500] = 10.0
+    dx, dy = downsample(x, y, max_points=100)
+    assert len(dx) <= 100
+    assert 10.0 in dy
+    assert list(dx) == sorted(dx)
+
+def test_interval_levels_widest_first():
+    from dashboard.traces import interval_levels
+    columns = ['year', 'emissions_ktco2', 'emissions_ktco2_lower_80', 'emissions_ktco2_upper_80',
+               'emissions_ktco2_lower_95', 'emissions_ktco2_upper_95', 'emissions_ktco2_lower_50']
+    assert interval_levels(columns, 'emissions_ktco2') == [95, 80]
+    assert interval_levels(columns, 'emissions_per_capita') == []
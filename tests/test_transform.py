@@ -34,3 +34,23 @@ def test_transform_emissions_data_basic(monkeypatch):
     assert de['emissions_ktco2'] == 1000.0
     expected_per_capita = round(1000.0 * 1_000_000 / 83000000, 2)
     assert abs(de['emissions_per_capita'] - expected_per_capita) < 1e-6
+
+def test_transform_with_prefetched_population_is_pure(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("population must not be fetched when passed in")
+    monkeypatch.setattr(transform_module, 'fetch_population_data', fail)
+    monkeypatch.setitem(transform_module.COUNTRY_MAP, 'DE', 'Germany')
+    monkeypatch.setitem(transform_module.SECTOR_MAP, '1A1', 'Energy industries')
+
+    raw = pd.DataFrame([
+        {'time': '2019', 'geo': 'DE', 'src_crf': '1A1', 'values': 900.0},
+        {'time': '2020', 'geo': 'DE', 'src_crf': '1A1', 'values': 1000.0},
+    ])
+    raw_before = raw.copy()
+    pop = pd.DataFrame([{'country_code': 'DE', 'year': 2020, 'population': 83000000}])
+
+    out = transform_module.transform_emissions_data(raw, start_year=2020, end_year=2020, population_df=pop)
+    assert out['year'].tolist() == [2020]
+    assert out.iloc[0]['population'] == 83000000
+    # input frame is left untouched
+    pd.testing.assert_frame_equal(raw, raw_before)
@@ -0,0 +1,66 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.queries import list_vintages, query_as_of, query_revisions
+from etl.vintages import diff_vintage, record_vintage
+
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=['year', 'sector_name', 'country_name', 'population', 'emissions_ktco2', 'emissions_per_capita'])
+
+FIRST = frame([
+    (2019, 'Energy', 'Germany', 83000000, 300.0, 3.61),
+    (2020, 'Energy', 'Germany', 83100000, 280.0, 3.37),
+    (2020, 'Waste', 'Germany', 83100000, 10.0, np.nan),
+    (2020, 'Energy', 'France', 67000000, 50.0, 0.75),
+])
+# 2019 revised, France dropped, 2021 added; Waste unchanged (NaN == NaN)
+SECOND = frame([
+    (2019, 'Energy', 'Germany', 83000000, 310.0, 3.73),
+    (2020, 'Energy', 'Germany', 83100000, 280.0, 3.37),
+    (2020, 'Waste', 'Germany', 83100000, 10.0, np.nan),
+    (2021, 'Energy', 'Germany', 83200000, 290.0, 3.49),
+])
+
+def test_diff_vintage_classifies_changes():
+    delta = diff_vintage(FIRST, SECOND).set_index(['country_name', 'sector_name', 'year'])['change']
+    assert delta.to_dict() == {
+        ('Germany', 'Energy', 2019): 'revised',
+        ('France', 'Energy', 2020): 'removed',
+        ('Germany', 'Energy', 2021): 'new',
+    }
+
+def test_record_vintage_writes_only_the_delta(tmp_path):
+    db_path = tmp_path / "vintages.db"
+    conn = sqlite3.connect(db_path)
+    assert record_vintage(FIRST, conn, '2024-03-01')['new'] == 4
+    untouched = conn.execute("SELECT rowid FROM emissions_data WHERE year = 2020 AND country_name = 'Germany' ORDER BY sector_name").fetchall()
+
+    stats = record_vintage(SECOND, conn, '2024-09-01')
+    assert (stats['new'], stats['revised'], stats['removed']) == (1, 1, 1)
+    # unchanged rows are not rewritten
+    assert conn.execute("SELECT rowid FROM emissions_data WHERE year = 2020 AND country_name = 'Germany' ORDER BY sector_name").fetchall() == untouched
+    current = pd.read_sql_query("SELECT * FROM emissions_data ORDER BY country_name, sector_name, year", conn)
+    expected = SECOND.sort_values(['country_name', 'sector_name', 'year']).reset_index(drop=True)
+    pd.testing.assert_frame_equal(current[expected.columns], expected, check_dtype=False)
+    assert conn.execute("SELECT COUNT(*) FROM emissions_revisions WHERE release_date = '2024-09-01'").fetchone()[0] == 3
+
+    with pytest.raises(ValueError):
+        record_vintage(FIRST, conn, '2024-01-01')
+    conn.close()
+
+    # as published in the spring release, and as published now
+    spring = query_as_of('Germany', 'Energy', '2024-06-30', db_path=db_path)
+    assert [(r['year'], r['emissions_ktco2']) for r in spring] == [(2019, 300.0), (2020, 280.0)]
+    latest = query_as_of('Germany', 'Energy', '2025-01-01', start_year=2019, end_year=2020, db_path=db_path)
+    assert [(r['year'], r['emissions_ktco2']) for r in latest] == [(2019, 310.0), (2020, 280.0)]
+    assert query_as_of('France', 'Energy', '2025-01-01', db_path=db_path) == []
+    assert query_as_of('Germany', 'Energy', '2023-01-01', db_path=db_path) == []
+
+    history = query_revisions('Germany', 'Energy', 2019, db_path=db_path)
+    assert [(r['release_date'], r['emissions_ktco2'], r['change']) for r in history] == [
+        ('2024-03-01', 300.0, 'new'), ('2024-09-01', 310.0, 'revised')]
+    assert [v['release_date'] for v in list_vintages(db_path)] == ['2024-03-01', '2024-09-01']
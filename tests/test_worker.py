@@ -0,0 +1,91 @@
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from analysis import forecast, task_queue, worker
+from etl import readiness
+
+
+def test_claims_are_exclusive_and_leases_expire(tmp_path):
+    queue = tmp_path / "queue.db"
+    run_id = task_queue.create_run({}, [(f"t{i}", {'i': i}) for i in range(5)], queue_path=queue)
+    first = task_queue.claim('a', 3, lease_seconds=60, queue_path=queue)
+    second = task_queue.claim('b', 3, lease_seconds=0, queue_path=queue)
+    assert [t['key'] for t in first] == ['t0', 't1', 't2']
+    assert [t['key'] for t in second] == ['t3', 't4']
+
+    # b's lease ran out: its tasks go to the next claimant, and b can no longer complete them
+    time.sleep(0.01)
+    third = task_queue.claim('c', 5, queue_path=queue)
+    assert [(t['key'], t['attempts']) for t in third] == [('t3', 2), ('t4', 2)]
+    assert not task_queue.complete('b', second[0]['task_id'], {'x': 1}, queue_path=queue)
+    assert task_queue.heartbeat('a', [t['task_id'] for t in first], queue_path=queue) == 3
+    assert task_queue.complete('c', third[0]['task_id'], {'x': 1}, queue_path=queue)
+    assert task_queue.run_status(run_id, queue) == {'pending': 0, 'running': 4, 'done': 1, 'failed': 0}
+
+def test_failed_tasks_retry_with_backoff_then_fail(tmp_path):
+    queue = tmp_path / "queue.db"
+    run_id = task_queue.create_run({}, [('t', {})], queue_path=queue)
+    for attempt in (1, 2):
+        task = task_queue.claim('w', queue_path=queue, max_attempts=3)[0]
+        assert task['attempts'] == attempt
+        assert task_queue.fail('w', task['task_id'], 'boom', max_attempts=3, retry_seconds=0, queue_path=queue) == 'pending'
+    task = task_queue.claim('w', queue_path=queue, max_attempts=3)[0]
+    assert task_queue.fail('w', task['task_id'], 'boom', max_attempts=3, queue_path=queue) == 'failed'
+    assert task_queue.run_tasks(run_id, queue)[0]['error'] == 'boom'
+
+    # backoff keeps a retried task out of reach
+    task_queue.create_run({}, [('u', {})], run_id='later', queue_path=queue)
+    task = task_queue.claim('w', run_id='later', queue_path=queue)[0]
+    task_queue.fail('w', task['task_id'], 'boom', retry_seconds=60, queue_path=queue)
+    assert task_queue.claim('w', run_id='later', queue_path=queue) == []
+
+def test_workers_reproduce_forecast_all(tmp_path, monkeypatch):
+    db_path = tmp_path / "forecast.db"
+    rng = np.random.default_rng(0)
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE emissions_data (year INTEGER, sector_name TEXT, country_name TEXT, population INTEGER, emissions_ktco2 REAL, emissions_per_capita REAL)')
+    rows = [(1990 + t, sector, country, 1000, value, value / 10)
+            for country in ('Germany', 'France') for sector in ('Energy', 'Waste')
+            for t, value in enumerate(1000 * np.exp(np.cumsum(rng.normal(0, 0.03, 25))))]
+    rows += [(2020, 'Energy', 'Malta', 10, 1.0, 0.1), (2021, 'Energy', 'Malta', 10, 1.0, 0.1)]
+    conn.executemany('INSERT INTO emissions_data VALUES (?,?,?,?,?,?)', rows)
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(forecast, 'DB_PATH', str(db_path))
+    monkeypatch.setattr(forecast, 'FORECAST_INTERVAL_LEVELS', [80])
+    queue = tmp_path / "queue.db"
+
+    run_id = worker.enqueue_forecasts(forecast_years=3, reconcile='', queue_path=queue)
+    # two workers in parallel, each with its own connection
+    threads = [threading.Thread(target=worker.work, kwargs={'worker_id': f"w{i}", 'run_id': run_id, 'batch_size': 2,
+                                                            'exit_when_idle': True, 'queue_path': queue})
+               for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert worker.wait_for_run(run_id, queue_path=queue) == {'pending': 0, 'running': 0, 'done': 8, 'failed': 2}
+
+    distributed = worker.finalize(run_id, queue_path=queue)
+    reference = forecast.forecast_all(forecast_years=3, reconcile='')
+    sort = ['country_name', 'sector_name', 'year']
+    pd.testing.assert_frame_equal(distributed.sort_values(sort).reset_index(drop=True),
+                                  reference.sort_values(sort).reset_index(drop=True))
+    conn = sqlite3.connect(db_path)
+    failures = conn.execute("SELECT country_name, reason FROM forecast_failures").fetchall()
+    conn.close()
+    # one from finalize, one from the forecast_all reference
+    assert failures == [('Malta', 'insufficient_history')] * 2
+
+    # the recovery command reloads the forecasts and marks the database ready again
+    marker_path = tmp_path / "emissions.ready"
+    monkeypatch.setattr(task_queue, 'QUEUE_PATH', queue)
+    monkeypatch.setattr(readiness, 'DB_PATH', db_path)
+    monkeypatch.setattr(readiness, 'READY_MARKER_PATH', marker_path)
+    monkeypatch.setattr(readiness, 'PARQUET_EXPORT', False)
+    worker.main(['finalize', run_id])
+    assert readiness.read_ready_marker(db_path, marker_path) is not None
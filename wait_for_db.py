@@ -1,14 +1,17 @@
 """
-Simple script to allow dashboard + FastAPI containers to only come up after DB is created
+Block until the pipeline has completely loaded the database, so the dashboard
+and FastAPI containers never start on a missing or half-written DB.
 """
-import time
-from pathlib import Path
+import sys
 
-DB_PATH = Path("/app/data/emissions.db")
+from config.settings import READY_TIMEOUT_SECONDS
+from etl.readiness import wait_until_ready
 
-print("Waiting for database to be created...")
-while not DB_PATH.exists():
-    time.sleep(5)
-    print("...still waiting for DB")
+print("Waiting for database to be ready...")
+try:
+    marker = wait_until_ready(timeout=READY_TIMEOUT_SECONDS)
+except TimeoutError as e:
+    print(f"Giving up: {e}")
+    sys.exit(1)
 
-print("Database found, starting service!")
\ No newline at end of file
+print(f"Database ready (data version {marker['data_version']}, loaded {marker['completed_at']}), starting service!")